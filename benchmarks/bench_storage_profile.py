@@ -0,0 +1,93 @@
+"""Concurrent read/write throughput of the SQLite storage profiles.
+
+Runs the same workload against a fresh database twice: once with SQLite's
+defaults (rollback journal, synchronous=FULL) and once with the profile built
+from ``Settings`` (WAL by default). Writers commit one row per insert, like
+``store_message``; readers run the dashboard's recent-history query.
+
+    python -m benchmarks.bench_storage_profile --seconds 5 --writers 4 --readers 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db.session import ConnectionPool, storage_profile_from_settings
+
+DEFAULT_PROFILE = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+
+
+async def _run(profile, seconds, writers, readers, pool_size):
+    path = os.path.join(tempfile.mkdtemp(prefix="salespulse-bench-"), "bench.db")
+    pool = ConnectionPool(path, size=pool_size, timeout=30.0, profile=profile)
+    async with pool.writer() as db:
+        await db.execute(
+            """CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone_number TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        await db.execute("CREATE INDEX idx_bench_phone ON conversations(phone_number, id)")
+        await db.commit()
+
+    counts = {"writes": 0, "reads": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def writer(n):
+        i = 0
+        while time.perf_counter() < deadline:
+            async with pool.writer() as db:
+                await db.execute(
+                    "INSERT INTO conversations (phone_number, message) VALUES (?, ?)",
+                    (f"+1555000{n:04d}", f"message {i}"),
+                )
+                await db.commit()
+            counts["writes"] += 1
+            i += 1
+
+    async def reader(n):
+        while time.perf_counter() < deadline:
+            async with pool.reader() as db:
+                cursor = await db.execute(
+                    "SELECT message FROM conversations WHERE phone_number = ? ORDER BY id DESC LIMIT 20",
+                    (f"+1555000{n % max(writers, 1):04d}",),
+                )
+                await cursor.fetchall()
+            counts["reads"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(writer(n) for n in range(writers)),
+        *(reader(n) for n in range(readers)),
+    )
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return {
+        "writes_per_s": round(counts["writes"] / elapsed, 1),
+        "reads_per_s": round(counts["reads"] / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    tuned = storage_profile_from_settings()
+    for label, profile in (("sqlite defaults", DEFAULT_PROFILE), ("settings profile", tuned)):
+        result = asyncio.run(_run(profile, args.seconds, args.writers, args.readers, args.pool_size))
+        print(f"{label:<17} {result['writes_per_s']:>10} writes/s {result['reads_per_s']:>10} reads/s")
+    print(f"settings profile: {tuned}")
+
+
+if __name__ == "__main__":
+    main()
@@ -34,9 +34,25 @@ export const api = {
 export const getAnalytics = () => api.get('/analytics')
 
 // ─── Contacts & Conversations ─────────────────────────────────────────────────
-export const getContacts         = () => api.get('/contacts')
-export const getConversation     = (phone, limit = 100) =>
-  api.get(`/conversations/${encodeURIComponent(phone)}?limit=${limit}`)
+export const getContacts         = (cursor) =>
+  api.get(`/contacts${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`)
+// Pass afterId to fetch only newer messages and the previous response's etag to
+// get null (304) when nothing changed; beforeId pages back through older ones.
+export async function getConversation(phone, { limit = 100, afterId, beforeId, etag } = {}) {
+  const q = new URLSearchParams({ limit })
+  if (afterId != null)  q.set('after_id', afterId)
+  if (beforeId != null) q.set('before_id', beforeId)
+  const res = await fetch(`${BASE}/conversations/${encodeURIComponent(phone)}?${q}`, {
+    headers: etag ? { 'If-None-Match': etag } : {},
+  })
+  if (res.status === 304) return null
+  if (!res.ok) throw new Error(`HTTP ${res.status}`)
+  return { ...(await res.json()), etag: res.headers.get('ETag') }
+}
+// Live updates (Server-Sent Events); pass a phone number for one contact's events.
+// EventSource reconnects by itself; each connection starts with a "ready" event.
+export const openEventStream     = (phone) =>
+  new EventSource(`${BASE}/events${phone ? `?contact=${encodeURIComponent(phone)}` : ''}`)
 export const sendToContact       = (phone, message, channel = 'whatsapp') =>
   api.post(`/conversations/${encodeURIComponent(phone)}/send`, { message, channel })
 
@@ -4,7 +4,7 @@ import {
   Search, Send, RefreshCw, Phone, MessageSquare,
   Smartphone, Plus, ChevronDown,
 } from 'lucide-react'
-import { getContacts, getConversation, sendToContact } from '../api/client'
+import { getContacts, getConversation, openEventStream, sendToContact } from '../api/client'
 import { formatDistanceToNow, format, isToday, isYesterday } from 'date-fns'
 
 function ContactItem({ contact, isSelected, onClick }) {
@@ -107,51 +107,165 @@ export default function ChatPage() {
   const [channel, setChannel] = useState('whatsapp')
   const [sending, setSending] = useState(false)
   const [loadingContacts, setLoadingContacts] = useState(true)
+  const [contactsCursor, setContactsCursor] = useState(undefined)
   const [loadingMsgs, setLoadingMsgs] = useState(false)
   const [newPhone, setNewPhone] = useState('')
   const [showNewPhone, setShowNewPhone] = useState(false)
+  const [hasOlder, setHasOlder] = useState(false)
   const bottomRef = useRef(null)
-  const pollRef = useRef(null)
+  // Newest message id and ETag seen for the open conversation, for incremental fetches
+  const phoneRef = useRef(null)
+  const loadedRef = useRef(false)
+  const lastIdRef = useRef(0)
+  const etagRef = useRef(null)
+  const fetchingRef = useRef(false)
+  const refetchRef = useRef(false)
 
-  // Load contacts
+  // Load the first page of contacts, keeping any older pages already loaded
   const loadContacts = useCallback(async () => {
     try {
       const data = await getContacts()
-      setContacts(data.contacts || [])
+      const fresh = data.contacts || []
+      setContacts(prev => {
+        if (prev.length <= fresh.length) return fresh
+        const seen = new Set(fresh.map(c => c.phone_number))
+        return [...fresh, ...prev.filter(c => !seen.has(c.phone_number))]
+      })
+      // Only the first load sets the cursor; later polls must not rewind paging
+      setContactsCursor(cursor => cursor === undefined ? data.next_cursor : cursor)
     } catch {}
     setLoadingContacts(false)
   }, [])
 
-  // Load messages for selected phone
+  // Fold a stored-message event into the list: update that contact from the
+  // event payload and move it to the top, without refetching the list
+  const applyMessageEvent = useCallback((raw) => {
+    let event
+    try { event = JSON.parse(raw.data) } catch { return }
+    const msg = event.data || {}
+    setContacts(prev => {
+      const current = prev.find(c => c.contact_key === event.contact_key)
+      const updated = {
+        ...current,
+        contact_key: event.contact_key,
+        phone_number: msg.phone_number,
+        last_message: msg.message,
+        last_role: msg.role,
+        channel: msg.channel,
+        last_at: msg.timestamp,
+        user_msg_count: (current?.user_msg_count || 0) + (msg.role === 'user' ? 1 : 0),
+        total_msg_count: (current?.total_msg_count || 0) + 1,
+      }
+      return [updated, ...prev.filter(c => c.contact_key !== event.contact_key)]
+    })
+  }, [])
+
+  // Append the next page of contacts
+  async function loadMoreContacts() {
+    if (!contactsCursor) return
+    try {
+      const data = await getContacts(contactsCursor)
+      setContacts(prev => {
+        const seen = new Set(prev.map(c => c.phone_number))
+        return [...prev, ...(data.contacts || []).filter(c => !seen.has(c.phone_number))]
+      })
+      setContactsCursor(data.next_cursor)
+    } catch {}
+  }
+
+  // Load the latest messages for selected phone
   const loadMessages = useCallback(async (phone) => {
     if (!phone) return
+    if (phone !== phoneRef.current) loadedRef.current = false
+    phoneRef.current = phone
     setLoadingMsgs(true)
     try {
-      const data = await getConversation(phone, 200)
-      setMessages(data.messages || [])
+      const data = await getConversation(phone, { limit: 200 })
+      if (phone === phoneRef.current) {
+        const msgs = data.messages || []
+        setMessages(msgs)
+        setHasOlder(data.has_more)
+        lastIdRef.current = msgs.length ? msgs[msgs.length - 1].id : 0
+        etagRef.current = data.etag
+        loadedRef.current = true
+      }
     } catch {}
     setLoadingMsgs(false)
   }, [])
 
-  useEffect(() => { loadContacts() }, [loadContacts])
+  // Fetch only messages newer than the last one shown (an empty 304 if none).
+  // Calls made while a fetch is running are folded into one more round.
+  const fetchNewMessages = useCallback(async (phone) => {
+    if (!phone || phone !== phoneRef.current || !loadedRef.current) return
+    if (fetchingRef.current) {
+      refetchRef.current = true
+      return
+    }
+    fetchingRef.current = true
+    try {
+      let data
+      let etag = etagRef.current
+      do {
+        refetchRef.current = false
+        data = await getConversation(phone, { afterId: lastIdRef.current, etag })
+        // Follow-up pages must come back in full, never as a 304
+        etag = null
+        if (phone !== phoneRef.current) return
+        if (!data) continue
+        const fresh = data.messages || []
+        etagRef.current = data.etag
+        if (fresh.length) {
+          lastIdRef.current = fresh[fresh.length - 1].id
+          // Drop optimistic (id-less) bubbles; the stored copies arrive here
+          setMessages(prev => {
+            const known = new Set(prev.map(m => m.id))
+            return [...prev.filter(m => m.id != null), ...fresh.filter(m => !known.has(m.id))]
+          })
+        }
+      } while (data?.has_more || refetchRef.current)
+    } catch {
+    } finally {
+      fetchingRef.current = false
+    }
+  }, [])
 
+  // Prepend the page of messages before the oldest one shown
+  async function loadOlder() {
+    const oldest = messages.find(m => m.id != null)
+    if (!selectedPhone || !oldest) return
+    try {
+      const data = await getConversation(selectedPhone, { beforeId: oldest.id })
+      setMessages(prev => [...(data.messages || []), ...prev])
+      setHasOlder(data.has_more)
+    } catch {}
+  }
+
+  // Contact list: each stored message updates its contact in place. "ready" is
+  // sent on each (re)connect, so the first page is reloaded to catch up on
+  // anything missed while disconnected.
   useEffect(() => {
-    if (selectedPhone) {
-      loadMessages(selectedPhone)
-      // Poll for new messages every 4 seconds
-      clearInterval(pollRef.current)
-      pollRef.current = setInterval(() => {
-        loadMessages(selectedPhone)
-        loadContacts()
-      }, 4000)
-    }
-    return () => clearInterval(pollRef.current)
-  }, [selectedPhone, loadMessages, loadContacts])
+    const source = openEventStream()
+    source.addEventListener('ready', () => loadContacts())
+    source.addEventListener('message', applyMessageEvent)
+    return () => source.close()
+  }, [loadContacts, applyMessageEvent])
+
+  // Open conversation: fetch what is new whenever this contact gets a message
+  useEffect(() => {
+    if (!selectedPhone) return
+    // Catch up on anything stored between the initial load and the first event
+    loadMessages(selectedPhone).then(() => fetchNewMessages(selectedPhone))
+    const source = openEventStream(selectedPhone)
+    source.addEventListener('ready', () => fetchNewMessages(selectedPhone))
+    source.addEventListener('message', () => fetchNewMessages(selectedPhone))
+    return () => source.close()
+  }, [selectedPhone, loadMessages, fetchNewMessages])
 
-  // Scroll to bottom when messages change
+  // Scroll to bottom when a new message arrives (not when older ones are prepended)
+  const lastMessage = messages[messages.length - 1]
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [messages])
+  }, [lastMessage])
 
   function selectContact(phone) {
     setSelectedPhone(phone)
@@ -172,8 +286,7 @@ export default function ChatPage() {
     }])
     try {
       await sendToContact(selectedPhone, text, channel)
-      await loadMessages(selectedPhone)
-      await loadContacts()
+      await fetchNewMessages(selectedPhone)
     } catch (e) {
       alert(`Send failed: ${e.message}`)
     }
@@ -269,6 +382,14 @@ export default function ChatPage() {
               />
             ))
           )}
+          {!loadingContacts && contactsCursor && (
+            <button
+              onClick={loadMoreContacts}
+              className="w-full py-2.5 text-xs text-brand-400 hover:text-brand-300 transition-colors"
+            >
+              Load more
+            </button>
+          )}
         </div>
       </aside>
 
@@ -309,11 +430,23 @@ export default function ChatPage() {
                 <p className="text-sm">No messages yet. Send the first one!</p>
               </div>
             ) : (
-              groups.map((item, i) =>
-                item.type === 'date'
-                  ? <DateDivider key={`date-${i}`} label={item.label} />
-                  : <MessageBubble key={i} msg={item.msg} />
-              )
+              <>
+                {hasOlder && (
+                  <div className="flex justify-center py-2">
+                    <button
+                      onClick={loadOlder}
+                      className="text-xs text-brand-400 hover:text-brand-300 transition-colors"
+                    >
+                      Load earlier messages
+                    </button>
+                  </div>
+                )}
+                {groups.map((item, i) =>
+                  item.type === 'date'
+                    ? <DateDivider key={`date-${i}`} label={item.label} />
+                    : <MessageBubble key={item.msg.id ?? `pending-${i}`} msg={item.msg} />
+                )}
+              </>
             )}
             <div ref={bottomRef} />
           </div>
@@ -1,5 +1,6 @@
-from fastapi import APIRouter
-from src.db.session import get_db
+from typing import Optional
+from fastapi import APIRouter, Query
+from src.services.stats_service import read_analytics, read_series, rebuild_counters
 from src.core.logging import logger
 
 router = APIRouter()
@@ -7,79 +8,33 @@ router = APIRouter()
 
 @router.get("/analytics", tags=["Analytics"])
 async def get_analytics():
-    """Overview stats for the dashboard."""
-    db = await get_db()
+    """Overview stats for the dashboard, read from the precomputed counters."""
     try:
-        stats = {}
-
-        # Total messages sent
-        row = await (await db.execute("SELECT COUNT(*) FROM sent_messages")).fetchone()
-        stats["total_sent"] = row[0] if row else 0
-
-        # Messages sent today
-        row = await (await db.execute(
-            "SELECT COUNT(*) FROM sent_messages WHERE DATE(created_at) = DATE('now')"
-        )).fetchone()
-        stats["sent_today"] = row[0] if row else 0
-
-        # Active triggers
-        row = await (await db.execute(
-            "SELECT COUNT(*) FROM triggers WHERE status = 'active'"
-        )).fetchone()
-        stats["active_triggers"] = row[0] if row else 0
-
-        # Total triggers
-        row = await (await db.execute("SELECT COUNT(*) FROM triggers")).fetchone()
-        stats["total_triggers"] = row[0] if row else 0
-
-        # Pending bookings
-        row = await (await db.execute(
-            "SELECT COUNT(*) FROM bookings WHERE status = 'pending'"
-        )).fetchone()
-        stats["pending_bookings"] = row[0] if row else 0
-
-        # Confirmed bookings
-        row = await (await db.execute(
-            "SELECT COUNT(*) FROM bookings WHERE status = 'confirmed'"
-        )).fetchone()
-        stats["confirmed_bookings"] = row[0] if row else 0
-
-        # Total bookings
-        row = await (await db.execute("SELECT COUNT(*) FROM bookings")).fetchone()
-        stats["total_bookings"] = row[0] if row else 0
-
-        # Unique contacts
-        row = await (await db.execute(
-            "SELECT COUNT(DISTINCT phone_number) FROM conversations"
-        )).fetchone()
-        stats["total_contacts"] = row[0] if row else 0
-
-        # Total conversation messages
-        row = await (await db.execute("SELECT COUNT(*) FROM conversations")).fetchone()
-        stats["total_messages"] = row[0] if row else 0
-
-        # Channel breakdown for sent_messages
-        cursor = await db.execute(
-            "SELECT channel, COUNT(*) FROM sent_messages GROUP BY channel"
-        )
-        rows = await cursor.fetchall()
-        stats["by_channel"] = {row[0]: row[1] for row in rows}
-
-        # Recent activity: last 7 days messages sent per day
-        cursor = await db.execute(
-            """SELECT DATE(created_at) as day, COUNT(*) as cnt
-            FROM sent_messages
-            WHERE created_at >= DATE('now', '-7 days')
-            GROUP BY DATE(created_at)
-            ORDER BY day ASC"""
-        )
-        rows = await cursor.fetchall()
-        stats["sent_last_7_days"] = [{"date": row[0], "count": row[1]} for row in rows]
-
+        stats = await read_analytics()
         return {"success": True, "stats": stats}
 
     except Exception as e:
         logger.error(f"Analytics error: {e}")
         return {"success": False, "stats": {}, "detail": str(e)}
-    finally:
-        await db.close()
\ No newline at end of file
+
+
+@router.post("/analytics/rebuild", tags=["Analytics"])
+async def rebuild_analytics():
+    """Recompute the analytics counters from the raw tables."""
+    await rebuild_counters()
+    return {"success": True, "stats": await read_analytics()}
+
+
+@router.get("/analytics/series", tags=["Analytics"])
+async def get_series(
+    source: str = Query("sent_messages", description="sent_messages, conversations, triggers or bookings"),
+    granularity: str = Query("day", description="hour, day or month"),
+    start: Optional[str] = Query(None, description="ISO date/datetime (UTC); defaults to a span ending at `end`"),
+    end: Optional[str] = Query(None, description="ISO date/datetime (UTC); defaults to now"),
+    channel: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None, description="status (sent_messages), role (conversations) or type"),
+    split: Optional[str] = Query(None, description="Break each bucket down by 'channel' or 'kind'"),
+):
+    """Row counts per time bucket from the rollup tables, zero-filled for charting."""
+    series = await read_series(source, granularity, start, end, channel=channel, kind=kind, split=split)
+    return {"success": True, **series}
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, Query, Response
 from pydantic import BaseModel, Field
 from typing import Optional
 from src.services.conversation_service import (
     get_all_contacts,
     get_conversation_history,
+    get_last_message_id,
     store_message,
     store_sent_message,
 )
@@ -21,10 +22,13 @@ class SendMessageRequest(BaseModel):
 # ─── Contacts ──────────────────────────────────────────────────────────────────
 
 @router.get("/contacts", tags=["Conversations"])
-async def list_contacts(limit: int = Query(100, ge=1, le=500)):
-    """List all known contacts derived from conversation history."""
-    contacts = await get_all_contacts(limit=limit)
-    return {"success": True, "total": len(contacts), "contacts": contacts}
+async def list_contacts(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """List known contacts, most recently active first, one page at a time."""
+    contacts, next_cursor = await get_all_contacts(limit=limit, cursor=cursor)
+    return {"success": True, "total": len(contacts), "contacts": contacts, "next_cursor": next_cursor}
 
 
 # ─── Conversation History ───────────────────────────────────────────────────────
@@ -32,14 +36,38 @@ async def list_contacts(limit: int = Query(100, ge=1, le=500)):
 @router.get("/conversations/{phone_number}", tags=["Conversations"])
 async def get_conversation(
     phone_number: str,
+    response: Response,
     limit: int = Query(100, ge=1, le=500),
+    after_id: Optional[int] = Query(None, ge=0, description="Only messages newer than this id"),
+    before_id: Optional[int] = Query(None, ge=1, description="Only messages older than this id"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    """Get the full conversation history for a contact."""
-    history = await get_conversation_history(phone_number=phone_number, limit=limit)
+    """Get conversation history for a contact, oldest first.
+
+    Poll with ``after_id`` (the last id seen) to fetch only new messages, and
+    page back with ``before_id``. The ETag is the contact's latest message id,
+    so a poll sending it in If-None-Match gets an empty 304 while nothing is new.
+    Only ``after_id`` polls already at that id are answered with 304; any other
+    page (e.g. the next one while ``has_more``) is always returned in full.
+    """
+    last_id = await get_last_message_id(phone_number)
+    etag = f'W/"{last_id}"'
+    if (
+        if_none_match
+        and after_id is not None
+        and after_id >= last_id
+        and etag in [tag.strip() for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    history, has_more = await get_conversation_history(
+        phone_number=phone_number, limit=limit, after_id=after_id, before_id=before_id
+    )
+    response.headers["ETag"] = etag
     return {
         "success": True,
         "phone_number": phone_number,
         "total": len(history),
+        "has_more": has_more,
         "messages": history,
     }
 
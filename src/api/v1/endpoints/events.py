@@ -0,0 +1,47 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from src.config.settings import settings
+from src.core.contacts import normalize_contact
+from src.core.logging import logger
+from src.core.sse import format_event, sse_response
+from src.services import event_hub
+
+router = APIRouter()
+
+
+@router.get("/events")
+async def stream_events(contact: Optional[str] = Query(None, description="Only this contact's events")):
+    """Live dashboard updates as Server-Sent Events.
+
+    Without ``contact`` every event is sent; with it only that contact's.
+    Event types: ``message`` (a conversation message was stored), ``booking``
+    and ``trigger`` (created or status changed). A client that falls too far
+    behind gets an ``evicted`` event and the stream ends; it should reconnect
+    and refetch what it shows (e.g. history with ``after_id``).
+    """
+    topic = event_hub.contact_topic(normalize_contact(contact)) if contact else event_hub.GLOBAL_TOPIC
+    try:
+        subscription = event_hub.subscribe([topic])
+    except event_hub.HubFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info(f"Event stream opened on {topic}")
+
+    async def events():
+        try:
+            yield format_event("ready", {"topic": topic})
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.EVENTS_HEARTBEAT)
+                except StopAsyncIteration:
+                    if subscription.evicted:
+                        yield format_event("evicted", {"reason": "too slow"})
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event["type"], event, event_id=event["id"])
+        finally:
+            event_hub.unsubscribe(subscription)
+            logger.info(f"Event stream closed on {topic}")
+
+    return sse_response(events())
@@ -1,9 +1,15 @@
-﻿from fastapi import APIRouter
-from src.schemas.message import GenerateMessageRequest, GenerateMessageResponse
+﻿import json
+from typing import Optional
+from fastapi import APIRouter, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
+from src.schemas.message import GenerateMessageRequest, GenerateMessageResponse, GenerateMessageBatchRequest
 from src.services.template_engine import render_template
 from src.services.scoring_engine import score_message
 from src.services.openai_service import rewrite_message
 from src.services.conversation_service import store_generated_message
+from src.services.generation_service import generate_batch, parse_leads_csv
+from src.config.settings import settings
+from src.core.exceptions import ValidationError
 from src.core.logging import logger
 
 router = APIRouter()
@@ -66,3 +72,44 @@ async def generate_message(request: GenerateMessageRequest):
         stage=request.stage.value,
         tone=request.tone.value,
     )
+
+
+async def _ndjson(items, concurrency, errors=()):
+    """Stream batch results as NDJSON, ending with a summary line."""
+    generated = failed = 0
+    for index, error in errors:
+        failed += 1
+        yield json.dumps({"index": index, "success": False, "error": error}) + "\n"
+    async for result in generate_batch(items, concurrency):
+        if result["success"]:
+            generated += 1
+        else:
+            failed += 1
+        yield json.dumps(result) + "\n"
+    yield json.dumps({"done": True, "generated": generated, "failed": failed}) + "\n"
+
+
+@router.post("/generate-message/batch")
+async def generate_message_batch(request: GenerateMessageBatchRequest):
+    """Generate messages for many leads; results stream back as NDJSON in completion order."""
+    logger.info(f"Batch generating messages for {len(request.items)} leads")
+    items = list(enumerate(request.items))
+    return StreamingResponse(_ndjson(items, request.concurrency), media_type="application/x-ndjson")
+
+
+@router.post("/generate-message/batch/csv")
+async def generate_message_batch_csv(
+    file: UploadFile = File(..., description="CSV with GenerateMessageRequest columns"),
+    concurrency: Optional[int] = Form(None, ge=1, le=64),
+):
+    """Generate messages for every lead in an uploaded CSV; results stream back as NDJSON."""
+    data = await file.read(settings.GENERATION_CSV_MAX_BYTES + 1)
+    if len(data) > settings.GENERATION_CSV_MAX_BYTES:
+        raise ValidationError(f"CSV is larger than {settings.GENERATION_CSV_MAX_BYTES} bytes")
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValidationError("CSV must be UTF-8 encoded")
+    items, errors = parse_leads_csv(text)
+    logger.info(f"Batch generating messages from CSV: {len(items)} valid rows, {len(errors)} invalid")
+    return StreamingResponse(_ndjson(items, concurrency, errors), media_type="application/x-ndjson")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from src.core import metrics
+from src.services.inbox_service import inbox_depth
+
+router = APIRouter()
+
+
+@router.get("/metrics", tags=["Metrics"])
+async def get_metrics():
+    """In-process runtime metrics: connection pool usage and latency histograms."""
+    return {"success": True, "metrics": metrics.snapshot()}
+
+
+@router.get("/metrics/inbox", tags=["Metrics"])
+async def get_inbox_metrics():
+    """Inbound webhook queue depth per status and age of the oldest waiting event."""
+    return {"success": True, "inbox": await inbox_depth()}
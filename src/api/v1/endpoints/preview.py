@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Query
+from src.core.exceptions import OpenAIServiceError
+from src.core.logging import logger
+from src.core.sse import format_event, sse_response
+from src.schemas.message import GenerateMessageRequest
+from src.services.openai_service import parse_rewrite_response, stream_chat_completion, stream_rewrite_message
+from src.services.scoring_engine import score_message
+from src.services.template_engine import render_template
+from src.services.trigger_service import build_reply_context
+
+router = APIRouter()
+
+
+@router.get("/preview/reply/{phone_number}")
+async def preview_reply(phone_number: str, message: str = Query(..., min_length=1, max_length=4096)):
+    """Stream the reply the AI would send to this lead, as Server-Sent Events.
+
+    Uses the same context as a real inbound message (history, trigger and
+    pending bookings) but nothing is stored or sent and no booking actions run.
+    Emits ``token`` events, then ``done`` with the full text (or ``error``).
+    """
+    logger.info(f"Previewing reply for {phone_number}")
+
+    async def events():
+        context = await build_reply_context(phone_number)
+        messages = [*context, {"role": "user", "content": message}]
+        parts = []
+        try:
+            async for text in stream_chat_completion(messages):
+                parts.append(text)
+                yield format_event("token", {"text": text})
+        except OpenAIServiceError as e:
+            yield format_event("error", {"message": e.message})
+            return
+        yield format_event("done", {"reply": "".join(parts).strip()})
+
+    return sse_response(events())
+
+
+@router.post("/preview/generate-message")
+async def preview_generate_message(request: GenerateMessageRequest):
+    """Stream a generated message as Server-Sent Events without storing it.
+
+    ``token`` events carry the raw rewrite output as it arrives; the final
+    ``done`` event has the parsed subject/message/CTA and score, the same
+    shape as ``POST /generate-message``.
+    """
+    logger.info(f"Previewing message for lead={request.name} company={request.company} stage={request.stage}")
+    rendered = render_template(
+        name=request.name,
+        role=request.role,
+        company=request.company,
+        industry=request.industry,
+        pain_point=request.pain_point,
+        stage=request.stage,
+        tone=request.tone,
+    )
+
+    async def events():
+        subject, body, cta = rendered["subject"], rendered["body"], rendered["cta"]
+        if request.use_ai_rewrite:
+            parts = []
+            try:
+                async for text in stream_rewrite_message(
+                    draft_message=body,
+                    subject=subject,
+                    cta=cta,
+                    tone_instruction=rendered["tone_instruction"],
+                ):
+                    parts.append(text)
+                    yield format_event("token", {"text": text})
+            except OpenAIServiceError as e:
+                yield format_event("error", {"message": e.message})
+                return
+            rewritten = parse_rewrite_response("".join(parts), subject, body, cta)
+            subject, body, cta = rewritten["subject"], rewritten["message"], rewritten["cta"]
+        score = score_message(message=body, subject=subject, cta=cta, stage=request.stage, tone=request.tone)
+        yield format_event("done", {
+            "success": True,
+            "subject": subject,
+            "message": body,
+            "cta": cta,
+            "score": score,
+            "stage": request.stage.value,
+            "tone": request.tone.value,
+        })
+
+    return sse_response(events())
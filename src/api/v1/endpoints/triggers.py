@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Query
-from typing import Optional
+from fastapi import APIRouter, File, Form, Query, UploadFile
+from typing import List, Optional
 from src.schemas.trigger import (
     CreateTriggerRequest,
     TriggerResponse,
     TriggerListResponse,
     CreateDripCampaignRequest,
     DripCampaignResponse,
+    CreateCampaignRequest,
+    CampaignResponse,
+    TriggerChannel,
 )
 from src.services.trigger_service import (
     create_trigger,
     get_all_triggers,
     cancel_trigger,
     cancel_campaign,
+    create_campaign,
+    get_campaign,
+    parse_recipients_csv,
 )
+from src.config.settings import settings
+from src.core.exceptions import ValidationError, not_found
 from src.core.logging import logger
 
 router = APIRouter()
@@ -96,6 +104,72 @@ async def create_drip_campaign(request: CreateDripCampaignRequest):
     )
 
 
+@router.post("/triggers/campaigns", response_model=CampaignResponse)
+async def create_campaign_endpoint(request: CreateCampaignRequest):
+    """Create a campaign for many recipients; steps are personalized and sent when due."""
+    logger.info(
+        f"Creating campaign: {request.name} recipients={len(request.recipients)} steps={len(request.messages)}"
+    )
+    campaign = await create_campaign(
+        name=request.name,
+        channel=request.channel.value,
+        recipients=[recipient.model_dump() for recipient in request.recipients],
+        messages=request.messages,
+        subject_prefix=request.subject_prefix,
+        start_delay_minutes=request.start_delay_minutes,
+        delay_between_minutes=request.delay_between_minutes,
+        max_retries=request.max_retries,
+        stop_on_reply=request.stop_on_reply,
+    )
+    return CampaignResponse(success=True, **campaign)
+
+
+@router.post("/triggers/campaigns/upload", response_model=CampaignResponse)
+async def upload_campaign_endpoint(
+    file: UploadFile = File(...),
+    name: str = Form(..., min_length=1, max_length=200),
+    channel: TriggerChannel = Form(...),
+    messages: List[str] = Form(...),
+    subject_prefix: Optional[str] = Form(None),
+    start_delay_minutes: int = Form(0, ge=0, le=43200),
+    delay_between_minutes: int = Form(1440, ge=0),
+    max_retries: int = Form(3, ge=1, le=10),
+    stop_on_reply: bool = Form(True),
+):
+    """Create a campaign from a CSV of recipients (see parse_recipients_csv)."""
+    if len(messages) > 10:
+        raise ValidationError("A campaign has at most 10 messages")
+    data = await file.read(settings.CAMPAIGN_CSV_MAX_BYTES + 1)
+    if len(data) > settings.CAMPAIGN_CSV_MAX_BYTES:
+        raise ValidationError(f"CSV is larger than {settings.CAMPAIGN_CSV_MAX_BYTES} bytes")
+    try:
+        recipients = parse_recipients_csv(data.decode("utf-8-sig"))
+    except UnicodeDecodeError:
+        raise ValidationError("CSV must be UTF-8 encoded")
+    logger.info(f"Creating campaign from CSV: {name} recipients={len(recipients)} steps={len(messages)}")
+    campaign = await create_campaign(
+        name=name,
+        channel=channel.value,
+        recipients=recipients,
+        messages=messages,
+        subject_prefix=subject_prefix,
+        start_delay_minutes=start_delay_minutes,
+        delay_between_minutes=delay_between_minutes,
+        max_retries=max_retries,
+        stop_on_reply=stop_on_reply,
+    )
+    return CampaignResponse(success=True, **campaign)
+
+
+@router.get("/triggers/campaigns/{campaign_id}", response_model=CampaignResponse)
+async def get_campaign_endpoint(campaign_id: int):
+    """Campaign progress: trigger counts by status."""
+    campaign = await get_campaign(campaign_id)
+    if campaign is None:
+        not_found(f"Campaign {campaign_id} not found")
+    return CampaignResponse(success=True, detail="Campaign progress", **campaign)
+
+
 @router.delete("/triggers/campaign/{campaign_name}")
 async def cancel_campaign_endpoint(campaign_name: str):
     """Cancel all triggers in a campaign."""
@@ -1,6 +1,8 @@
 ﻿from fastapi import APIRouter, Request
 from fastapi.responses import Response, JSONResponse
 from src.services.trigger_service import handle_lead_reply
+from src.services.inbox_service import enqueue_events
+from src.services.idempotency_service import claim_message, record_reply, release_message
 from src.services.twilio_service import build_twiml_response
 from src.config.settings import settings
 from src.core.logging import logger
@@ -18,7 +20,7 @@ async def whatsapp_webhook(
     request: Request,
     Body: str = Body(None, description="Incoming message body (Twilio: form, Meta: JSON)", embed=True),
     From: str = Body(None, description="Sender phone number (Twilio: form, Meta: JSON)", embed=True),
-    messages: dict = Body(None, description="Meta WhatsApp: messages payload", embed=True),
+    messages: list | dict = Body(None, description="Meta WhatsApp: messages payload (list or single object)", embed=True),
     type: str = Body(None, description="Meta WhatsApp: message type", embed=True),
     chat_id: str = Body(None, description="Meta WhatsApp: chat id", embed=True),
     id: str = Body(None, description="Meta WhatsApp: message id", embed=True),
@@ -42,6 +44,7 @@ async def _handle_twilio_whatsapp_post(request: Request):
         form_data = await request.form()
         body = str(form_data.get("Body", "")).strip()
         from_number = str(form_data.get("From", "")).strip()
+        message_sid = str(form_data.get("MessageSid", "")).strip()
 
         logger.info(f"Twilio WhatsApp webhook: From={from_number} Body={body[:80]}")
 
@@ -53,11 +56,7 @@ async def _handle_twilio_whatsapp_post(request: Request):
             twiml = build_twiml_response("Sorry, something went wrong.")
             return Response(content=twiml, media_type="application/xml")
 
-        ai_reply = await handle_lead_reply(
-            phone_number=from_number,
-            message_text=body,
-            channel="whatsapp",
-        )
+        ai_reply = await _reply_once(message_sid, from_number, body, "whatsapp")
 
         twiml = build_twiml_response(ai_reply)
         return Response(content=twiml, media_type="application/xml")
@@ -68,6 +67,28 @@ async def _handle_twilio_whatsapp_post(request: Request):
         return Response(content=twiml, media_type="application/xml")
 
 
+async def _reply_once(message_sid, from_number, body, channel):
+    """Handle a Twilio message once per MessageSid.
+
+    A redelivery gets the first delivery's reply back (or None, i.e. an empty
+    TwiML response, while the first delivery is still being processed)
+    without calling the LLM or storing anything again.
+    """
+    if not message_sid:
+        return await handle_lead_reply(phone_number=from_number, message_text=body, channel=channel)
+
+    is_new, reply = await claim_message("twilio", message_sid)
+    if not is_new:
+        return reply
+    try:
+        reply = await handle_lead_reply(phone_number=from_number, message_text=body, channel=channel)
+    except Exception:
+        await release_message("twilio", message_sid)
+        raise
+    await record_reply("twilio", message_sid, reply)
+    return reply
+
+
 # ─── Meta WhatsApp Cloud API Webhook ──────────────────────────────────────────
 
 async def _handle_meta_whatsapp_post(request: Request):
@@ -81,6 +102,7 @@ async def _handle_meta_whatsapp_post(request: Request):
         if not isinstance(messages, list):
             messages = [messages]
 
+        events = []
         for msg in messages:
             if not msg:
                 continue
@@ -107,26 +129,24 @@ async def _handle_meta_whatsapp_post(request: Request):
             clean_from = from_number.replace("@s.whatsapp.net", "")
             logger.info(f"Whapi WhatsApp: From=+{clean_from} Body={body[:80]}")
 
-            # Mark as read
-            from src.services.meta_whatsapp_service import mark_message_read
-            await mark_message_read(msg_id)
-
-            # Generate AI reply
-            ai_reply = await handle_lead_reply(
-                phone_number=f"+{clean_from}",
-                message_text=body,
-                channel="whatsapp",
-            )
-
-            # Send reply via Whapi
-            from src.services.meta_whatsapp_service import send_whatsapp
-            await send_whatsapp(to=f"+{clean_from}", message=ai_reply)
+            events.append({
+                "source": "whapi",
+                "channel": "whatsapp",
+                "sender": f"+{clean_from}",
+                "body": body,
+                "external_id": msg_id,
+                "payload": msg,
+            })
 
-        return JSONResponse(content={"status": "ok"}, status_code=200)
+        # Persist and acknowledge; the inbox consumers mark each message read,
+        # generate the AI reply and send it via Whapi.
+        queued = await enqueue_events(events, dedup_source="whapi")
+        return JSONResponse(content={"status": "ok", "queued": queued}, status_code=200)
 
     except Exception as e:
+        # Not persisted: let Whapi redeliver instead of dropping the message.
         logger.error(f"Whapi webhook error: {e}")
-        return JSONResponse(content={"status": "error"}, status_code=200)
+        return JSONResponse(content={"status": "error"}, status_code=503)
 
 
 @router.get("/whatsapp")
@@ -149,6 +169,7 @@ async def sms_webhook(request: Request):
         form_data = await request.form()
         body = str(form_data.get("Body", "")).strip()
         from_number = str(form_data.get("From", "")).strip()
+        message_sid = str(form_data.get("MessageSid", "")).strip()
 
         logger.info(f"SMS webhook: From={from_number} Body={body[:80]}")
 
@@ -160,11 +181,7 @@ async def sms_webhook(request: Request):
             twiml = build_twiml_response("Sorry, something went wrong.")
             return Response(content=twiml, media_type="application/xml")
 
-        ai_reply = await handle_lead_reply(
-            phone_number=from_number,
-            message_text=body,
-            channel="sms",
-        )
+        ai_reply = await _reply_once(message_sid, from_number, body, "sms")
 
         twiml = build_twiml_response(ai_reply)
         return Response(content=twiml, media_type="application/xml")
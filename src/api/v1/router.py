@@ -1,6 +1,6 @@
 ﻿from fastapi import APIRouter
 from src.api.v1.endpoints import health, messages, channels, webhooks, triggers, bookings
-from src.api.v1.endpoints import conversations, analytics
+from src.api.v1.endpoints import conversations, analytics, metrics, preview, events
 
 api_router = APIRouter()
 
@@ -12,3 +12,6 @@ api_router.include_router(triggers.router, tags=["Triggers"])
 api_router.include_router(bookings.router, tags=["Bookings"])
 api_router.include_router(conversations.router, tags=["Conversations"])
 api_router.include_router(analytics.router, tags=["Analytics"])
+api_router.include_router(metrics.router, tags=["Metrics"])
+api_router.include_router(preview.router, tags=["Preview"])
+api_router.include_router(events.router, tags=["Events"])
@@ -10,16 +10,41 @@ class Settings(BaseSettings):
 
     # Groq (replaces OpenAI)
     GROQ_API_KEY: str = "default_groq_api_key"
+    # Concurrent completions (also the keep-alive pool size), per-call timeout (s),
+    # and how long (s) a request may wait for a slot before it is rejected
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT: float = 30.0
+    LLM_QUEUE_TIMEOUT: float = 20.0
+    # Completion cache for reusable prompts (rewrites, trigger openers): entries
+    # kept in memory, their lifetime (s), and whether to also persist them in
+    # SQLite so they survive restarts and are shared between processes
+    LLM_CACHE_SIZE: int = 2000
+    LLM_CACHE_TTL: float = 86400.0
+    LLM_CACHE_PERSIST: bool = False
+
+    # Batch message generation: default and maximum concurrent AI rewrites per
+    # batch, how many results are buffered per generated_messages insert, and
+    # the largest CSV upload accepted (bytes)
+    GENERATION_CONCURRENCY: int = 8
+    GENERATION_MAX_CONCURRENCY: int = 32
+    GENERATION_FLUSH_ROWS: int = 500
+    GENERATION_CSV_MAX_BYTES: int = 5 * 1024 * 1024
 
     # Twilio
     TWILIO_ACCOUNT_SID: str = "default_twilio_account_sid"
     TWILIO_AUTH_TOKEN: str = "default_twilio_auth_token"
     TWILIO_WHATSAPP_NUMBER: str = "default_twilio_whatsapp_number"
     TWILIO_SMS_NUMBER: str = "default_twilio_sms_number"
+    # Concurrent Messages API calls (also the keep-alive pool size) and per-call timeout (s)
+    TWILIO_MAX_CONCURRENCY: int = 10
+    TWILIO_TIMEOUT: float = 15.0
 
     # SendGrid
     SENDGRID_API_KEY: str = "default_sendgrid_api_key"
     SENDGRID_FROM_EMAIL: str = "default_sendgrid_from_email"
+    # Concurrent mail/send calls (also the keep-alive pool size) and per-call timeout (s)
+    SENDGRID_MAX_CONCURRENCY: int = 4
+    SENDGRID_TIMEOUT: float = 30.0
 
     # WhatsApp provider: "twilio" or "meta" (meta = Whapi)
     WHATSAPP_PROVIDER: str = "twilio"
@@ -30,6 +55,110 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./salespulse.db"
 
+    # Connection pool: reader connections, checkout timeout (s), and idle time (s)
+    # after which a pooled connection is pinged before reuse
+    DB_POOL_SIZE: int = 4
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_HEALTH_CHECK_INTERVAL: float = 30.0
+
+    # SQLite storage profile, applied to every connection the pool opens.
+    # Negative DB_CACHE_SIZE is in KiB (SQLite convention); checkpoint interval
+    # is in seconds, 0 disables the background WAL checkpoint task.
+    DB_JOURNAL_MODE: str = "WAL"
+    DB_SYNCHRONOUS: str = "NORMAL"
+    DB_MMAP_SIZE: int = 268435456
+    DB_CACHE_SIZE: int = -65536
+    DB_TEMP_STORE: str = "MEMORY"
+    DB_BUSY_TIMEOUT_MS: int = 5000
+    DB_CHECKPOINT_INTERVAL: float = 300.0
+
+    # Trigger scheduler: concurrent trigger executions, how often (s) the in-memory
+    # deadline heap is re-seeded from the database, how far ahead (s) due times are
+    # loaded on each re-seed, and how long (s) shutdown waits for in-flight sends
+    SCHEDULER_MAX_WORKERS: int = 8
+    SCHEDULER_RESYNC_INTERVAL: float = 60.0
+    SCHEDULER_HORIZON: float = 3600.0
+    SCHEDULER_SHUTDOWN_GRACE: float = 10.0
+
+    # Seconds a worker's claim on a trigger stays valid; renewed while the send
+    # runs, and reclaimable by any worker once it lapses (e.g. after a crash)
+    TRIGGER_LEASE_SECONDS: int = 120
+
+    # Inbound webhook queue: consumer tasks (contacts processed concurrently;
+    # each contact's messages are handled in order), most messages from one
+    # contact answered with a single reply, attempts before an event is
+    # dead-lettered, base retry delay (s, doubled per attempt), how long (s) a
+    # consumer's claim lasts (renewed while it processes the events), and the
+    # idle poll interval (s)
+    INBOX_CONSUMERS: int = 4
+    INBOX_COALESCE_MAX: int = 10
+    INBOX_MAX_ATTEMPTS: int = 5
+    INBOX_RETRY_DELAY: float = 5.0
+    INBOX_LEASE_SECONDS: int = 120
+    INBOX_POLL_INTERVAL: float = 5.0
+
+    # Webhook deduplication by provider message id: in-memory entries and their
+    # TTL (s), how long (h) durable receipts are kept, and how many new receipts
+    # are recorded between prunes of expired ones
+    DEDUP_CACHE_SIZE: int = 10000
+    DEDUP_CACHE_TTL: float = 3600.0
+    DEDUP_RETENTION_HOURS: int = 72
+    DEDUP_PRUNE_EVERY: int = 1000
+
+    # Per-contact prompt context cache (recent turns, trigger context, pending
+    # bookings): max contacts, memory budget (bytes), turns kept per contact, and
+    # how long (s) an entry may be served before it is reloaded, which bounds
+    # staleness from writes made by other processes
+    CONTEXT_CACHE_ENTRIES: int = 5000
+    CONTEXT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    CONTEXT_CACHE_TURNS: int = 20
+    CONTEXT_CACHE_TTL: float = 300.0
+
+    # Analytics rollups: how often (s) new rows are folded into the time-bucket
+    # tables (0 disables the background task), rows read per source per refresh,
+    # the most buckets a single range query may return, and how old (s) a row
+    # must be before PostgreSQL rollups fold it in (its insert has committed)
+    ROLLUP_INTERVAL: float = 60.0
+    ROLLUP_BATCH: int = 50000
+    ROLLUP_MAX_POINTS: int = 2000
+    ROLLUP_LAG: float = 10.0
+
+    # Live dashboard events: events buffered per subscriber before it is evicted
+    # as too slow, max concurrent subscribers, and the keep-alive interval (s)
+    EVENTS_QUEUE_SIZE: int = 256
+    EVENTS_MAX_SUBSCRIBERS: int = 500
+    EVENTS_HEARTBEAT: float = 15.0
+
+    # Write batching for conversation and sent-message inserts: durability mode
+    # ("immediate", "group" or "deferred"; see src/db/batcher.py), most rows per
+    # transaction, how long (ms) a buffered row may wait for its batch to fill,
+    # and how many buffered rows make further writers wait
+    WRITE_BATCH_DURABILITY: str = "group"
+    WRITE_BATCH_MAX_ROWS: int = 500
+    WRITE_BATCH_MAX_DELAY_MS: float = 2.0
+    WRITE_BATCH_MAX_PENDING: int = 50000
+
+    # Outbound send rate limits (see src/services/rate_limiter.py): requests per
+    # second and burst per sender (Twilio number, Whapi channel, SendGrid from
+    # address); the floor a 429 can cut the rate to and the share of it won back
+    # per success, as fractions of the configured rate; how often one send is
+    # re-queued after a 429; and the longest (s) a send may wait for its turn
+    RATE_LIMIT_TWILIO_RPS: float = 30.0
+    RATE_LIMIT_TWILIO_BURST: int = 30
+    RATE_LIMIT_WHAPI_RPS: float = 5.0
+    RATE_LIMIT_WHAPI_BURST: int = 10
+    RATE_LIMIT_SENDGRID_RPS: float = 10.0
+    RATE_LIMIT_SENDGRID_BURST: int = 10
+    RATE_LIMIT_MIN_FACTOR: float = 0.05
+    RATE_LIMIT_RECOVERY: float = 0.05
+    RATE_LIMIT_MAX_THROTTLED: int = 5
+    RATE_LIMIT_MAX_WAIT: float = 300.0
+
+    # Bulk campaigns: most recipients accepted in one campaign, and the largest
+    # recipient CSV upload accepted (bytes)
+    CAMPAIGN_MAX_RECIPIENTS: int = 50000
+    CAMPAIGN_CSV_MAX_BYTES: int = 5 * 1024 * 1024
+
     # System Prompt
     SYSTEM_PROMPT: str = (
         "You are SalesPulse AI, an intelligent sales and booking assistant on WhatsApp. "
@@ -0,0 +1,34 @@
+import re
+
+_CHANNEL_PREFIXES = ("whatsapp:", "sms:", "tel:")
+_WHATSAPP_SUFFIXES = ("@s.whatsapp.net", "@c.us")
+
+
+def normalize_contact(value):
+    """Return the canonical contact key used for indexed lookups.
+
+    Phone numbers in any of the formats we receive ("whatsapp:+1415...",
+    "+1 (415) ...", "1415...@s.whatsapp.net", "001415...") become E.164
+    ("+1415..."). Email addresses are lower-cased. Empty input gives None.
+    """
+    if value is None:
+        return None
+    key = str(value).strip().lower()
+    if not key:
+        return None
+    for prefix in _CHANNEL_PREFIXES:
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+            break
+    for suffix in _WHATSAPP_SUFFIXES:
+        if key.endswith(suffix):
+            key = key[: -len(suffix)]
+            break
+    if "@" in key:
+        return key
+    digits = re.sub(r"\D", "", key)
+    if not digits:
+        return key
+    if digits.startswith("00"):
+        digits = digits[2:]
+    return f"+{digits}"
@@ -28,6 +28,11 @@ class WhatsAppCloudAPIError(SalesPulseException):
         super().__init__(message=message, status_code=503)
 
 
+class RateLimitError(SalesPulseException):
+    def __init__(self, message: str = "Outbound send rate limit exceeded"):
+        super().__init__(message=message, status_code=429)
+
+
 class DatabaseError(SalesPulseException):
     def __init__(self, message: str = "Database operation failed"):
         super().__init__(message=message, status_code=500)
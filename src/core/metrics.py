@@ -0,0 +1,73 @@
+import bisect
+
+# Upper bounds (milliseconds) used by latency histograms unless overridden.
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_histograms = {}
+_collectors = {}
+
+
+class Histogram:
+    """Fixed-bucket histogram for latency-style measurements."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return float(bound)
+        return round(self.max, 2)
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"le_{bound}"] = cumulative
+        buckets["le_inf"] = self.count
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 2) if self.count else 0.0,
+            "max": round(self.max, 2),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS_MS):
+    """Get or create the named histogram."""
+    if name not in _histograms:
+        _histograms[name] = Histogram(buckets)
+    return _histograms[name]
+
+
+def register_collector(name, fn):
+    """Register a callable returning a dict of stats to include in snapshots."""
+    _collectors[name] = fn
+
+
+def snapshot():
+    """Return every registered histogram and collector as a plain dict."""
+    data = {name: fn() for name, fn in _collectors.items()}
+    data["histograms"] = {name: h.snapshot() for name, h in sorted(_histograms.items())}
+    return data
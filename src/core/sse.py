@@ -0,0 +1,15 @@
+import json
+from fastapi.responses import StreamingResponse
+
+# Keep proxies (nginx) from buffering or caching the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_event(name, data, event_id=None):
+    """One Server-Sent Events message with a JSON payload."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from src.config.settings import settings
+from src.core import metrics
+from src.core.logging import logger
+from src.db.session import unit_of_work
+
+# Group commit for high-volume inserts. Rows submitted from any coroutine are
+# buffered, and one flush task per batcher writes up to WRITE_BATCH_MAX_ROWS
+# of them in a single transaction, so a batch costs one commit (one fsync)
+# instead of one per row. A batch is flushed once it is full or its oldest
+# row has waited WRITE_BATCH_MAX_DELAY_MS; rows arriving during a flush form
+# the next batch.
+#
+# WRITE_BATCH_DURABILITY:
+#   immediate  no batching: each row is committed on its own before the call returns
+#   group      the caller waits until the batch holding its row has committed
+#   deferred   the caller returns once the row is buffered; rows not flushed
+#              yet are lost if the process dies (shutdown flushes them)
+DURABILITY_MODES = ("immediate", "group", "deferred")
+
+_batchers = {}
+
+
+def _durability():
+    mode = settings.WRITE_BATCH_DURABILITY.lower()
+    if mode not in DURABILITY_MODES:
+        raise ValueError(f"Invalid WRITE_BATCH_DURABILITY: {mode}")
+    return mode
+
+
+class WriteBatcher:
+    """Buffers rows for ``write(uow, rows)``, which inserts them inside ``uow``
+    and returns one result per row (e.g. the new ids)."""
+
+    def __init__(self, name, write):
+        self.name = name
+        self.write = write
+        self.loop = None
+        self._pending = []
+        self._oldest_at = None
+        self._task = None
+        self._closing = False
+        self._stats = {"batches": 0, "rows": 0, "failed_batches": 0, "failed_rows": 0}
+        self._batch_rows = metrics.histogram(f"batch.{name}.rows", (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000))
+        self._flush_ms = metrics.histogram(f"batch.{name}.flush_ms")
+        _batchers[name] = self
+        metrics.register_collector(f"batch.{name}", self.stats)
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # Rows buffered on a previous event loop (tests) cannot be flushed here.
+            self.loop = loop
+            self._pending = []
+            self._task = None
+            self._ready = asyncio.Event()
+            self._full = asyncio.Event()
+            self._room = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, row):
+        """Write ``row``; returns its result, or None in deferred mode."""
+        mode = _durability()
+        if mode == "immediate":
+            async with unit_of_work() as uow:
+                return (await self.write(uow, [row]))[0]
+        self._bind()
+        while len(self._pending) >= settings.WRITE_BATCH_MAX_PENDING:
+            self._room.clear()
+            await self._room.wait()
+        future = self.loop.create_future() if mode == "group" else None
+        if not self._pending:
+            self._oldest_at = time.monotonic()
+        self._pending.append((row, future))
+        self._ready.set()
+        if len(self._pending) >= settings.WRITE_BATCH_MAX_ROWS:
+            self._full.set()
+        if future is not None:
+            return await future
+        return None
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            wait = self._oldest_at + settings.WRITE_BATCH_MAX_DELAY_MS / 1000 - time.monotonic()
+            if wait > 0 and not self._closing and len(self._pending) < settings.WRITE_BATCH_MAX_ROWS:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            size = settings.WRITE_BATCH_MAX_ROWS
+            batch, self._pending = self._pending[:size], self._pending[size:]
+            self._oldest_at = time.monotonic() if self._pending else None
+            self._room.set()
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            async with unit_of_work() as uow:
+                results = await self.write(uow, [row for row, _ in batch])
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            if len(batch) > 1:
+                # Don't let one bad row sink the rest: retry each on its own.
+                logger.warning(f"{self.name} batch of {len(batch)} failed ({e}); retrying rows one by one")
+                for item in batch:
+                    await self._flush([item])
+                return
+            self._stats["failed_rows"] += 1
+            _, future = batch[0]
+            if future is None:
+                logger.error(f"Failed to write deferred {self.name} row: {e}")
+            elif not future.done():
+                future.set_exception(e)
+            return
+        self._stats["batches"] += 1
+        self._stats["rows"] += len(batch)
+        self._batch_rows.observe(len(batch))
+        self._flush_ms.observe((time.perf_counter() - started) * 1000)
+        for (_, future), result in zip(batch, results):
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def stop(self):
+        """Flush everything buffered, then stop the flush task."""
+        if self._task is None or self.loop is not asyncio.get_running_loop():
+            return
+        self._closing = True
+        self._ready.set()
+        self._full.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    def stats(self):
+        return {**self._stats, "pending": len(self._pending), "durability": settings.WRITE_BATCH_DURABILITY}
+
+
+async def stop_batchers():
+    """Flush and stop every batcher, e.g. on shutdown before the pool is closed."""
+    for batcher in list(_batchers.values()):
+        try:
+            await batcher.stop()
+        except Exception as e:
+            logger.error(f"Failed to flush {batcher.name} writes: {e}")
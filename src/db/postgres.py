@@ -0,0 +1,360 @@
+import asyncio
+import functools
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
+import asyncpg
+from src.core import metrics
+from src.core.exceptions import DatabaseError
+from src.core.logging import logger
+
+# PostgreSQL backend, used when DATABASE_URL is a postgresql:// URL. The
+# services write their SQL once, with "?" placeholders and SQLite-style
+# types (timestamps are "YYYY-MM-DD HH:MM:SS" text, flags are integers), and
+# PgConnection offers the part of the aiosqlite connection API they use, so
+# the same queries run on both backends. Unlike SQLite there is no single
+# writer: every writer() checkout is its own pooled connection and transaction.
+
+_TOKENS = re.compile(r"'(?:[^']|'')*'|\?")
+_RETURNS_ROWS = re.compile(r"^\s*(SELECT|WITH|VALUES)\b|\bRETURNING\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def convert_placeholders(sql):
+    """Rewrite "?" placeholders as $1, $2, ... (leaving string literals alone)."""
+    numbers = itertools.count(1)
+    return _TOKENS.sub(lambda m: f"${next(numbers)}" if m.group(0) == "?" else m.group(0), sql)
+
+
+class PgCursor:
+    """Result of PgConnection.execute, shaped like an aiosqlite cursor."""
+
+    lastrowid = None  # use RETURNING id instead
+
+    def __init__(self, rows, rowcount):
+        self._rows = rows
+        self._next = 0
+        self.rowcount = rowcount
+
+    async def fetchone(self):
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    async def fetchall(self):
+        rows = self._rows[self._next:]
+        self._next = len(self._rows)
+        return rows
+
+
+class PgConnection:
+    """An asyncpg connection behind the aiosqlite calls the services make.
+
+    A writer connection opens a transaction on its first statement, like
+    SQLite's implicit BEGIN; readers run in autocommit.
+    """
+
+    def __init__(self, conn, transactional):
+        self.raw = conn
+        self.transactional = transactional
+        self._transaction = None
+
+    @property
+    def in_transaction(self):
+        return self._transaction is not None
+
+    async def _begin(self):
+        if self.transactional and self._transaction is None:
+            self._transaction = self.raw.transaction()
+            await self._transaction.start()
+
+    async def execute(self, sql, params=()):
+        await self._begin()
+        query = convert_placeholders(sql)
+        if _RETURNS_ROWS.search(query):
+            rows = await self.raw.fetch(query, *params)
+            return PgCursor(rows, len(rows))
+        status = await self.raw.execute(query, *params)
+        count = status.rsplit(" ", 1)[-1]
+        return PgCursor([], int(count) if count.isdigit() else -1)
+
+    async def executemany(self, sql, rows):
+        await self._begin()
+        await self.raw.executemany(convert_placeholders(sql), [tuple(row) for row in rows])
+
+    async def copy_rows(self, table, columns, rows):
+        """Bulk-insert with COPY, the fastest path into PostgreSQL."""
+        await self._begin()
+        await self.raw.copy_records_to_table(table, records=[tuple(row) for row in rows], columns=list(columns))
+
+    async def commit(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.commit()
+
+    async def rollback(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.rollback()
+
+
+class PostgresPool:
+    """asyncpg connection pool with the reader()/writer() interface of ConnectionPool."""
+
+    def __init__(self, url, size=4, timeout=10.0):
+        # asyncpg takes plain postgresql:// URLs (no SQLAlchemy-style "+driver").
+        self.url = re.sub(r"^postgres(ql)?\+\w+://", "postgresql://", url)
+        self.size = size
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+        self._pool = None
+        self._open_lock = asyncio.Lock()
+        self._closed = False
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_ms = metrics.histogram("db.checkout_ms")
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._open_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(self.url, min_size=1, max_size=self.size)
+                    logger.info(f"PostgreSQL pool opened (max size: {self.size})")
+        return self._pool
+
+    @asynccontextmanager
+    async def _checkout(self, transactional):
+        if self._closed:
+            raise DatabaseError("Database pool is closed")
+        started = time.perf_counter()
+        pool = await self._get_pool()
+        try:
+            conn = await pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise DatabaseError("Timed out waiting for a database connection")
+        self._checkouts += 1
+        self._in_use += 1
+        self._checkout_ms.observe((time.perf_counter() - started) * 1000)
+        wrapped = PgConnection(conn, transactional)
+        try:
+            yield wrapped
+        finally:
+            self._in_use -= 1
+            try:
+                await wrapped.rollback()
+            except Exception as e:
+                logger.warning(f"Rollback on release failed: {e}")
+            await pool.release(conn)
+
+    def reader(self):
+        """Check out a connection in autocommit mode for the duration of the block."""
+        return self._checkout(False)
+
+    def writer(self):
+        """Check out a connection whose uncommitted work is rolled back on exit."""
+        return self._checkout(True)
+
+    async def close(self):
+        self._closed = True
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def stats(self):
+        pool = self._pool
+        return {
+            "backend": "postgresql",
+            "size": self.size,
+            "open": pool.get_size() if pool else 0,
+            "idle": pool.get_idle_size() if pool else 0,
+            "in_use": self._in_use,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+        }
+
+
+# ─── Schema ────────────────────────────────────────────────────────────────────
+# The SQLite schema after every migration in session.MIGRATIONS, with the same
+# column order (some queries use RETURNING * / SELECT * by position). Keep it
+# in step when adding a migration.
+_NOW = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS conversations (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+        message TEXT NOT NULL,
+        channel TEXT NOT NULL DEFAULT 'whatsapp',
+        created_at TEXT DEFAULT {_NOW},
+        contact_key TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_phone ON conversations(phone_number, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_contact ON conversations(contact_key, id)",
+    f"""CREATE TABLE IF NOT EXISTS sent_messages (
+        id BIGSERIAL PRIMARY KEY,
+        recipient TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        subject TEXT,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'sent',
+        external_id TEXT,
+        created_at TEXT DEFAULT {_NOW},
+        contact_key TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_sent_messages_contact ON sent_messages(contact_key, id)",
+    f"""CREATE TABLE IF NOT EXISTS generated_messages (
+        id BIGSERIAL PRIMARY KEY,
+        lead_name TEXT,
+        lead_company TEXT,
+        stage TEXT,
+        subject TEXT,
+        message TEXT NOT NULL,
+        cta TEXT,
+        score DOUBLE PRECISION,
+        created_at TEXT DEFAULT {_NOW}
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS triggers (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        trigger_type TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        recipient_name TEXT,
+        message TEXT NOT NULL,
+        subject TEXT,
+        delay_minutes INTEGER NOT NULL DEFAULT 60,
+        max_retries INTEGER NOT NULL DEFAULT 3,
+        retries_done INTEGER NOT NULL DEFAULT 0,
+        stop_on_reply INTEGER NOT NULL DEFAULT 1,
+        status TEXT NOT NULL DEFAULT 'active',
+        campaign_name TEXT,
+        step_number INTEGER DEFAULT 0,
+        scheduled_at TEXT,
+        executed_at TEXT,
+        created_at TEXT DEFAULT {_NOW},
+        updated_at TEXT DEFAULT {_NOW},
+        contact_key TEXT,
+        claimed_by TEXT,
+        lease_until TEXT,
+        campaign_id BIGINT,
+        variables TEXT
+    )""",
+    "ALTER TABLE triggers ADD COLUMN IF NOT EXISTS campaign_id BIGINT",
+    "ALTER TABLE triggers ADD COLUMN IF NOT EXISTS variables TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_triggers_status ON triggers(status, scheduled_at)",
+    "CREATE INDEX IF NOT EXISTS idx_triggers_recipient ON triggers(recipient, status)",
+    "CREATE INDEX IF NOT EXISTS idx_triggers_contact ON triggers(contact_key, status)",
+    "CREATE INDEX IF NOT EXISTS idx_triggers_campaign ON triggers(campaign_id, status)",
+    f"""CREATE TABLE IF NOT EXISTS campaigns (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        total_recipients INTEGER NOT NULL,
+        total_steps INTEGER NOT NULL,
+        created_at TEXT DEFAULT {_NOW}
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS bookings (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        customer_name TEXT,
+        booking_type TEXT NOT NULL DEFAULT 'general',
+        title TEXT NOT NULL,
+        description TEXT,
+        date TEXT,
+        time TEXT,
+        amount DOUBLE PRECISION,
+        currency TEXT DEFAULT 'INR',
+        status TEXT NOT NULL DEFAULT 'pending',
+        confirmation_code TEXT,
+        notes TEXT,
+        created_at TEXT DEFAULT {_NOW},
+        updated_at TEXT DEFAULT {_NOW},
+        confirmed_at TEXT,
+        cancelled_at TEXT,
+        contact_key TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_phone ON bookings(phone_number, status)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_code ON bookings(confirmation_code)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_contact ON bookings(contact_key, status)",
+    """CREATE TABLE IF NOT EXISTS inbound_events (
+        id BIGSERIAL PRIMARY KEY,
+        source TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        sender TEXT NOT NULL,
+        contact_key TEXT,
+        body TEXT NOT NULL,
+        external_id TEXT,
+        payload TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        reply TEXT,
+        available_at TEXT NOT NULL,
+        claimed_by TEXT,
+        lease_until TEXT,
+        received_at TEXT NOT NULL,
+        processed_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_inbound_events_status ON inbound_events(status, available_at)",
+    "CREATE INDEX IF NOT EXISTS idx_inbound_events_contact ON inbound_events(contact_key, status, id)",
+    """CREATE TABLE IF NOT EXISTS inbound_receipts (
+        source TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        reply TEXT,
+        received_at TEXT NOT NULL,
+        PRIMARY KEY (source, message_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_inbound_receipts_received ON inbound_receipts(received_at)",
+    """CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        call_site TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        expires_at TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)",
+    """CREATE TABLE IF NOT EXISTS stat_counters (
+        name TEXT NOT NULL,
+        bucket TEXT NOT NULL DEFAULT '',
+        value BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, bucket)
+    )""",
+    """CREATE TABLE IF NOT EXISTS stat_rollups (
+        source TEXT NOT NULL,
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        channel TEXT NOT NULL DEFAULT '',
+        kind TEXT NOT NULL DEFAULT '',
+        count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (source, granularity, bucket, channel, kind)
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_marks (
+        source TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS contacts (
+        contact_key TEXT PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        last_message TEXT,
+        last_role TEXT,
+        channel TEXT,
+        last_at TEXT,
+        last_message_id BIGINT NOT NULL,
+        user_msg_count BIGINT NOT NULL DEFAULT 0,
+        total_msg_count BIGINT NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_contacts_recent ON contacts(last_at DESC, last_message_id DESC)",
+]
+
+
+async def create_schema(db):
+    """Create any missing tables and indexes (idempotent) on a writer connection."""
+    # Serialize replicas starting at the same time; released at commit.
+    await db.execute("SELECT pg_advisory_xact_lock(hashtext('salespulse_schema'))")
+    for statement in SCHEMA:
+        await db.execute(statement)
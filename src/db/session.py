@@ -1,20 +1,418 @@
-﻿import aiosqlite
+﻿import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from src.config.settings import settings
+from src.core import metrics
+from src.core.contacts import normalize_contact
+from src.core.exceptions import DatabaseError
 from src.core.logging import logger
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "salespulse.db")
 
+# PRAGMA values cannot be bound as parameters, so enumerated ones are whitelisted.
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+_PRAGMA_ORDER = ("busy_timeout", "journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+
+_checkpoint_task = None
+
+
+def storage_profile_from_settings():
+    """Build the PRAGMA profile applied to each new connection."""
+    return {
+        "busy_timeout": settings.DB_BUSY_TIMEOUT_MS,
+        "journal_mode": settings.DB_JOURNAL_MODE,
+        "synchronous": settings.DB_SYNCHRONOUS,
+        "mmap_size": settings.DB_MMAP_SIZE,
+        "cache_size": settings.DB_CACHE_SIZE,
+        "temp_store": settings.DB_TEMP_STORE,
+    }
+
+
+def _pragma_statements(profile):
+    statements = []
+    for name in _PRAGMA_ORDER:
+        value = profile.get(name)
+        if value is None:
+            continue
+        if name in _PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in _PRAGMA_CHOICES[name]:
+                raise ValueError(f"Invalid value for PRAGMA {name}: {value}")
+        else:
+            value = int(value)
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived aiosqlite connections.
+
+    Readers are checked out from a LIFO queue of at most ``size`` connections.
+    All writes go through one dedicated writer connection guarded by a lock,
+    which matches SQLite's single-writer model and avoids lock contention
+    between our own connections.
+    """
+
+    def __init__(self, path, size=4, timeout=10.0, health_check_interval=30.0, profile=None):
+        self.path = path
+        self.pragmas = _pragma_statements(profile or {})
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.loop = asyncio.get_running_loop()
+        self._idle = asyncio.LifoQueue()
+        self._opened = 0
+        self._writer = None
+        self._writer_last_used = 0.0
+        self._writer_lock = asyncio.Lock()
+        self._closed = False
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._checkpoints = 0
+        self._last_checkpoint = None
+        self._checkout_ms = metrics.histogram("db.checkout_ms")
+
+    async def _connect(self):
+        conn = aiosqlite.connect(self.path)
+        # aiosqlite runs each connection on its own thread; mark it daemon so a
+        # pool that is never closed (tests, crashes) cannot block interpreter exit.
+        conn.daemon = True
+        await conn
+        conn.row_factory = aiosqlite.Row
+        try:
+            for statement in self.pragmas:
+                await conn.execute(statement)
+        except Exception:
+            await self._discard(conn)
+            raise
+        return conn
+
+    @staticmethod
+    async def _discard(conn):
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def _ensure_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return conn
+        try:
+            await conn.execute("SELECT 1")
+            return conn
+        except Exception as e:
+            logger.warning(f"Replacing unhealthy database connection: {e}")
+            self._reconnects += 1
+            await self._discard(conn)
+            return await self._connect()
+
+    async def _acquire_reader(self):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return await self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+            self._waits += 1
+            try:
+                conn, last_used = await asyncio.wait_for(self._idle.get(), self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise DatabaseError("Timed out waiting for a database connection")
+        try:
+            return await self._ensure_healthy(conn, last_used)
+        except Exception:
+            self._opened -= 1
+            raise
+
+    async def _release_reader(self, conn):
+        if self._closed:
+            self._opened -= 1
+            await self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception as e:
+            logger.warning(f"Dropping broken database connection: {e}")
+            self._opened -= 1
+            await self._discard(conn)
+            return
+        self._idle.put_nowait((conn, time.monotonic()))
+
+    def _record_checkout(self, started):
+        self._checkouts += 1
+        self._in_use += 1
+        self._checkout_ms.observe((time.perf_counter() - started) * 1000)
+
+    @asynccontextmanager
+    async def reader(self):
+        """Check out a read connection for the duration of the block."""
+        if self._closed:
+            raise DatabaseError("Database pool is closed")
+        started = time.perf_counter()
+        conn = await self._acquire_reader()
+        self._record_checkout(started)
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            await self._release_reader(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Check out the writer connection; uncommitted work is rolled back on exit."""
+        if self._closed:
+            raise DatabaseError("Database pool is closed")
+        started = time.perf_counter()
+        if self._writer_lock.locked():
+            self._waits += 1
+        try:
+            await asyncio.wait_for(self._writer_lock.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise DatabaseError("Timed out waiting for the database writer")
+        try:
+            if self._writer is None:
+                self._writer = await self._connect()
+            else:
+                self._writer = await self._ensure_healthy(self._writer, self._writer_last_used)
+            self._record_checkout(started)
+            try:
+                yield self._writer
+            finally:
+                self._in_use -= 1
+                self._writer_last_used = time.monotonic()
+                try:
+                    if self._writer.in_transaction:
+                        await self._writer.rollback()
+                except Exception as e:
+                    logger.warning(f"Dropping broken database writer: {e}")
+                    await self._discard(self._writer)
+                    self._writer = None
+        finally:
+            self._writer_lock.release()
+
+    async def checkpoint(self, mode="PASSIVE"):
+        """Run a WAL checkpoint on the writer and return (busy, log_pages, checkpointed)."""
+        mode = mode.upper()
+        if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Invalid checkpoint mode: {mode}")
+        async with self.writer() as db:
+            row = await (await db.execute(f"PRAGMA wal_checkpoint({mode})")).fetchone()
+        self._checkpoints += 1
+        self._last_checkpoint = {"mode": mode, "busy": row[0], "log_pages": row[1], "checkpointed": row[2]}
+        return tuple(row)
+
+    async def close(self):
+        self._closed = True
+        while not self._idle.empty():
+            conn, _ = self._idle.get_nowait()
+            self._opened -= 1
+            await self._discard(conn)
+        async with self._writer_lock:
+            if self._writer is not None:
+                await self._discard(self._writer)
+                self._writer = None
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "open_readers": self._opened,
+            "idle_readers": self._idle.qsize(),
+            "writer_open": self._writer is not None,
+            "in_use": self._in_use,
+            "checkouts": self._checkouts,
+            "waits": self._waits,
+            "timeouts": self._timeouts,
+            "reconnects": self._reconnects,
+            "checkpoints": self._checkpoints,
+            "last_checkpoint": self._last_checkpoint,
+        }
+
+
+_pool = None
+
+
+def is_postgres(url=None):
+    """True when DATABASE_URL (or ``url``) selects the PostgreSQL backend."""
+    scheme = (url or settings.DATABASE_URL).split(":", 1)[0]
+    return scheme.split("+", 1)[0] in ("postgres", "postgresql")
+
+
+def skip_locked():
+    """Row-lock clause for claim subqueries: PostgreSQL skips rows another worker is claiming.
+
+    SQLite has one writer, so it needs (and supports) no such clause.
+    """
+    return " FOR UPDATE SKIP LOCKED" if is_postgres() else ""
+
+
+async def copy_rows(db, table, columns, rows):
+    """Bulk-insert ``rows`` into ``table``: COPY on PostgreSQL, executemany on SQLite."""
+    copy = getattr(db, "copy_rows", None)
+    if copy is not None:
+        await copy(table, columns, rows)
+        return
+    await db.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        rows,
+    )
+
+
+def get_pool():
+    """Return the process-wide pool, creating it for the running event loop.
+
+    DATABASE_URL picks the backend: a postgresql:// URL gets a PostgresPool
+    (src/db/postgres.py, needs asyncpg); anything else the SQLite pool on DB_PATH.
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool.loop is not loop:
+        if _pool is not None:
+            # Connections are bound to a previous loop (e.g. between test runs).
+            loop.create_task(_pool.close())
+        if is_postgres():
+            from src.db.postgres import PostgresPool
+
+            _pool = PostgresPool(settings.DATABASE_URL, size=settings.DB_POOL_SIZE, timeout=settings.DB_POOL_TIMEOUT)
+        else:
+            _pool = ConnectionPool(
+                DB_PATH,
+                size=settings.DB_POOL_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+                health_check_interval=settings.DB_HEALTH_CHECK_INTERVAL,
+                profile=storage_profile_from_settings(),
+            )
+    return _pool
+
+
+def get_db():
+    """Check out a pooled read connection: ``async with get_db() as db``."""
+    return get_pool().reader()
+
+
+def get_write_db():
+    """Check out the pooled writer connection: ``async with get_write_db() as db``."""
+    return get_pool().writer()
+
+
+class UnitOfWork:
+    """Writes for one logical operation, applied in a single transaction.
+
+    ``db`` is the writer connection with the transaction open. Callbacks
+    registered with ``on_commit`` (cache updates, events) run only once the
+    commit has succeeded, so nothing outside the database sees a write that
+    was rolled back.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._hooks = []
+
+    def on_commit(self, hook):
+        self._hooks.append(hook)
+
+    def _run_hooks(self):
+        for hook in self._hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"After-commit hook failed: {e}")
 
-async def get_db() -> aiosqlite.Connection:
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    return db
+
+@asynccontextmanager
+async def unit_of_work(outer=None):
+    """``async with unit_of_work() as uow``: one write transaction, committed on exit.
+
+    An exception inside the block rolls back every write made through
+    ``uow.db``. Pass an enclosing unit as ``outer`` to join its transaction
+    instead; the outermost block commits. Keep network calls out of the block:
+    it holds the single writer connection.
+    """
+    if outer is not None:
+        yield outer
+        return
+    async with get_write_db() as db:
+        uow = UnitOfWork(db)
+        yield uow
+        await db.commit()
+    uow._run_hooks()
+
+
+async def close_db() -> None:
+    global _pool
+    if _pool is not None:
+        if isinstance(_pool, ConnectionPool) and settings.DB_JOURNAL_MODE.upper() == "WAL":
+            try:
+                await _pool.checkpoint("TRUNCATE")
+            except Exception as e:
+                logger.warning(f"Final WAL checkpoint failed: {e}")
+        await _pool.close()
+        _pool = None
+
+
+async def _checkpoint_loop(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            busy, log_pages, checkpointed = await get_pool().checkpoint()
+            logger.debug(f"WAL checkpoint: busy={busy} log={log_pages} checkpointed={checkpointed}")
+        except Exception as e:
+            logger.error(f"WAL checkpoint failed: {e}")
+
+
+def start_checkpointer():
+    """Start the periodic WAL checkpoint task (no-op unless SQLite in WAL mode)."""
+    global _checkpoint_task
+    interval = settings.DB_CHECKPOINT_INTERVAL
+    if interval <= 0 or settings.DB_JOURNAL_MODE.upper() != "WAL" or is_postgres():
+        return
+    if _checkpoint_task is None or _checkpoint_task.done():
+        _checkpoint_task = asyncio.create_task(_checkpoint_loop(interval))
+        logger.info(f"WAL checkpoint task started (interval: {interval}s)")
+
+
+def stop_checkpointer():
+    global _checkpoint_task
+    if _checkpoint_task and not _checkpoint_task.done():
+        _checkpoint_task.cancel()
+    _checkpoint_task = None
+
+
+def pool_stats():
+    return _pool.stats() if _pool is not None else {}
+
+
+metrics.register_collector("db_pool", pool_stats)
 
 
 async def init_db() -> None:
     logger.info("Initializing database...")
-    db = await get_db()
-    try:
+    if is_postgres():
+        from src.db.postgres import create_schema
+
+        async with get_write_db() as db:
+            await create_schema(db)
+            await db.commit()
+        logger.info("Database initialized successfully.")
+        return
+    async with get_write_db() as db:
         await db.execute("""
             CREATE TABLE IF NOT EXISTS conversations (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -115,6 +513,248 @@ async def init_db() -> None:
             ON bookings(confirmation_code)
         """)
         await db.commit()
+        await _apply_migrations(db)
         logger.info("Database initialized successfully.")
-    finally:
-        await db.close()
+
+
+# ─── Migrations ────────────────────────────────────────────────────────────────
+# Applied in order on startup; PRAGMA user_version records the last one run.
+# PostgreSQL databases get the resulting schema from src/db/postgres.py.
+
+async def _add_column(db, table, column, definition):
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in await cursor.fetchall()]:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _migration_contact_keys(db):
+    """Add a normalized contact_key to every per-contact table and backfill it."""
+    await db.create_function("normalize_contact", 1, normalize_contact, deterministic=True)
+    for table, source, index_columns in (
+        ("conversations", "phone_number", "contact_key, id"),
+        ("triggers", "recipient", "contact_key, status"),
+        ("bookings", "phone_number", "contact_key, status"),
+        ("sent_messages", "recipient", "contact_key, id"),
+    ):
+        await _add_column(db, table, "contact_key", "TEXT")
+        await db.execute(f"UPDATE {table} SET contact_key = normalize_contact({source})")
+        await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_contact ON {table}({index_columns})")
+
+
+async def _migration_trigger_leases(db):
+    """Add claimed_by/lease_until so scheduler workers can lease due triggers."""
+    await _add_column(db, "triggers", "claimed_by", "TEXT")
+    await _add_column(db, "triggers", "lease_until", "TIMESTAMP")
+
+
+async def _migration_inbound_events(db):
+    """Create the inbound_events inbox that webhooks enqueue into."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inbound_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            sender TEXT NOT NULL,
+            contact_key TEXT,
+            body TEXT NOT NULL,
+            external_id TEXT,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            reply TEXT,
+            available_at TIMESTAMP NOT NULL,
+            claimed_by TEXT,
+            lease_until TIMESTAMP,
+            received_at TIMESTAMP NOT NULL,
+            processed_at TIMESTAMP
+        )
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_inbound_events_status
+        ON inbound_events(status, available_at)
+    """)
+
+
+async def _migration_inbound_event_lanes(db):
+    """Index inbound_events by contact for per-contact claim ordering."""
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_inbound_events_contact
+        ON inbound_events(contact_key, status, id)
+    """)
+
+
+async def _migration_inbound_receipts(db):
+    """Create inbound_receipts, the durable record of provider message ids already accepted."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inbound_receipts (
+            source TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            reply TEXT,
+            received_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (source, message_id)
+        )
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_inbound_receipts_received
+        ON inbound_receipts(received_at)
+    """)
+
+
+async def _migration_llm_cache(db):
+    """Create llm_cache, the persistent tier of the LLM completion cache."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            call_site TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+
+
+async def _migration_stat_counters(db):
+    """Create stat_counters, the incrementally maintained analytics counters, and backfill it."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT NOT NULL,
+            bucket TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, bucket)
+        )
+    """)
+    # The backfill is frozen here rather than shared with stats_service, so
+    # this migration does the same thing however the service changes later.
+    await db.execute("""
+        INSERT INTO stat_counters (name, bucket, value)
+        SELECT 'messages', '', COUNT(*) FROM conversations
+        UNION ALL SELECT 'contacts', '', COUNT(DISTINCT contact_key) FROM conversations
+        UNION ALL SELECT 'sent', '', COUNT(*) FROM sent_messages
+        UNION ALL SELECT 'sent_day', substr(created_at, 1, 10), COUNT(*)
+            FROM sent_messages GROUP BY substr(created_at, 1, 10)
+        UNION ALL SELECT 'sent_channel', channel, COUNT(*) FROM sent_messages GROUP BY channel
+        UNION ALL SELECT 'trigger_status', status, COUNT(*) FROM triggers GROUP BY status
+        UNION ALL SELECT 'booking_status', status, COUNT(*) FROM bookings GROUP BY status
+    """)
+
+
+async def _migration_stat_rollups(db):
+    """Create stat_rollups/rollup_marks, the time-bucketed analytics counts, and backfill them."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS stat_rollups (
+            source TEXT NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            channel TEXT NOT NULL DEFAULT '',
+            kind TEXT NOT NULL DEFAULT '',
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, granularity, bucket, channel, kind)
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_marks (
+            source TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Frozen copy of the rollup at the time of this migration (see above).
+    buckets = {
+        "hour": "substr(created_at, 1, 10) || 'T' || substr(created_at, 12, 2)",
+        "day": "substr(created_at, 1, 10)",
+        "month": "substr(created_at, 1, 7)",
+    }
+    for source, channel, kind in (
+        ("sent_messages", "channel", "status"),
+        ("conversations", "channel", "role"),
+        ("triggers", "channel", "trigger_type"),
+        ("bookings", "''", "booking_type"),
+    ):
+        for granularity, bucket in buckets.items():
+            await db.execute(
+                f"""INSERT INTO stat_rollups (source, granularity, bucket, channel, kind, count)
+                SELECT ?, ?, {bucket}, COALESCE({channel}, ''), COALESCE({kind}, ''), COUNT(*)
+                FROM {source} GROUP BY 3, 4, 5""",
+                (source, granularity),
+            )
+        await db.execute(
+            f"INSERT INTO rollup_marks (source, last_id) SELECT ?, COALESCE(MAX(id), 0) FROM {source}",
+            (source,),
+        )
+
+
+async def _migration_contacts_summary(db):
+    """Create contacts, the per-contact summary behind the paged contacts list, and backfill it."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS contacts (
+            contact_key TEXT PRIMARY KEY,
+            phone_number TEXT NOT NULL,
+            last_message TEXT,
+            last_role TEXT,
+            channel TEXT,
+            last_at TIMESTAMP,
+            last_message_id INTEGER NOT NULL,
+            user_msg_count INTEGER NOT NULL DEFAULT 0,
+            total_msg_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_recent
+        ON contacts(last_at DESC, last_message_id DESC)
+    """)
+    await db.execute("""
+        INSERT OR REPLACE INTO contacts
+        (contact_key, phone_number, last_message, last_role, channel, last_at, last_message_id,
+         user_msg_count, total_msg_count)
+        SELECT c.contact_key, c.phone_number, c.message, c.role, c.channel, c.created_at, c.id,
+               agg.user_count, agg.total
+        FROM (
+            SELECT contact_key, MAX(id) AS last_id, SUM(role = 'user') AS user_count, COUNT(*) AS total
+            FROM conversations WHERE contact_key IS NOT NULL GROUP BY contact_key
+        ) agg
+        JOIN conversations c ON c.id = agg.last_id
+    """)
+
+
+async def _migration_campaigns(db):
+    """Create campaigns and link bulk-created triggers to them with per-recipient variables."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS campaigns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            total_recipients INTEGER NOT NULL,
+            total_steps INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await _add_column(db, "triggers", "campaign_id", "INTEGER")
+    await _add_column(db, "triggers", "variables", "TEXT")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_triggers_campaign ON triggers(campaign_id, status)")
+
+
+MIGRATIONS = [
+    _migration_contact_keys,
+    _migration_trigger_leases,
+    _migration_inbound_events,
+    _migration_inbound_event_lanes,
+    _migration_inbound_receipts,
+    _migration_llm_cache,
+    _migration_stat_counters,
+    _migration_stat_rollups,
+    _migration_contacts_summary,
+    _migration_campaigns,
+]
+
+
+async def _apply_migrations(db):
+    version = (await (await db.execute("PRAGMA user_version")).fetchone())[0]
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        logger.info(f"Applying database migration {number}: {migration.__doc__}")
+        await db.execute("BEGIN")
+        await migration(db)
+        await db.execute(f"PRAGMA user_version = {number}")
+        await db.commit()
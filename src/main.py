@@ -15,18 +15,35 @@ from src.core.logging import logger
 from src.core.error_handlers import register_error_handlers
 from src.middleware.logging_middleware import RequestLoggingMiddleware
 from src.api.v1.router import api_router
-from src.db.session import init_db
+from src.db.session import init_db, close_db, start_checkpointer, stop_checkpointer
+from src.db.batcher import stop_batchers
 from src.services.trigger_service import start_trigger_scheduler, stop_trigger_scheduler
+from src.services.inbox_service import start_inbox_consumers, stop_inbox_consumers
+from src.services.stats_service import start_rollups, stop_rollups
+from src.services import email_service, event_hub, meta_whatsapp_service, openai_service, twilio_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     await init_db()
+    start_checkpointer()
     start_trigger_scheduler()
+    start_inbox_consumers()
+    start_rollups()
     logger.info("Application ready. Trigger scheduler running.")
     yield
-    stop_trigger_scheduler()
+    event_hub.close_all()
+    stop_rollups()
+    await stop_inbox_consumers()
+    await stop_trigger_scheduler()
+    await twilio_service.close_client()
+    await meta_whatsapp_service.close_client()
+    await email_service.close_client()
+    await openai_service.close_client()
+    await stop_batchers()
+    stop_checkpointer()
+    await close_db()
     logger.info("Shutting down...")
 
 
@@ -1,5 +1,5 @@
 ﻿from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 
@@ -42,6 +42,15 @@ class GenerateMessageResponse(BaseModel):
     tone: str
 
 
+# Most leads in one batch, whether sent as JSON or uploaded as CSV
+MAX_BATCH_ITEMS = 5000
+
+
+class GenerateMessageBatchRequest(BaseModel):
+    items: List[GenerateMessageRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64)
+
+
 class SendWhatsAppRequest(BaseModel):
     to: str = Field(..., pattern=r"^\+\d{10,15}$")
     message: str = Field(..., min_length=1, max_length=4096)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 from datetime import datetime
 
@@ -73,4 +73,36 @@ class DripCampaignResponse(BaseModel):
     campaign_name: str
     total_steps: int
     trigger_ids: List[int]
-    detail: str = "Drip campaign created successfully"
\ No newline at end of file
+    detail: str = "Drip campaign created successfully"
+
+
+class CampaignRecipient(BaseModel):
+    recipient: str = Field(..., min_length=1)
+    name: Optional[str] = None
+    variables: Dict[str, str] = Field(default_factory=dict)  # Extra {placeholders}
+
+
+class CreateCampaignRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    channel: TriggerChannel
+    recipients: List[CampaignRecipient] = Field(..., min_length=1)
+    subject_prefix: Optional[str] = None
+    messages: List[str] = Field(..., min_length=1, max_length=10)  # May use {name} and variables
+    start_delay_minutes: int = Field(default=0, ge=0, le=43200)
+    delay_between_minutes: int = Field(default=1440, ge=0)
+    max_retries: int = Field(default=3, ge=1, le=10)
+    stop_on_reply: bool = Field(default=True)
+
+
+class CampaignResponse(BaseModel):
+    success: bool = True
+    campaign_id: int
+    campaign_name: str
+    channel: str
+    status: str
+    total_recipients: int
+    total_steps: int
+    total_triggers: int
+    progress: Dict[str, int]  # Trigger counts by status
+    created_at: Optional[str] = None
+    detail: str = "Campaign created successfully"
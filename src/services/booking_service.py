@@ -1,8 +1,10 @@
 import random
 import string
 from datetime import datetime
-from src.db.session import get_db
+from src.db.session import get_db, unit_of_work
+from src.core.contacts import normalize_contact
 from src.core.logging import logger
+from src.services import context_cache, event_hub, stats_service
 
 
 def _generate_confirmation_code(length=6):
@@ -13,22 +15,33 @@ def _generate_confirmation_code(length=6):
 async def create_booking(phone_number, title, booking_type="general",
                          customer_name=None, description=None,
                          date=None, time=None, amount=None, currency="INR",
-                         notes=None):
-    """Create a new pending booking/order."""
+                         notes=None, uow=None):
+    """Create a new pending booking/order (inside ``uow`` if given)."""
     confirmation_code = _generate_confirmation_code()
-    db = await get_db()
     try:
-        cursor = await db.execute(
-            """INSERT INTO bookings 
-            (phone_number, customer_name, booking_type, title, description,
-             date, time, amount, currency, status, confirmation_code, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)""",
-            (phone_number, customer_name, booking_type, title, description,
-             date, time, amount, currency, confirmation_code, notes),
-        )
-        await db.commit()
-        booking_id = cursor.lastrowid
-        logger.info(f"Booking created: id={booking_id} code={confirmation_code} for {phone_number}")
+        async with unit_of_work(uow) as work:
+            db = work.db
+            cursor = await db.execute(
+                """INSERT INTO bookings 
+                (phone_number, contact_key, customer_name, booking_type, title, description,
+                 date, time, amount, currency, status, confirmation_code, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
+                RETURNING id""",
+                (phone_number, normalize_contact(phone_number), customer_name, booking_type, title,
+                 description, date, time, amount, currency, confirmation_code, notes),
+            )
+            booking_id = (await cursor.fetchone())[0]
+            await stats_service.bump(db, [("booking_status", "pending", 1)])
+
+            def created():
+                context_cache.invalidate([normalize_contact(phone_number)], "bookings")
+                event_hub.publish(
+                    "booking", normalize_contact(phone_number), id=booking_id, status="pending",
+                    title=title, confirmation_code=confirmation_code,
+                )
+                logger.info(f"Booking created: id={booking_id} code={confirmation_code} for {phone_number}")
+
+            work.on_commit(created)
         return {
             "booking_id": booking_id,
             "confirmation_code": confirmation_code,
@@ -44,194 +57,235 @@ async def create_booking(phone_number, title, booking_type="general",
     except Exception as e:
         logger.error(f"Failed to create booking: {e}")
         raise
-    finally:
-        await db.close()
 
 
 async def get_pending_bookings(phone_number):
     """Get all pending bookings for a phone number."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+    contact_key = normalize_contact(phone_number)
+    cached = context_cache.lookup(contact_key, "bookings")
+    if not context_cache.is_missing(cached):
+        return [dict(b) for b in cached]
     try:
-        cursor = await db.execute(
-            """SELECT id, phone_number, customer_name, booking_type, title, description,
-                      date, time, amount, currency, status, confirmation_code, notes, created_at
-            FROM bookings 
-            WHERE phone_number LIKE ? AND status = 'pending'
-            ORDER BY created_at DESC""",
-            (f"%{clean_number}%",),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_dict(row) for row in rows]
+        generation = context_cache.begin_load(contact_key, "bookings")
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT id, phone_number, customer_name, booking_type, title, description,
+                          date, time, amount, currency, status, confirmation_code, notes, created_at
+                FROM bookings 
+                WHERE contact_key = ? AND status = 'pending'
+                ORDER BY created_at DESC""",
+                (contact_key,),
+            )
+            rows = await cursor.fetchall()
+        bookings = [_row_to_dict(row) for row in rows]
+        context_cache.store(contact_key, "bookings", [dict(b) for b in bookings], generation)
+        return bookings
     except Exception as e:
         logger.error(f"Failed to get pending bookings: {e}")
         return []
-    finally:
-        await db.close()
 
 
 async def get_booking_by_code(confirmation_code):
     """Get a booking by its confirmation code."""
-    db = await get_db()
     try:
-        cursor = await db.execute(
-            """SELECT id, phone_number, customer_name, booking_type, title, description,
-                      date, time, amount, currency, status, confirmation_code, notes, created_at
-            FROM bookings WHERE confirmation_code = ?""",
-            (confirmation_code.upper(),),
-        )
-        row = await cursor.fetchone()
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT id, phone_number, customer_name, booking_type, title, description,
+                          date, time, amount, currency, status, confirmation_code, notes, created_at
+                FROM bookings WHERE confirmation_code = ?""",
+                (confirmation_code.upper(),),
+            )
+            row = await cursor.fetchone()
         return _row_to_dict(row) if row else None
     except Exception as e:
         logger.error(f"Failed to get booking by code: {e}")
         return None
-    finally:
-        await db.close()
 
 
 async def get_booking_by_id(booking_id):
     """Get a booking by its ID."""
-    db = await get_db()
     try:
-        cursor = await db.execute(
-            """SELECT id, phone_number, customer_name, booking_type, title, description,
-                      date, time, amount, currency, status, confirmation_code, notes, created_at
-            FROM bookings WHERE id = ?""",
-            (booking_id,),
-        )
-        row = await cursor.fetchone()
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT id, phone_number, customer_name, booking_type, title, description,
+                          date, time, amount, currency, status, confirmation_code, notes, created_at
+                FROM bookings WHERE id = ?""",
+                (booking_id,),
+            )
+            row = await cursor.fetchone()
         return _row_to_dict(row) if row else None
     except Exception as e:
         logger.error(f"Failed to get booking: {e}")
         return None
-    finally:
-        await db.close()
 
 
-async def confirm_booking(booking_id=None, confirmation_code=None):
-    """Confirm a booking by ID or confirmation code."""
-    db = await get_db()
+async def confirm_booking(booking_id=None, confirmation_code=None, uow=None):
+    """Confirm a booking by ID or confirmation code (inside ``uow`` if given)."""
     try:
-        now = datetime.utcnow().isoformat()
-        if confirmation_code:
-            await db.execute(
-                """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
-                WHERE confirmation_code = ? AND status = 'pending'""",
-                (now, now, confirmation_code.upper()),
-            )
-        elif booking_id:
-            await db.execute(
-                """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
-                WHERE id = ? AND status = 'pending'""",
-                (now, now, booking_id),
-            )
-        await db.commit()
-        logger.info(f"Booking confirmed: id={booking_id} code={confirmation_code}")
+        async with unit_of_work(uow) as work:
+            db = work.db
+            now = datetime.utcnow().isoformat()
+            changed = []
+            if confirmation_code:
+                cursor = await db.execute(
+                    """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
+                    WHERE confirmation_code = ? AND status = 'pending'
+                    RETURNING id, contact_key""",
+                    (now, now, confirmation_code.upper()),
+                )
+                changed = await cursor.fetchall()
+            elif booking_id:
+                cursor = await db.execute(
+                    """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
+                    WHERE id = ? AND status = 'pending'
+                    RETURNING id, contact_key""",
+                    (now, now, booking_id),
+                )
+                changed = await cursor.fetchall()
+            await stats_service.bump(db, stats_service.status_moves("booking_status", [("pending", "confirmed")] * len(changed)))
+
+            def confirmed():
+                context_cache.invalidate([row[1] for row in changed], "bookings")
+                _publish_status(changed, "confirmed")
+                logger.info(f"Booking confirmed: id={booking_id} code={confirmation_code}")
+
+            work.on_commit(confirmed)
         return True
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to confirm booking: {e}")
         return False
-    finally:
-        await db.close()
 
 
-async def cancel_booking(booking_id=None, confirmation_code=None):
-    """Cancel a booking by ID or confirmation code."""
-    db = await get_db()
+async def cancel_booking(booking_id=None, confirmation_code=None, uow=None):
+    """Cancel a booking by ID or confirmation code (inside ``uow`` if given)."""
     try:
-        now = datetime.utcnow().isoformat()
-        if confirmation_code:
-            await db.execute(
-                """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
-                WHERE confirmation_code = ? AND status = 'pending'""",
-                (now, now, confirmation_code.upper()),
-            )
-        elif booking_id:
-            await db.execute(
-                """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
-                WHERE id = ? AND status = 'pending'""",
-                (now, now, booking_id),
-            )
-        await db.commit()
-        logger.info(f"Booking cancelled: id={booking_id} code={confirmation_code}")
+        async with unit_of_work(uow) as work:
+            db = work.db
+            now = datetime.utcnow().isoformat()
+            changed = []
+            if confirmation_code:
+                cursor = await db.execute(
+                    """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
+                    WHERE confirmation_code = ? AND status = 'pending'
+                    RETURNING id, contact_key""",
+                    (now, now, confirmation_code.upper()),
+                )
+                changed = await cursor.fetchall()
+            elif booking_id:
+                cursor = await db.execute(
+                    """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
+                    WHERE id = ? AND status = 'pending'
+                    RETURNING id, contact_key""",
+                    (now, now, booking_id),
+                )
+                changed = await cursor.fetchall()
+            await stats_service.bump(db, stats_service.status_moves("booking_status", [("pending", "cancelled")] * len(changed)))
+
+            def cancelled():
+                context_cache.invalidate([row[1] for row in changed], "bookings")
+                _publish_status(changed, "cancelled")
+                logger.info(f"Booking cancelled: id={booking_id} code={confirmation_code}")
+
+            work.on_commit(cancelled)
         return True
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to cancel booking: {e}")
         return False
-    finally:
-        await db.close()
 
 
 async def get_all_bookings(phone_number=None, status=None, limit=50):
     """Get bookings with optional filters."""
-    db = await get_db()
     try:
         query = """SELECT id, phone_number, customer_name, booking_type, title, description,
                           date, time, amount, currency, status, confirmation_code, notes, created_at
                    FROM bookings WHERE 1=1"""
         params = []
         if phone_number:
-            clean = phone_number.replace("whatsapp:", "").replace("+", "")
-            query += " AND phone_number LIKE ?"
-            params.append(f"%{clean}%")
+            query += " AND contact_key = ?"
+            params.append(normalize_contact(phone_number))
         if status:
             query += " AND status = ?"
             params.append(status)
         query += " ORDER BY created_at DESC LIMIT ?"
         params.append(limit)
 
-        cursor = await db.execute(query, params)
-        rows = await cursor.fetchall()
+        async with get_db() as db:
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
         return [_row_to_dict(row) for row in rows]
     except Exception as e:
         logger.error(f"Failed to get bookings: {e}")
         return []
-    finally:
-        await db.close()
 
 
-async def confirm_all_pending(phone_number):
-    """Confirm all pending bookings for a phone number."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+async def confirm_all_pending(phone_number, uow=None):
+    """Confirm all pending bookings for a phone number (inside ``uow`` if given)."""
     try:
-        now = datetime.utcnow().isoformat()
-        cursor = await db.execute(
-            """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
-            WHERE phone_number LIKE ? AND status = 'pending'""",
-            (now, now, f"%{clean_number}%"),
-        )
-        await db.commit()
-        count = cursor.rowcount
-        logger.info(f"Confirmed {count} pending bookings for {phone_number}")
+        async with unit_of_work(uow) as work:
+            db = work.db
+            now = datetime.utcnow().isoformat()
+            cursor = await db.execute(
+                """UPDATE bookings SET status = 'confirmed', confirmed_at = ?, updated_at = ?
+                WHERE contact_key = ? AND status = 'pending'
+                RETURNING id, contact_key""",
+                (now, now, normalize_contact(phone_number)),
+            )
+            changed = await cursor.fetchall()
+            count = len(changed)
+            await stats_service.bump(db, stats_service.status_moves("booking_status", [("pending", "confirmed")] * count))
+
+            def confirmed():
+                context_cache.set_section(normalize_contact(phone_number), "bookings", [])
+                _publish_status(changed, "confirmed")
+                logger.info(f"Confirmed {count} pending bookings for {phone_number}")
+
+            work.on_commit(confirmed)
         return count
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to confirm all: {e}")
         return 0
-    finally:
-        await db.close()
 
 
-async def cancel_all_pending(phone_number):
-    """Cancel all pending bookings for a phone number."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+async def cancel_all_pending(phone_number, uow=None):
+    """Cancel all pending bookings for a phone number (inside ``uow`` if given)."""
     try:
-        now = datetime.utcnow().isoformat()
-        cursor = await db.execute(
-            """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
-            WHERE phone_number LIKE ? AND status = 'pending'""",
-            (now, now, f"%{clean_number}%"),
-        )
-        await db.commit()
-        count = cursor.rowcount
-        logger.info(f"Cancelled {count} pending bookings for {phone_number}")
+        async with unit_of_work(uow) as work:
+            db = work.db
+            now = datetime.utcnow().isoformat()
+            cursor = await db.execute(
+                """UPDATE bookings SET status = 'cancelled', cancelled_at = ?, updated_at = ?
+                WHERE contact_key = ? AND status = 'pending'
+                RETURNING id, contact_key""",
+                (now, now, normalize_contact(phone_number)),
+            )
+            changed = await cursor.fetchall()
+            count = len(changed)
+            await stats_service.bump(db, stats_service.status_moves("booking_status", [("pending", "cancelled")] * count))
+
+            def cancelled():
+                context_cache.set_section(normalize_contact(phone_number), "bookings", [])
+                _publish_status(changed, "cancelled")
+                logger.info(f"Cancelled {count} pending bookings for {phone_number}")
+
+            work.on_commit(cancelled)
         return count
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to cancel all: {e}")
         return 0
-    finally:
-        await db.close()
+
+
+def _publish_status(rows, status):
+    """Announce bookings (``(id, contact_key)`` rows) whose status changed."""
+    for booking_id, contact_key in rows:
+        event_hub.publish("booking", contact_key, id=booking_id, status=status)
 
 
 def _row_to_dict(row):
@@ -0,0 +1,194 @@
+import time
+from collections import OrderedDict
+from src.config.settings import settings
+from src.core import metrics
+
+# Per-contact prompt context, kept in sync by the services that write it:
+#   "turns"    -> {"messages": [...], "exhaustive": bool}, oldest first
+#   "trigger"  -> latest trigger context dict or None
+#   "bookings" -> pending booking dicts
+SECTIONS = ("turns", "trigger", "bookings")
+
+# Rough per-entry bookkeeping overhead (bytes) added to the text sizes
+_ENTRY_OVERHEAD = 512
+
+_entries = OrderedDict()
+_bytes = 0
+_stats = {
+    "evictions": 0,
+    "expired": 0,
+    **{f"{section}_hits": 0 for section in SECTIONS},
+    **{f"{section}_misses": 0 for section in SECTIONS},
+}
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("sections", "generations", "expires_at", "size")
+
+    def __init__(self):
+        self.sections = {}
+        self.generations = dict.fromkeys(SECTIONS, 0)
+        self.expires_at = time.monotonic() + settings.CONTEXT_CACHE_TTL
+        self.size = _ENTRY_OVERHEAD
+
+
+def _weigh(sections):
+    size = _ENTRY_OVERHEAD
+    turns = sections.get("turns")
+    if turns:
+        size += sum(len(m["content"]) + 64 for m in turns["messages"])
+    if sections.get("trigger"):
+        size += sum(len(str(v)) for v in sections["trigger"].values()) + 64
+    for booking in sections.get("bookings") or ():
+        size += sum(len(str(v)) for v in booking.values()) + 64
+    return size
+
+
+def _live_entry(key):
+    entry = _entries.get(key)
+    if entry is not None and entry.expires_at <= time.monotonic():
+        _drop(key)
+        _stats["expired"] += 1
+        return None
+    return entry
+
+
+def _drop(key):
+    global _bytes
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        _bytes -= entry.size
+
+
+def _resize(key, entry):
+    global _bytes
+    new_size = _weigh(entry.sections)
+    _bytes += new_size - entry.size
+    entry.size = new_size
+    _entries.move_to_end(key)
+    while _entries and (
+        len(_entries) > settings.CONTEXT_CACHE_ENTRIES or _bytes > settings.CONTEXT_CACHE_MAX_BYTES
+    ):
+        oldest = next(iter(_entries))
+        _drop(oldest)
+        _stats["evictions"] += 1
+
+
+def lookup(key, section):
+    """Return the cached section for a contact, or ``MISSING``."""
+    entry = _live_entry(key) if key else None
+    if entry is None or section not in entry.sections:
+        _stats[f"{section}_misses"] += 1
+        return _MISSING
+    _entries.move_to_end(key)
+    _stats[f"{section}_hits"] += 1
+    return entry.sections[section]
+
+
+def cached_turns(key, limit):
+    """Return the last ``limit`` cached turns, or ``MISSING`` if the cache cannot answer."""
+    entry = _live_entry(key) if key else None
+    turns = entry.sections.get("turns") if entry is not None else None
+    if turns is None or (len(turns["messages"]) < limit and not turns["exhaustive"]):
+        _stats["turns_misses"] += 1
+        return _MISSING
+    _entries.move_to_end(key)
+    _stats["turns_hits"] += 1
+    return [dict(m) for m in turns["messages"][-limit:]]
+
+
+def begin_load(key, section):
+    """Mark the start of a database read; pass the result to ``store``.
+
+    A write to the same section while the read is in flight bumps its
+    generation, and ``store`` then discards the possibly stale result.
+    """
+    if not key:
+        return None
+    entry = _live_entry(key)
+    if entry is None:
+        entry = _entries[key] = _Entry()
+        _resize(key, entry)
+    return entry.generations[section]
+
+
+def store(key, section, value, generation):
+    entry = _entries.get(key) if key else None
+    if entry is None or generation is None or entry.generations[section] != generation:
+        return
+    entry.sections[section] = value
+    _resize(key, entry)
+
+
+def append_turn(key, role, content):
+    """Write-through for a newly stored conversation message."""
+    entry = _entries.get(key) if key else None
+    if entry is None:
+        return
+    entry.generations["turns"] += 1
+    turns = entry.sections.get("turns")
+    if turns is None:
+        return
+    messages = turns["messages"] + [{"role": role, "content": content}]
+    if len(messages) > settings.CONTEXT_CACHE_TURNS:
+        messages = messages[-settings.CONTEXT_CACHE_TURNS:]
+        turns = {"messages": messages, "exhaustive": False}
+    else:
+        turns = {"messages": messages, "exhaustive": turns["exhaustive"]}
+    entry.sections["turns"] = turns
+    _resize(key, entry)
+
+
+def set_section(key, section, value):
+    """Write-through replacement of a section whose new value is known."""
+    entry = _entries.get(key) if key else None
+    if entry is None:
+        return
+    entry.generations[section] += 1
+    entry.sections[section] = value
+    _resize(key, entry)
+
+
+def invalidate(keys, section):
+    """Drop a section for the given contacts so the next read reloads it."""
+    for key in keys:
+        entry = _entries.get(key) if key else None
+        if entry is None:
+            continue
+        entry.generations[section] += 1
+        if section in entry.sections:
+            del entry.sections[section]
+            _resize(key, entry)
+
+
+def clear():
+    global _bytes
+    _entries.clear()
+    _bytes = 0
+
+
+def is_missing(value):
+    return value is _MISSING
+
+
+def _ratio(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def cache_stats():
+    hits = sum(_stats[f"{section}_hits"] for section in SECTIONS)
+    misses = sum(_stats[f"{section}_misses"] for section in SECTIONS)
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "bytes": _bytes,
+        "hit_ratio": _ratio(hits, misses),
+        **{
+            f"{section}_hit_ratio": _ratio(_stats[f"{section}_hits"], _stats[f"{section}_misses"])
+            for section in SECTIONS
+        },
+    }
+
+
+metrics.register_collector("context_cache", cache_stats)
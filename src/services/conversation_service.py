@@ -1,104 +1,240 @@
-﻿from src.db.session import get_db
+﻿import base64
+import binascii
+import json
+from collections import Counter
+from src.db.batcher import WriteBatcher
+from src.db.session import copy_rows, get_db, get_write_db
+from src.config.settings import settings
+from src.core.contacts import normalize_contact
+from src.core.exceptions import ValidationError
 from src.core.logging import logger
+from src.services import context_cache, event_hub, stats_service
 
 
-async def store_message(phone_number, role, message, channel="whatsapp"):
-    """Store a conversation message (user or assistant)."""
-    db = await get_db()
-    try:
-        await db.execute(
-            "INSERT INTO conversations (phone_number, role, message, channel) VALUES (?, ?, ?, ?)",
-            (phone_number, role, message, channel),
+# Rows per multi-row statement, well under both backends' bound-parameter limits
+_INSERT_CHUNK = 1000
+
+
+async def _insert_messages(uow, rows):
+    """Write conversation rows ``(phone_number, contact_key, role, message, channel)``
+    and their contacts summary updates; returns the new message ids."""
+    db = uow.db
+    keys = list(dict.fromkeys(row[1] for row in rows))
+    known = 0
+    for start in range(0, len(keys), _INSERT_CHUNK):
+        chunk = keys[start:start + _INSERT_CHUNK]
+        cursor = await db.execute(
+            f"SELECT COUNT(*) FROM contacts WHERE contact_key IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+        known += (await cursor.fetchone())[0]
+    stored = []
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        chunk = rows[start:start + _INSERT_CHUNK]
+        cursor = await db.execute(
+            f"""INSERT INTO conversations (phone_number, contact_key, role, message, channel)
+            VALUES {', '.join(['(?, ?, ?, ?, ?)'] * len(chunk))}
+            RETURNING id, created_at""",
+            [value for row in chunk for value in row],
         )
-        await db.commit()
-        logger.info(f"Stored {role} message for {phone_number} ({channel})")
+        # Ids are handed out in VALUES order, but RETURNING order is unspecified.
+        stored.extend(sorted(await cursor.fetchall(), key=lambda row: row[0]))
+    await db.executemany(
+        """INSERT INTO contacts
+        (contact_key, phone_number, last_message, last_role, channel, last_at, last_message_id,
+         user_msg_count, total_msg_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT (contact_key) DO UPDATE SET
+            phone_number = excluded.phone_number, last_message = excluded.last_message,
+            last_role = excluded.last_role, channel = excluded.channel, last_at = excluded.last_at,
+            last_message_id = excluded.last_message_id,
+            user_msg_count = contacts.user_msg_count + excluded.user_msg_count,
+            total_msg_count = contacts.total_msg_count + 1""",
+        [
+            (contact_key, phone_number, message, role, channel, created_at, message_id, int(role == "user"))
+            for (phone_number, contact_key, role, message, channel), (message_id, created_at) in zip(rows, stored)
+        ],
+    )
+    await stats_service.bump(db, [("messages", "", len(rows)), ("contacts", "", len(keys) - known)])
+
+    def stored_all():
+        for (phone_number, contact_key, role, message, channel), (message_id, created_at) in zip(rows, stored):
+            context_cache.append_turn(contact_key, role, message)
+            event_hub.publish(
+                "message", contact_key, id=message_id, phone_number=phone_number,
+                role=role, message=message, channel=channel, timestamp=created_at,
+            )
+        if len(rows) == 1:
+            logger.info(f"Stored {rows[0][2]} message for {rows[0][0]} ({rows[0][4]})")
+        else:
+            logger.info(f"Stored {len(rows)} messages for {len(keys)} contacts")
+
+    uow.on_commit(stored_all)
+    return [message_id for message_id, _ in stored]
+
+
+async def _insert_sent_messages(uow, rows):
+    """Write sent_messages rows ``(recipient, contact_key, channel, subject, body, status, external_id)``."""
+    await copy_rows(
+        uow.db, "sent_messages",
+        ("recipient", "contact_key", "channel", "subject", "body", "status", "external_id"),
+        rows,
+    )
+    channels = Counter(row[2] for row in rows)
+    await stats_service.bump(uow.db, [
+        ("sent", "", len(rows)),
+        ("sent_day", stats_service.today(), len(rows)),
+        *[("sent_channel", channel, count) for channel, count in channels.items()],
+    ])
+    if len(rows) == 1:
+        recipient, _, channel, _, _, status, _ = rows[0]
+        uow.on_commit(lambda: logger.info(f"Stored sent message to {recipient} ({channel}) status={status}"))
+    else:
+        uow.on_commit(lambda: logger.info(f"Stored {len(rows)} sent messages"))
+    return [None] * len(rows)
+
+
+# Outside a unit of work, single-row inserts are group-committed (see src/db/batcher.py).
+_message_writes = WriteBatcher("conversations", _insert_messages)
+_sent_writes = WriteBatcher("sent_messages", _insert_sent_messages)
+
+
+async def store_message(phone_number, role, message, channel="whatsapp", uow=None):
+    """Store a conversation message (user or assistant).
+
+    With ``uow`` the write joins that unit of work and errors propagate to it;
+    otherwise it goes through the write batcher and errors are logged.
+    """
+    row = (phone_number, normalize_contact(phone_number), role, message, channel)
+    try:
+        if uow is not None:
+            await _insert_messages(uow, [row])
+        else:
+            await _message_writes.submit(row)
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to store message: {e}")
-    finally:
-        await db.close()
 
 
 async def get_recent_messages(phone_number, limit=10):
     """Get recent conversation history for a phone number."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+    contact_key = normalize_contact(phone_number)
+    cached = context_cache.cached_turns(contact_key, limit)
+    if not context_cache.is_missing(cached):
+        return cached
     try:
-        cursor = await db.execute(
-            """SELECT role, message FROM conversations 
-            WHERE phone_number LIKE ? 
-            ORDER BY created_at DESC LIMIT ?""",
-            (f"%{clean_number}%", limit),
-        )
-        rows = await cursor.fetchall()
+        # Load enough turns to answer later calls from the cache too.
+        fetch = max(limit, settings.CONTEXT_CACHE_TURNS)
+        generation = context_cache.begin_load(contact_key, "turns")
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT role, message FROM conversations 
+                WHERE contact_key = ? 
+                ORDER BY id DESC LIMIT ?""",
+                (contact_key, fetch),
+            )
+            rows = await cursor.fetchall()
         # Reverse to get chronological order
         messages = [{"role": row[0], "content": row[1]} for row in reversed(rows)]
-        return messages
+        kept = messages[-settings.CONTEXT_CACHE_TURNS:]
+        context_cache.store(
+            contact_key,
+            "turns",
+            {"messages": [dict(m) for m in kept], "exhaustive": len(rows) < fetch and len(kept) == len(messages)},
+            generation,
+        )
+        return messages[-limit:]
     except Exception as e:
         logger.error(f"Failed to get messages: {e}")
         return []
-    finally:
-        await db.close()
 
 
-async def store_sent_message(recipient, channel, body, subject=None, external_id=None, status="sent"):
-    """Store a record of a sent message."""
-    db = await get_db()
+async def store_sent_message(recipient, channel, body, subject=None, external_id=None, status="sent", uow=None):
+    """Store a record of a sent message (joining ``uow`` if given, as ``store_message``)."""
+    row = (recipient, normalize_contact(recipient), channel, subject, body, status, external_id)
     try:
-        await db.execute(
-            "INSERT INTO sent_messages (recipient, channel, subject, body, status, external_id) VALUES (?, ?, ?, ?, ?, ?)",
-            (recipient, channel, subject, body, status, external_id),
-        )
-        await db.commit()
-        logger.info(f"Stored sent message to {recipient} ({channel}) status={status}")
+        if uow is not None:
+            await _insert_sent_messages(uow, [row])
+        else:
+            await _sent_writes.submit(row)
     except Exception as e:
+        if uow is not None:
+            raise
         logger.error(f"Failed to store sent message: {e}")
-    finally:
-        await db.close()
 
 
 async def store_generated_message(lead_name, lead_company, stage, subject, message, cta, score=None):
     """Store a generated sales message."""
-    db = await get_db()
     try:
-        await db.execute(
-            """INSERT INTO generated_messages 
-            (lead_name, lead_company, stage, subject, message, cta, score) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (lead_name, lead_company, stage, subject, message, cta, score),
-        )
-        await db.commit()
+        async with get_write_db() as db:
+            await db.execute(
+                """INSERT INTO generated_messages 
+                (lead_name, lead_company, stage, subject, message, cta, score) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (lead_name, lead_company, stage, subject, message, cta, score),
+            )
+            await db.commit()
         logger.info(f"Stored generated message for {lead_name} at {lead_company}")
     except Exception as e:
         logger.error(f"Failed to store generated message: {e}")
-    finally:
-        await db.close()
 
 
-async def get_all_contacts(limit=100):
-    """Return unique contacts derived from conversations, with last message & metadata."""
-    db = await get_db()
+async def store_generated_messages(rows):
+    """Store many generated messages in one bulk insert.
+
+    Each row is a (lead_name, lead_company, stage, subject, message, cta, score) tuple.
+    """
+    if not rows:
+        return
     try:
-        cursor = await db.execute(
-            """SELECT
-                c.phone_number,
-                c.message        AS last_message,
-                c.role           AS last_role,
-                c.channel        AS channel,
-                c.created_at     AS last_at,
-                (SELECT COUNT(*) FROM conversations WHERE phone_number = c.phone_number AND role = 'user') AS user_msg_count,
-                (SELECT COUNT(*) FROM conversations WHERE phone_number = c.phone_number) AS total_msg_count
-            FROM conversations c
-            INNER JOIN (
-                SELECT phone_number, MAX(created_at) AS max_at
-                FROM conversations
-                GROUP BY phone_number
-            ) latest ON c.phone_number = latest.phone_number AND c.created_at = latest.max_at
-            GROUP BY c.phone_number
-            ORDER BY c.created_at DESC
-            LIMIT ?""",
-            (limit,),
-        )
-        rows = await cursor.fetchall()
+        async with get_write_db() as db:
+            await copy_rows(
+                db, "generated_messages",
+                ("lead_name", "lead_company", "stage", "subject", "message", "cta", "score"),
+                rows,
+            )
+            await db.commit()
+        logger.info(f"Stored {len(rows)} generated messages")
+    except Exception as e:
+        logger.error(f"Failed to store generated messages: {e}")
+
+
+def _encode_cursor(last_at, last_message_id):
+    raw = json.dumps([last_at, last_message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_at, last_message_id = json.loads(raw)
+        return str(last_at), int(last_message_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationError("Invalid contacts cursor")
+
+
+async def get_all_contacts(limit=100, cursor=None):
+    """Return one page of contacts, most recently active first, and the cursor for the next page.
+
+    Reads the contacts summary table kept up to date by ``store_message``;
+    paging is by (last_at, last_message_id), so each page costs O(limit)
+    however many contacts there are. The next cursor is None on the last page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    try:
+        query = """SELECT phone_number, last_message, last_role, channel, last_at,
+                          user_msg_count, total_msg_count, last_message_id, contact_key
+                   FROM contacts"""
+        params = []
+        if after:
+            query += " WHERE (last_at, last_message_id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY last_at DESC, last_message_id DESC LIMIT ?"
+        params.append(limit + 1)
+        async with get_db() as db:
+            result = await db.execute(query, params)
+            rows = await result.fetchall()
+        next_cursor = _encode_cursor(rows[limit - 1][4], rows[limit - 1][7]) if len(rows) > limit else None
         return [
             {
                 "phone_number": row[0],
@@ -108,39 +244,63 @@ async def get_all_contacts(limit=100):
                 "last_at": row[4],
                 "user_msg_count": row[5],
                 "total_msg_count": row[6],
+                "contact_key": row[8],
             }
-            for row in rows
-        ]
+            for row in rows[:limit]
+        ], next_cursor
     except Exception as e:
         logger.error(f"Failed to get contacts: {e}")
-        return []
-    finally:
-        await db.close()
+        return [], None
 
 
-async def get_conversation_history(phone_number, limit=20):
-    """Get full conversation history for display."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
-    try:
+async def get_last_message_id(phone_number):
+    """Id of the contact's latest conversation message (0 if none): one primary-key probe."""
+    async with get_db() as db:
         cursor = await db.execute(
-            """SELECT role, message, channel, created_at FROM conversations 
-            WHERE phone_number LIKE ? 
-            ORDER BY created_at DESC LIMIT ?""",
-            (f"%{clean_number}%", limit),
+            "SELECT last_message_id FROM contacts WHERE contact_key = ?",
+            (normalize_contact(phone_number),),
         )
-        rows = await cursor.fetchall()
+        row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+async def get_conversation_history(phone_number, limit=20, after_id=None, before_id=None):
+    """Get conversation history for display, oldest first, and whether more remain.
+
+    By default returns the latest ``limit`` messages. ``after_id`` returns the
+    next messages after that id (``has_more`` means newer ones remain) and
+    ``before_id`` the ``limit`` messages before it (``has_more`` means older
+    ones remain).
+    """
+    try:
+        query = "SELECT id, role, message, channel, created_at FROM conversations WHERE contact_key = ?"
+        params = [normalize_contact(phone_number)]
+        if after_id is not None:
+            query += " AND id > ?"
+            params.append(after_id)
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        newest_first = after_id is None
+        query += f" ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ?"
+        params.append(limit + 1)
+        async with get_db() as db:
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newest_first:
+            rows.reverse()
         return [
             {
-                "role": row[0],
-                "message": row[1],
-                "channel": row[2],
-                "timestamp": row[3],
+                "id": row[0],
+                "role": row[1],
+                "message": row[2],
+                "channel": row[3],
+                "timestamp": row[4],
             }
-            for row in reversed(rows)
-        ]
+            for row in rows
+        ], has_more
     except Exception as e:
         logger.error(f"Failed to get history: {e}")
-        return []
-    finally:
-        await db.close()
+        return [], False
@@ -1,34 +1,153 @@
-﻿from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+﻿import asyncio
+import time
+import httpx
 from src.config.settings import settings
+from src.core import metrics
 from src.core.logging import logger
 from src.core.exceptions import SendGridServiceError
+from src.services import rate_limiter
 
-_sg_client = None
+SENDGRID_API_BASE = "https://api.sendgrid.com/v3"
+# SendGrid accepts at most 1000 personalizations per mail/send request
+MAX_PERSONALIZATIONS = 1000
 
+_http_client = None
+_send_slots = None
+_request_ms = metrics.histogram("sendgrid.request_ms")
+_stats = {"requests": 0, "recipients": 0, "errors": 0}
 
-def _get_client():
-    global _sg_client
-    if _sg_client is None:
+
+def _get_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
         if not settings.SENDGRID_API_KEY:
             raise SendGridServiceError("SendGrid API key not configured")
-        _sg_client = SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
-    return _sg_client
+        _http_client = httpx.AsyncClient(
+            base_url=SENDGRID_API_BASE,
+            headers={
+                "Authorization": f"Bearer {settings.SENDGRID_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            timeout=settings.SENDGRID_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.SENDGRID_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.SENDGRID_MAX_CONCURRENCY,
+            ),
+        )
+    return _http_client
+
+
+def _get_send_slots():
+    global _send_slots
+    if _send_slots is None:
+        _send_slots = asyncio.Semaphore(settings.SENDGRID_MAX_CONCURRENCY)
+    return _send_slots
+
+
+def _personalization(recipient):
+    to = {"email": recipient["email"]}
+    if recipient.get("name"):
+        to["name"] = recipient["name"]
+    personalization = {"to": [to]}
+    if recipient.get("substitutions"):
+        personalization["substitutions"] = {
+            key: str(value) for key, value in recipient["substitutions"].items()
+        }
+    return personalization
+
+
+async def _post_mail(payload):
+    """POST one mail/send request and return its message id and status code."""
+    client = _get_client()
+
+    async def post():
+        async with _get_send_slots():
+            started = time.perf_counter()
+            try:
+                return await client.post("/mail/send", json=payload)
+            finally:
+                _request_ms.observe((time.perf_counter() - started) * 1000)
+
+    response = await rate_limiter.send("sendgrid", payload["from"]["email"], post)
+    _stats["requests"] += 1
+    if response.status_code not in (200, 202):
+        _stats["errors"] += 1
+        error_msg = response.text
+        try:
+            errors = response.json().get("errors") or []
+            error_msg = "; ".join(err.get("message", "") for err in errors) or error_msg
+        except Exception:
+            pass
+        raise SendGridServiceError(f"SendGrid error {response.status_code}: {error_msg}")
+    _stats["recipients"] += len(payload["personalizations"])
+    return {
+        "message_id": response.headers.get("X-Message-Id", ""),
+        "status_code": response.status_code,
+    }
+
+
+def _mail_payload(personalizations, subject, body, html):
+    return {
+        "personalizations": personalizations,
+        "from": {"email": settings.SENDGRID_FROM_EMAIL, "name": "SalesPulse AI"},
+        "subject": subject,
+        "content": [{"type": "text/html" if html else "text/plain", "value": body}],
+    }
 
 
 async def send_email(to_email, subject, body, to_name=None, html=False):
     logger.info(f"Sending email to {to_email} subject='{subject}'")
     try:
-        sg = _get_client()
-        from_email = Email(settings.SENDGRID_FROM_EMAIL, "SalesPulse AI")
-        to = To(to_email, to_name)
-        content_type = "text/html" if html else "text/plain"
-        content = Content(content_type, body)
-        mail = Mail(from_email, to, subject, content)
-        response = sg.send(mail)
-        logger.info(f"Email sent: status_code={response.status_code}")
-        message_id = response.headers.get("X-Message-Id", "")
-        return {"message_id": message_id, "status_code": response.status_code}
+        payload = _mail_payload(
+            [_personalization({"email": to_email, "name": to_name})], subject, body, html
+        )
+        result = await _post_mail(payload)
+        logger.info(f"Email sent: status_code={result['status_code']}")
+        return result
+    except SendGridServiceError as e:
+        logger.error(f"SendGrid error: {e.message}")
+        raise
     except Exception as e:
+        _stats["errors"] += 1
         logger.error(f"SendGrid error: {e}")
         raise SendGridServiceError(f"Failed to send email: {str(e)}")
+
+
+async def send_email_batch(recipients, subject, body, html=False):
+    """Send one message to many recipients, 1000 per SendGrid request.
+
+    ``recipients`` is a list of dicts with ``email``, optional ``name`` and
+    optional ``substitutions`` ({"-name-": "Asha"}); substitution keys are
+    replaced per recipient in ``subject`` and ``body``. Returns one result per
+    request, in order: the number of recipients it carried, their ``emails``,
+    and either ``message_id``/``status_code`` or ``error``. A failed request
+    doesn't stop the ones after it, so check each result.
+    """
+    results = []
+    for start in range(0, len(recipients), MAX_PERSONALIZATIONS):
+        chunk = recipients[start:start + MAX_PERSONALIZATIONS]
+        emails = [r["email"] for r in chunk]
+        logger.info(f"Sending batch email to {len(chunk)} recipients subject='{subject}'")
+        try:
+            payload = _mail_payload([_personalization(r) for r in chunk], subject, body, html)
+            result = {**await _post_mail(payload), "error": None}
+        except SendGridServiceError as e:
+            logger.error(f"SendGrid batch error: {e.message}")
+            result = {"message_id": None, "status_code": None, "error": e.message}
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.error(f"SendGrid batch error: {e}")
+            result = {"message_id": None, "status_code": None, "error": f"Failed to send batch email: {str(e)}"}
+        results.append({**result, "recipients": len(chunk), "emails": emails})
+    return results
+
+
+metrics.register_collector("sendgrid", lambda: dict(_stats))
+
+
+async def close_client():
+    """Close the HTTP client (call on app shutdown)."""
+    global _http_client
+    if _http_client:
+        await _http_client.aclose()
+        _http_client = None
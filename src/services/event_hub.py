@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+from datetime import datetime
+from src.config.settings import settings
+from src.core import metrics
+from src.core.logging import logger
+
+# In-process pub/sub for dashboard updates. Every event goes to the global
+# topic ("all") and to its contact's topic ("contact:<contact_key>"). Each
+# subscriber has a bounded queue; publishing never waits, and a subscriber
+# whose queue is full is evicted (told so, then closed) rather than slowing
+# the writers down. Clients resync over the REST API after reconnecting.
+GLOBAL_TOPIC = "all"
+
+_topics = {}
+_sequence = itertools.count(1)
+_stats = {"published": 0, "delivered": 0, "evicted": 0}
+_CLOSED = object()
+
+
+class HubFullError(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, topics):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.evicted = False
+        self.closed = False
+
+    def _offer(self, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+            _stats["delivered"] += 1
+        except asyncio.QueueFull:
+            self.evicted = True
+            _stats["evicted"] += 1
+            logger.warning(f"Evicting slow event subscriber on {sorted(self.topics)}")
+            self._close()
+
+    def _close(self):
+        if self.closed:
+            return
+        self.closed = True
+        unsubscribe(self)
+        # An evicted reader has to resync anyway, so drop what it had not read;
+        # either way make room for the end marker so the reader wakes up.
+        while not self.queue.empty() and (self.evicted or self.queue.full()):
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+    async def get(self, timeout=None):
+        """Next event, None on timeout, or raise StopAsyncIteration once closed."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is _CLOSED:
+            raise StopAsyncIteration
+        return event
+
+
+def contact_topic(contact_key):
+    return f"contact:{contact_key}"
+
+
+def subscriber_count():
+    return len({id(sub) for subs in _topics.values() for sub in subs})
+
+
+def subscribe(topics):
+    """Register a subscriber for the given topics; raises HubFullError at EVENTS_MAX_SUBSCRIBERS."""
+    if subscriber_count() >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HubFullError("Too many event subscribers")
+    subscription = Subscription(set(topics))
+    for topic in subscription.topics:
+        _topics.setdefault(topic, set()).add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    for topic in subscription.topics:
+        subscribers = _topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _topics[topic]
+
+
+def publish(event_type, contact_key=None, **data):
+    """Fan an event out to the global topic and the contact's topic; never blocks."""
+    event = {
+        "id": next(_sequence),
+        "type": event_type,
+        "contact_key": contact_key,
+        "at": datetime.utcnow().isoformat(),
+        "data": data,
+    }
+    _stats["published"] += 1
+    targets = set(_topics.get(GLOBAL_TOPIC, ()))
+    if contact_key:
+        targets |= _topics.get(contact_topic(contact_key), set())
+    for subscription in targets:
+        subscription._offer(event)
+    return event
+
+
+def close_all():
+    """End every subscription, e.g. on shutdown so open streams finish."""
+    for subscription in {sub for subs in _topics.values() for sub in subs}:
+        subscription._close()
+
+
+metrics.register_collector("events", lambda: {**_stats, "subscribers": subscriber_count()})
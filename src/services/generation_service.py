@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import io
+from pydantic import ValidationError as PydanticValidationError
+from src.config.settings import settings
+from src.core.exceptions import ValidationError
+from src.core.logging import logger
+from src.schemas.message import MAX_BATCH_ITEMS, GenerateMessageRequest
+from src.services.template_engine import render_templates
+from src.services.scoring_engine import score_message
+from src.services.openai_service import rewrite_message
+from src.services.conversation_service import store_generated_messages
+
+
+def parse_leads_csv(text):
+    """Parse a CSV of leads (GenerateMessageRequest columns) into requests.
+
+    Returns ``(items, errors)``: ``items`` is a list of ``(row_index, request)``
+    and ``errors`` a list of ``(row_index, message)`` for rows that failed
+    validation. Empty cells fall back to the field defaults. More than
+    MAX_BATCH_ITEMS rows raise ValidationError, as for a JSON batch.
+    """
+    items, errors = [], []
+    for index, row in enumerate(csv.DictReader(io.StringIO(text))):
+        if index >= MAX_BATCH_ITEMS:
+            raise ValidationError(f"CSV has more than {MAX_BATCH_ITEMS} rows")
+        fields = {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip()}
+        try:
+            items.append((index, GenerateMessageRequest(**fields)))
+        except PydanticValidationError as e:
+            errors.append((index, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )))
+    return items, errors
+
+
+def _result(index, request, subject, body, cta):
+    score = score_message(message=body, subject=subject, cta=cta, stage=request.stage, tone=request.tone)
+    row = (request.name, request.company, request.stage.value, subject, body, cta, score)
+    return {
+        "index": index,
+        "success": True,
+        "subject": subject,
+        "message": body,
+        "cta": cta,
+        "score": score,
+        "stage": request.stage.value,
+        "tone": request.tone.value,
+    }, row
+
+
+async def generate_batch(items, concurrency=None):
+    """Generate messages for many leads, yielding each result as it completes.
+
+    ``items`` is a list of ``(index, GenerateMessageRequest)``. Drafts are
+    rendered in one pass; leads without AI rewrite are yielded straight away,
+    and rewrites fan out over at most ``concurrency`` workers (capped by
+    GENERATION_MAX_CONCURRENCY). Results are stored in generated_messages with
+    one executemany per GENERATION_FLUSH_ROWS rows, and whatever is pending
+    when the stream ends (or the client disconnects) is flushed.
+    """
+    concurrency = min(concurrency or settings.GENERATION_CONCURRENCY, settings.GENERATION_MAX_CONCURRENCY)
+    drafts = render_templates([
+        {
+            "name": r.name, "role": r.role, "company": r.company, "industry": r.industry,
+            "pain_point": r.pain_point, "stage": r.stage, "tone": r.tone,
+        }
+        for _, r in items
+    ])
+    rows = []
+    work = asyncio.Queue()
+    done = asyncio.Queue()
+    workers = []
+
+    async def rewrite_worker():
+        while True:
+            try:
+                position = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            draft = drafts[position]
+            try:
+                rewritten = await rewrite_message(
+                    draft_message=draft["body"],
+                    subject=draft["subject"],
+                    cta=draft["cta"],
+                    tone_instruction=draft["tone_instruction"],
+                )
+                await done.put((position, rewritten, None))
+            except Exception as e:
+                await done.put((position, None, e))
+
+    try:
+        for position, ((index, request), draft) in enumerate(zip(items, drafts)):
+            if request.use_ai_rewrite:
+                work.put_nowait(position)
+                continue
+            result, row = _result(index, request, draft["subject"], draft["body"], draft["cta"])
+            rows.append(row)
+            yield result
+
+        remaining = work.qsize()
+        workers = [asyncio.create_task(rewrite_worker()) for _ in range(min(concurrency, remaining))]
+        while remaining:
+            position, rewritten, error = await done.get()
+            remaining -= 1
+            index, request = items[position]
+            if error is not None:
+                logger.error(f"Batch rewrite failed for lead {index} ({request.name}): {error}")
+                yield {"index": index, "success": False, "error": str(error)}
+                continue
+            result, row = _result(index, request, rewritten["subject"], rewritten["message"], rewritten["cta"])
+            rows.append(row)
+            yield result
+            if len(rows) >= settings.GENERATION_FLUSH_ROWS:
+                await store_generated_messages(rows)
+                rows = []
+    finally:
+        for task in workers:
+            task.cancel()
+        await store_generated_messages(rows)
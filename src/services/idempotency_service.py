@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from src.db.session import get_write_db
+from src.config.settings import settings
+from src.core import metrics
+from src.core.cache import LRUCache
+from src.core.logging import logger
+
+# Recently seen (source, provider message id) -> reply sent for it (or None)
+_recent = LRUCache(settings.DEDUP_CACHE_SIZE, settings.DEDUP_CACHE_TTL)
+_MISSING = object()
+_stats = {"duplicates_memory": 0, "duplicates_durable": 0, "recorded": 0}
+_inserts_since_prune = 0
+
+
+def seen_recently(source, message_id):
+    """O(1) in-memory duplicate check; no database access."""
+    if _recent.get((source, message_id), _MISSING) is _MISSING:
+        return False
+    _stats["duplicates_memory"] += 1
+    return True
+
+
+def remember(source, message_ids):
+    for message_id in message_ids:
+        _recent.set((source, message_id), None)
+
+
+async def insert_receipts(db, source, message_ids):
+    """Record receipts inside the caller's transaction; return the ids not seen before.
+
+    The (source, message_id) primary key makes this the durable check that
+    holds across restarts and processes.
+    """
+    global _inserts_since_prune
+    if not message_ids:
+        return set()
+    now = datetime.utcnow().isoformat()
+    values = ", ".join("(?, ?, ?)" for _ in message_ids)
+    cursor = await db.execute(
+        f"""INSERT INTO inbound_receipts (source, message_id, received_at) VALUES {values}
+        ON CONFLICT (source, message_id) DO NOTHING
+        RETURNING message_id""",
+        [param for message_id in message_ids for param in (source, message_id, now)],
+    )
+    new_ids = {row[0] for row in await cursor.fetchall()}
+    _stats["duplicates_durable"] += len(message_ids) - len(new_ids)
+    _stats["recorded"] += len(new_ids)
+    _inserts_since_prune += len(new_ids)
+    if _inserts_since_prune >= settings.DEDUP_PRUNE_EVERY:
+        _inserts_since_prune = 0
+        cutoff = datetime.utcnow() - timedelta(hours=settings.DEDUP_RETENTION_HOURS)
+        await db.execute("DELETE FROM inbound_receipts WHERE received_at < ?", (cutoff.isoformat(),))
+    return new_ids
+
+
+async def claim_message(source, message_id):
+    """Record a delivery before processing it.
+
+    Returns ``(True, None)`` for a first delivery, or ``(False, reply)`` for a
+    retry, where ``reply`` is what was sent the first time (None while the
+    first delivery is still being processed).
+    """
+    reply = _recent.get((source, message_id), _MISSING)
+    if reply is not _MISSING:
+        _stats["duplicates_memory"] += 1
+        return False, reply
+    async with get_write_db() as db:
+        is_new = bool(await insert_receipts(db, source, [message_id]))
+        if not is_new:
+            cursor = await db.execute(
+                "SELECT reply FROM inbound_receipts WHERE source = ? AND message_id = ?",
+                (source, message_id),
+            )
+            row = await cursor.fetchone()
+            reply = row[0] if row else None
+        await db.commit()
+    _recent.set((source, message_id), None if is_new else reply)
+    if not is_new:
+        logger.info(f"Duplicate {source} delivery {message_id} ignored")
+    return is_new, None if is_new else reply
+
+
+async def record_reply(source, message_id, reply):
+    """Store the reply for a claimed message so retries can be answered with it."""
+    async with get_write_db() as db:
+        await db.execute(
+            "UPDATE inbound_receipts SET reply = ? WHERE source = ? AND message_id = ?",
+            (reply, source, message_id),
+        )
+        await db.commit()
+    _recent.set((source, message_id), reply)
+
+
+async def release_message(source, message_id):
+    """Forget a claimed message whose processing failed, so a retry is accepted."""
+    _recent.pop((source, message_id))
+    async with get_write_db() as db:
+        await db.execute(
+            "DELETE FROM inbound_receipts WHERE source = ? AND message_id = ?",
+            (source, message_id),
+        )
+        await db.commit()
+
+
+metrics.register_collector("dedup", lambda: {**_stats, "cache": _recent.stats()})
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from src.db.session import get_db, get_write_db, is_postgres, unit_of_work
+from src.config.settings import settings
+from src.core import metrics
+from src.core.contacts import normalize_contact
+from src.core.logging import logger
+from src.services import idempotency_service
+from src.services.trigger_service import WORKER_ID, handle_lead_reply
+
+# Background consumer tasks and the signal used to wake idle ones
+_consumer_tasks = []
+_wakeup = None
+_stopping = False
+
+_queue_age_ms = metrics.histogram(
+    "inbox.queue_age_ms", (5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000, 60000, 300000)
+)
+_processing_ms = metrics.histogram("inbox.processing_ms")
+_coalesced = metrics.histogram("inbox.batch_size", (1, 2, 3, 5, 10, 20, 50))
+_stats = {"enqueued": 0, "processed": 0, "retried": 0, "dead_lettered": 0, "in_flight": 0}
+
+
+async def enqueue_events(events, dedup_source=None):
+    """Persist inbound messages for background processing in one transaction.
+
+    Each event is a dict with ``source``, ``channel``, ``sender``, ``body`` and
+    optional ``external_id`` / ``payload`` (the raw provider message). With
+    ``dedup_source``, events whose ``external_id`` was already accepted are
+    dropped, first against the in-memory cache and then against the durable
+    receipts recorded in the same transaction. Returns the number enqueued.
+    """
+    if dedup_source:
+        events = [
+            e for e in events
+            if not e.get("external_id") or not idempotency_service.seen_recently(dedup_source, e["external_id"])
+        ]
+    if not events:
+        return 0
+    now = datetime.utcnow().isoformat()
+    async with get_write_db() as db:
+        if dedup_source:
+            message_ids = [e["external_id"] for e in events if e.get("external_id")]
+            new_ids = await idempotency_service.insert_receipts(db, dedup_source, message_ids)
+            events = [e for e in events if _take(e.get("external_id"), new_ids)]
+        await db.executemany(
+            """INSERT INTO inbound_events
+            (source, channel, sender, contact_key, body, external_id, payload, available_at, received_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (e["source"], e["channel"], e["sender"], normalize_contact(e["sender"]), e["body"],
+                 e.get("external_id"),
+                 json.dumps(e["payload"]) if e.get("payload") is not None else None, now, now)
+                for e in events
+            ],
+        )
+        await db.commit()
+    if dedup_source:
+        idempotency_service.remember(dedup_source, message_ids)
+    _stats["enqueued"] += len(events)
+    if events and _wakeup is not None:
+        _wakeup.set()
+    return len(events)
+
+
+def _take(message_id, new_ids):
+    """Keep events without an id, and the first event for each newly recorded id."""
+    if not message_id:
+        return True
+    if message_id in new_ids:
+        new_ids.discard(message_id)
+        return True
+    return False
+
+
+async def enqueue_event(source, channel, sender, body, external_id=None, payload=None):
+    """Persist a single inbound message for background processing."""
+    return await enqueue_events([{
+        "source": source,
+        "channel": channel,
+        "sender": sender,
+        "body": body,
+        "external_id": external_id,
+        "payload": payload,
+    }])
+
+
+# A contact whose oldest unfinished event is claimable (the head of its lane)
+_HEAD_SQL = """SELECT head.contact_key FROM inbound_events head
+    WHERE head.status IN ('pending', 'processing')
+      AND ((head.status = 'pending' AND head.available_at <= ?)
+           OR (head.status = 'processing' AND head.lease_until < ?))
+      AND head.id = (
+          SELECT MIN(id) FROM inbound_events
+          WHERE contact_key = head.contact_key AND status IN ('pending', 'processing')
+      )"""
+_CLAIMABLE_SQL = """((status = 'pending' AND available_at <= ?)
+         OR (status = 'processing' AND lease_until < ?))"""
+_CLAIMED_COLUMNS = "id, source, channel, sender, body, external_id, payload, attempts, reply, received_at"
+# Lanes looked at per claim on PostgreSQL before giving up until the next poll
+_CLAIM_CANDIDATES = 20
+
+
+async def _claim_locked_contact(db, worker_id, now, lease_until, limit):
+    """PostgreSQL claim: lock a whole lane before taking any of its events.
+
+    Writers run concurrently there, and row locks alone would let two workers
+    take different events of the same contact. A transaction-level advisory
+    lock per contact makes each lane claimable by one worker at a time; lanes
+    another worker is claiming right now are skipped.
+    """
+    cursor = await db.execute(
+        f"{_HEAD_SQL} ORDER BY head.id LIMIT ?", (now, now, _CLAIM_CANDIDATES)
+    )
+    for (contact_key,) in await cursor.fetchall():
+        cursor = await db.execute("SELECT pg_try_advisory_xact_lock(hashtext(?))", (f"inbox:{contact_key}",))
+        if not (await cursor.fetchone())[0]:
+            continue
+        # Re-check the lane under the lock: its head may have just been claimed.
+        cursor = await db.execute(
+            f"""UPDATE inbound_events
+            SET status = 'processing', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM inbound_events
+                WHERE contact_key = ({_HEAD_SQL} AND head.contact_key = ?)
+                  AND {_CLAIMABLE_SQL}
+                ORDER BY id LIMIT ?
+            )
+            RETURNING {_CLAIMED_COLUMNS}""",
+            (worker_id, lease_until, now, now, contact_key, now, now, limit),
+        )
+        rows = await cursor.fetchall()
+        if rows:
+            return rows
+    return []
+
+
+async def claim_events(worker_id=WORKER_ID, limit=None):
+    """Lease the next contact's waiting events, oldest first; [] if none are available.
+
+    Each contact is a serial lane: only the contact whose oldest unfinished
+    event is claimable is picked, so nothing is claimed while an earlier event
+    for the same contact is still being processed or waiting out a retry. All
+    of that contact's available events (up to INBOX_COALESCE_MAX) are claimed
+    together so they can be answered with a single reply. Events left in
+    'processing' by a consumer that died are picked up again once their lease
+    lapses.
+    """
+    now = datetime.utcnow().isoformat()
+    lease_until = (datetime.utcnow() + timedelta(seconds=settings.INBOX_LEASE_SECONDS)).isoformat()
+    limit = limit or settings.INBOX_COALESCE_MAX
+    async with get_write_db() as db:
+        if is_postgres():
+            rows = await _claim_locked_contact(db, worker_id, now, lease_until, limit)
+        else:
+            cursor = await db.execute(
+                f"""UPDATE inbound_events
+                SET status = 'processing', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM inbound_events
+                    WHERE contact_key = ({_HEAD_SQL} ORDER BY head.id LIMIT 1)
+                      AND {_CLAIMABLE_SQL}
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING {_CLAIMED_COLUMNS}""",
+                (worker_id, lease_until, now, now, now, now, limit),
+            )
+            rows = await cursor.fetchall()
+        await db.commit()
+    return sorted(
+        (
+            {
+                "id": row[0],
+                "source": row[1],
+                "channel": row[2],
+                "sender": row[3],
+                "body": row[4],
+                "external_id": row[5],
+                "payload": json.loads(row[6]) if row[6] else None,
+                "attempts": row[7],
+                "reply": row[8],
+                "received_at": row[9],
+            }
+            for row in rows
+        ),
+        key=lambda event: event["id"],
+    )
+
+
+def _placeholders(items):
+    return ", ".join("?" for _ in items)
+
+
+async def _finish_events(event_ids, worker_id=WORKER_ID):
+    now = datetime.utcnow().isoformat()
+    async with get_write_db() as db:
+        await db.execute(
+            f"""UPDATE inbound_events
+            SET status = 'done', processed_at = ?, claimed_by = NULL, lease_until = NULL
+            WHERE id IN ({_placeholders(event_ids)}) AND claimed_by = ?""",
+            (now, *event_ids, worker_id),
+        )
+        await db.commit()
+
+
+async def _renew_leases(event_ids, worker_id=WORKER_ID):
+    """Extend this worker's leases on ``event_ids``; returns how many it still held."""
+    lease_until = (datetime.utcnow() + timedelta(seconds=settings.INBOX_LEASE_SECONDS)).isoformat()
+    async with get_write_db() as db:
+        cursor = await db.execute(
+            f"""UPDATE inbound_events SET lease_until = ?
+            WHERE id IN ({_placeholders(event_ids)}) AND claimed_by = ? AND status = 'processing'""",
+            (lease_until, *event_ids, worker_id),
+        )
+        await db.commit()
+    return cursor.rowcount
+
+
+async def _keep_lease(event_ids, worker_id):
+    interval = settings.INBOX_LEASE_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await _renew_leases(event_ids, worker_id):
+                logger.warning(f"Inbound events {event_ids}: lease lost while processing")
+                return
+        except Exception as e:
+            logger.error(f"Inbound events {event_ids}: lease renewal failed: {e}")
+
+
+async def _fail_events(events, error, worker_id=WORKER_ID):
+    """Schedule a retry with exponential backoff, or dead-letter each event."""
+    updates = []
+    for event in events:
+        attempts = event["attempts"]
+        if attempts >= settings.INBOX_MAX_ATTEMPTS:
+            status = "dead"
+            available_at = datetime.utcnow()
+            _stats["dead_lettered"] += 1
+            logger.error(f"Inbound event {event['id']} dead-lettered after {attempts} attempts: {error}")
+        else:
+            status = "pending"
+            delay = settings.INBOX_RETRY_DELAY * 2 ** (attempts - 1)
+            available_at = datetime.utcnow() + timedelta(seconds=delay)
+            _stats["retried"] += 1
+            logger.warning(f"Inbound event {event['id']} failed (attempt {attempts}), retrying in {delay}s: {error}")
+        updates.append((status, available_at.isoformat(), str(error)[:500], event["id"], worker_id))
+    async with get_write_db() as db:
+        await db.executemany(
+            """UPDATE inbound_events
+            SET status = ?, available_at = ?, last_error = ?, claimed_by = NULL, lease_until = NULL
+            WHERE id = ? AND claimed_by = ?""",
+            updates,
+        )
+        await db.commit()
+
+
+async def _save_reply(event_ids, reply, uow=None):
+    """Checkpoint a generated reply (inside ``uow`` if given) so a retry only re-sends it."""
+    async with unit_of_work(uow) as work:
+        await work.db.execute(
+            f"UPDATE inbound_events SET reply = ? WHERE id IN ({_placeholders(event_ids)})",
+            (reply, *event_ids),
+        )
+
+
+async def _process_whapi_messages(events):
+    """Answer a contact's inbound Whapi WhatsApp messages.
+
+    Messages without a saved reply are joined into one prompt, so a burst of
+    short messages costs one LLM call and gets one answer. The reply is saved
+    in the same transaction that stores the conversation, so a retry either
+    starts from scratch or only re-sends it.
+    """
+    from src.services import meta_whatsapp_service
+
+    sender = events[-1]["sender"]
+    replies = list(dict.fromkeys(event["reply"] for event in events if event["reply"]))
+    fresh = [event for event in events if event["reply"] is None]
+    if fresh:
+        for event in fresh:
+            if event["external_id"]:
+                await meta_whatsapp_service.mark_message_read(event["external_id"])
+        fresh_ids = [event["id"] for event in fresh]
+        reply = await handle_lead_reply(
+            phone_number=sender,
+            message_text="\n".join(event["body"] for event in fresh),
+            channel=fresh[-1]["channel"],
+            on_record=lambda uow, reply: _save_reply(fresh_ids, reply, uow),
+        )
+        replies.append(reply)
+    for reply in replies:
+        await meta_whatsapp_service.send_whatsapp(to=sender, message=reply)
+
+
+# Event source -> coroutine that fully handles one contact's batch of events
+_HANDLERS = {
+    "whapi": _process_whapi_messages,
+}
+
+
+async def process_events(events, worker_id=WORKER_ID):
+    """Run the handler(s) for a claimed batch of one contact's events and record the outcome.
+
+    The batch's leases are renewed until it is done, so a slow reply or a send
+    held up by the rate limiter is not picked up again by another consumer.
+    """
+    now = datetime.utcnow()
+    for event in events:
+        received = datetime.fromisoformat(event["received_at"])
+        _queue_age_ms.observe(max(0.0, (now - received).total_seconds() * 1000))
+    _coalesced.observe(len(events))
+    started = time.perf_counter()
+    _stats["in_flight"] += len(events)
+    renewer = asyncio.create_task(_keep_lease([event["id"] for event in events], worker_id))
+    try:
+        # Consecutive events from the same source go to its handler together.
+        for start, end in _runs(events, key=lambda event: event["source"]):
+            run = events[start:end]
+            handler = _HANDLERS.get(run[0]["source"])
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for event source '{run[0]['source']}'")
+                await handler(run)
+            except Exception as e:
+                # Keep the lane ordered: everything after the failure waits for the retry.
+                await _fail_events(events[start:], e, worker_id)
+                return
+            await _finish_events([event["id"] for event in run], worker_id)
+            _stats["processed"] += len(run)
+    finally:
+        renewer.cancel()
+        _stats["in_flight"] -= len(events)
+        _processing_ms.observe((time.perf_counter() - started) * 1000)
+
+
+def _runs(items, key):
+    """Yield (start, end) bounds of consecutive items sharing the same key."""
+    start = 0
+    for index in range(1, len(items) + 1):
+        if index == len(items) or key(items[index]) != key(items[start]):
+            yield start, index
+            start = index
+
+
+async def _consume(number):
+    # Each consumer holds its own leases, so it can't renew or finish another's.
+    worker_id = f"{WORKER_ID}:inbox{number}"
+    logger.info(f"Inbox consumer {number} started")
+    while not _stopping:
+        _wakeup.clear()
+        try:
+            events = await claim_events(worker_id)
+        except Exception as e:
+            logger.error(f"Inbox consumer {number} failed to claim: {e}")
+            events = []
+        if not events:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.INBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await process_events(events, worker_id)
+        except Exception as e:
+            # Recording the outcome failed; the leases lapse and another consumer retries.
+            ids = [event["id"] for event in events]
+            logger.error(f"Inbox consumer {number} could not record events {ids}: {e}")
+
+
+async def inbox_depth():
+    """Queue depth per status and the age (s) of the oldest waiting event."""
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT status, COUNT(*), MIN(received_at) FROM inbound_events "
+            "WHERE status != 'done' GROUP BY status"
+        )
+        rows = await cursor.fetchall()
+    depth = {"pending": 0, "processing": 0, "dead": 0}
+    oldest_age = None
+    for status, count, oldest in rows:
+        depth[status] = count
+        if status in ("pending", "processing") and oldest:
+            age = (datetime.utcnow() - datetime.fromisoformat(oldest)).total_seconds()
+            oldest_age = age if oldest_age is None else max(oldest_age, age)
+    return {
+        **depth,
+        "oldest_age_s": round(oldest_age, 3) if oldest_age is not None else None,
+        "consumers": len(_consumer_tasks),
+    }
+
+
+metrics.register_collector("inbox", lambda: dict(_stats))
+
+
+def start_inbox_consumers():
+    """Start the background consumers that drain inbound_events."""
+    global _wakeup, _stopping
+    if _consumer_tasks:
+        return
+    _wakeup = asyncio.Event()
+    _stopping = False
+    for number in range(settings.INBOX_CONSUMERS):
+        _consumer_tasks.append(asyncio.create_task(_consume(number)))
+    logger.info(f"Started {settings.INBOX_CONSUMERS} inbox consumers")
+
+
+async def stop_inbox_consumers():
+    """Stop the consumers, letting events already being processed finish."""
+    global _wakeup, _stopping
+    if not _consumer_tasks:
+        return
+    _stopping = True
+    _wakeup.set()
+    _, pending = await asyncio.wait(list(_consumer_tasks), timeout=settings.SCHEDULER_SHUTDOWN_GRACE)
+    for task in pending:
+        task.cancel()
+    _consumer_tasks.clear()
+    _wakeup = None
+    logger.info("Inbox consumers stopped")
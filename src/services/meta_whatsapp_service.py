@@ -1,7 +1,9 @@
+import hashlib
 import httpx
 from src.config.settings import settings
 from src.core.logging import logger
 from src.core.exceptions import WhatsAppCloudAPIError
+from src.services import rate_limiter
 
 WHAPI_API_BASE = "https://gate.whapi.cloud"
 
@@ -25,6 +27,15 @@ def _get_client() -> httpx.AsyncClient:
     return _http_client
 
 
+def _channel_id() -> str:
+    """The Whapi channel sends go out on, as rate_limiter's sender key.
+
+    A Whapi token belongs to one channel; its fingerprint is used so the
+    token itself never shows up in the send_limits metrics.
+    """
+    return hashlib.sha256(settings.META_WHATSAPP_ACCESS_TOKEN.encode()).hexdigest()[:12]
+
+
 def _format_phone(to: str) -> str:
     """Format phone number for Whapi: strip +, whatsapp: prefix, return digits only."""
     return to.replace("whatsapp:", "").replace("+", "").replace(" ", "").strip()
@@ -51,7 +62,7 @@ async def send_whatsapp(to: str, message: str) -> dict:
 
     try:
         client = _get_client()
-        response = await client.post("/messages/text", json=payload)
+        response = await rate_limiter.send("whapi", _channel_id(), lambda: client.post("/messages/text", json=payload))
 
         if response.status_code not in (200, 201):
             error_msg = response.text
@@ -90,7 +101,7 @@ async def send_image(to: str, image_url: str, caption: str = None) -> dict:
 
     try:
         client = _get_client()
-        response = await client.post("/messages/image", json=payload)
+        response = await rate_limiter.send("whapi", _channel_id(), lambda: client.post("/messages/image", json=payload))
         if response.status_code not in (200, 201):
             raise WhatsAppCloudAPIError(f"Whapi image error: {response.text}")
         data = response.json()
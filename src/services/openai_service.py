@@ -1,49 +1,151 @@
 ﻿import asyncio
-from groq import Groq, APIError, RateLimitError, APIConnectionError
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+import httpx
+from groq import AsyncGroq, APIError, RateLimitError, APIConnectionError
 from src.config.settings import settings
+from src.core import metrics
+from src.core.cache import LRUCache
 from src.core.logging import logger
 from src.core.exceptions import OpenAIServiceError
+from src.db.session import get_db, get_write_db
 
 # Initialize Groq client
 _client = None
+_gate = None
 
 MODEL_PRIMARY = "llama-3.1-8b-instant"
 MODEL_FALLBACK = "gemma2-9b-it"
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
+# Weight of the newest sample in the moving average of model latency
+LATENCY_EWMA_ALPHA = 0.2
 
-def _get_client() -> Groq:
+_queue_wait_ms = metrics.histogram("llm.queue_wait_ms")
+_model_ms = metrics.histogram("llm.model_ms")
+_first_token_ms = metrics.histogram("llm.first_token_ms")
+_stats = {"in_flight": 0, "waiting": 0, "completed": 0, "shed": 0, "queue_timeouts": 0}
+_latency_ewma = None
+
+# Completion cache: content hash -> reply, per-call-site hit/miss counts, and
+# the in-flight request per hash so concurrent identical misses share one call
+_completion_cache = LRUCache(settings.LLM_CACHE_SIZE, settings.LLM_CACHE_TTL)
+_cache_stats = {}
+_cache_inflight = {}
+_cache_writes = 0
+# Expired rows are deleted from llm_cache every this many persisted entries
+CACHE_PRUNE_EVERY = 500
+
+
+def _get_client() -> AsyncGroq:
     global _client
     if _client is None:
         if not settings.GROQ_API_KEY:
             raise OpenAIServiceError("Groq API key not configured")
-        _client = Groq(api_key=settings.GROQ_API_KEY)
+        _client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            timeout=settings.LLM_TIMEOUT,
+            # Retries are handled in _call_groq so they go back through the gate.
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=settings.LLM_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                ),
+            ),
+        )
     return _client
 
 
-async def _call_groq(messages, max_tokens=800, temperature=0.7):
-    """Call Groq API with automatic retry and model fallback."""
+def _get_gate():
+    global _gate
+    if _gate is None:
+        _gate = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _gate
+
+
+def _estimated_wait():
+    """Rough queueing delay (s) for a new request, from the moving average of model latency."""
+    if _latency_ewma is None or _stats["in_flight"] < settings.LLM_MAX_CONCURRENCY:
+        return 0.0
+    return (_stats["waiting"] + 1) / settings.LLM_MAX_CONCURRENCY * _latency_ewma
+
+
+async def _admit(deadline):
+    """Wait for a completion slot, or fail fast if it cannot be had before ``deadline``.
+
+    Requests are shed up front when the estimated queueing delay already
+    exceeds the remaining budget, so a burst is answered with quick errors
+    instead of a growing backlog of callers that will time out anyway.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or _estimated_wait() > remaining:
+        _stats["shed"] += 1
+        raise OpenAIServiceError("AI service is busy. Please try again shortly.")
+    queued = time.perf_counter()
+    _stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(_get_gate().acquire(), remaining)
+    except asyncio.TimeoutError:
+        _stats["queue_timeouts"] += 1
+        raise OpenAIServiceError("AI service is busy. Please try again shortly.")
+    finally:
+        _stats["waiting"] -= 1
+        _queue_wait_ms.observe((time.perf_counter() - queued) * 1000)
+
+
+async def _create_completion(model, messages, max_tokens, temperature, deadline):
+    global _latency_ewma
+    await _admit(deadline)
+    _stats["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        response = await _get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    finally:
+        elapsed = time.perf_counter() - started
+        _stats["in_flight"] -= 1
+        _get_gate().release()
+        _model_ms.observe(elapsed * 1000)
+        if _latency_ewma is None:
+            _latency_ewma = elapsed
+        else:
+            _latency_ewma += LATENCY_EWMA_ALPHA * (elapsed - _latency_ewma)
+    _stats["completed"] += 1
+    return response
+
+
+async def _call_groq(messages, max_tokens=800, temperature=0.7, deadline=None):
+    """Call Groq API with automatic retry and model fallback.
+
+    ``deadline`` is a ``time.monotonic()`` value by which the caller needs a
+    slot; it defaults to LLM_QUEUE_TIMEOUT seconds from now.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT
     for attempt in range(MAX_RETRIES):
         model = MODEL_PRIMARY if attempt < 2 else MODEL_FALLBACK
         try:
             logger.info(f"Groq attempt {attempt + 1}/{MAX_RETRIES} with model={model}")
-            client = _get_client()
-
-            # Groq SDK is synchronous, run in thread pool
-            response = await asyncio.to_thread(
-                client.chat.completions.create,
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            response = await _create_completion(model, messages, max_tokens, temperature, deadline)
             return response.choices[0].message.content.strip()
 
+        except OpenAIServiceError:
+            raise
+
         except RateLimitError as e:
             logger.warning(f"Groq rate limited (attempt {attempt + 1}): {e}")
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (attempt + 1)
+            wait_time = RETRY_DELAY * (attempt + 1)
+            if attempt < MAX_RETRIES - 1 and time.monotonic() + wait_time < deadline:
                 logger.info(f"Waiting {wait_time}s before retry...")
                 await asyncio.sleep(wait_time)
             else:
@@ -62,9 +164,138 @@ async def _call_groq(messages, max_tokens=800, temperature=0.7):
             raise OpenAIServiceError(f"Groq error: {str(e)}")
 
 
-async def rewrite_message(draft_message, subject, cta, tone_instruction):
-    """Use Groq to rewrite / polish a sales message."""
-    logger.info("Requesting Groq rewrite...")
+def _completion_key(messages, max_tokens, temperature):
+    """Content address of a request: hash of model, messages and parameters."""
+    payload = json.dumps(
+        {
+            "model": MODEL_PRIMARY,
+            "fallback": MODEL_FALLBACK,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count(site, outcome):
+    counts = _cache_stats.setdefault(site, {"memory_hits": 0, "persistent_hits": 0, "coalesced": 0, "misses": 0})
+    counts[outcome] += 1
+
+
+async def _load_persisted(key):
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT response FROM llm_cache WHERE cache_key = ? AND expires_at > ?",
+            (key, datetime.utcnow().isoformat()),
+        )
+        row = await cursor.fetchone()
+    return row[0] if row else None
+
+
+async def _persist(key, site, response):
+    global _cache_writes
+    now = time.time()
+    expires_at = datetime.utcfromtimestamp(now + settings.LLM_CACHE_TTL).isoformat()
+    async with get_write_db() as db:
+        await db.execute(
+            """INSERT INTO llm_cache (cache_key, call_site, response, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (cache_key) DO UPDATE SET response = excluded.response,
+                created_at = excluded.created_at, expires_at = excluded.expires_at""",
+            (key, site, response, datetime.utcfromtimestamp(now).isoformat(), expires_at),
+        )
+        _cache_writes += 1
+        if _cache_writes % CACHE_PRUNE_EVERY == 0:
+            await db.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (datetime.utcnow().isoformat(),)
+            )
+        await db.commit()
+
+
+async def _cached_call(site, messages, max_tokens, temperature=0.7, deadline=None):
+    """``_call_groq`` behind the completion cache, counted under call site ``site``.
+
+    Looks in memory, then (with LLM_CACHE_PERSIST) in the llm_cache table, and
+    only then calls the model. Cache storage errors never fail the request.
+    """
+    key = _completion_key(messages, max_tokens, temperature)
+    cached = _completion_cache.get(key)
+    if cached is not None:
+        _count(site, "memory_hits")
+        return cached
+
+    while (inflight := _cache_inflight.get(key)) is not None:
+        _count(site, "coalesced")
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            # The leader was cancelled (e.g. its client went away) but this
+            # request wasn't: go again, taking over as leader if nobody has.
+            if not inflight.cancelled() or asyncio.current_task().cancelling():
+                raise
+
+    future = asyncio.get_running_loop().create_future()
+    _cache_inflight[key] = future
+    try:
+        response = None
+        if settings.LLM_CACHE_PERSIST:
+            try:
+                response = await _load_persisted(key)
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+        if response is not None:
+            _count(site, "persistent_hits")
+        else:
+            _count(site, "misses")
+            response = await _call_groq(messages, max_tokens=max_tokens, temperature=temperature, deadline=deadline)
+            if settings.LLM_CACHE_PERSIST:
+                try:
+                    await _persist(key, site, response)
+                except Exception as e:
+                    logger.warning(f"LLM cache write failed: {e}")
+        _completion_cache.set(key, response)
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Nobody else may be waiting; mark the exception as retrieved.
+        future.exception()
+        raise
+    finally:
+        _cache_inflight.pop(key, None)
+
+
+def _llm_stats():
+    return {
+        **_stats,
+        "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        "latency_ewma_ms": round(_latency_ewma * 1000, 2) if _latency_ewma is not None else None,
+    }
+
+
+def _cache_metrics():
+    return {"sites": {site: dict(counts) for site, counts in _cache_stats.items()}, **_completion_cache.stats()}
+
+
+metrics.register_collector("llm", _llm_stats)
+metrics.register_collector("llm_cache", _cache_metrics)
+
+
+async def close_client():
+    """Close the HTTP client (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _rewrite_messages(draft_message, subject, cta, tone_instruction):
     prompt = (
         f"Rewrite the following sales email to make it more compelling and optimized for reply rates.\n\n"
         f"Tone instruction: {tone_instruction}\n\n"
@@ -76,18 +307,26 @@ async def rewrite_message(draft_message, subject, cta, tone_instruction):
         f"BODY: <improved body>\n"
         f"CTA: <improved cta>"
     )
-
-    messages = [
+    return [
         {"role": "system", "content": settings.SYSTEM_PROMPT},
         {"role": "user", "content": prompt},
     ]
 
-    content = await _call_groq(messages, max_tokens=800)
-    return _parse_rewrite_response(content, subject, draft_message, cta)
 
+async def rewrite_message(draft_message, subject, cta, tone_instruction):
+    """Use Groq to rewrite / polish a sales message."""
+    logger.info("Requesting Groq rewrite...")
+    messages = _rewrite_messages(draft_message, subject, cta, tone_instruction)
+    content = await _cached_call("rewrite_message", messages, max_tokens=800)
+    return parse_rewrite_response(content, subject, draft_message, cta)
+
+
+async def chat_completion(messages, deadline=None, cache_site=None):
+    """Send a conversation to Groq and return the assistant reply.
 
-async def chat_completion(messages):
-    """Send a conversation to Groq and return the assistant reply."""
+    Pass ``cache_site`` (a name for the metrics) only for prompts whose reply
+    may be reused verbatim for an identical prompt, such as trigger openers.
+    """
     logger.info(f"Groq chat completion with {len(messages)} messages")
 
     full_messages = [
@@ -95,12 +334,147 @@ async def chat_completion(messages):
         *messages,
     ]
 
-    reply = await _call_groq(full_messages, max_tokens=500)
+    if cache_site:
+        reply = await _cached_call(cache_site, full_messages, max_tokens=500, deadline=deadline)
+    else:
+        reply = await _call_groq(full_messages, max_tokens=500, deadline=deadline)
     logger.info(f"Groq reply length: {len(reply)} chars")
     return reply
 
 
-def _parse_rewrite_response(content, fallback_subject, fallback_body, fallback_cta):
+# Booking/action tags the model embeds for the backend; never shown to users
+_TAG_PATTERN = re.compile(
+    r"\[(CREATE_BOOKING|(TITLE|TYPE|DATE|TIME|AMOUNT):[^\]\n]*|ACTION:\s*\w+)\]", re.IGNORECASE
+)
+# Longest bracketed run held back while waiting to see whether it is a tag
+_MAX_TAG_LENGTH = 200
+
+
+class TagStripper:
+    """Remove booking/action tags from text that arrives in pieces.
+
+    Text is passed through as soon as it cannot be part of a tag; a "[" holds
+    back output only until its "]" (or a newline) shows whether it was one.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        self._pending += text
+        out = []
+        while self._pending:
+            start = self._pending.find("[")
+            if start == -1:
+                out.append(self._pending)
+                self._pending = ""
+                break
+            out.append(self._pending[:start])
+            self._pending = self._pending[start:]
+            end = self._pending.find("]")
+            newline = self._pending.find("\n")
+            if end == -1 and newline == -1 and len(self._pending) < _MAX_TAG_LENGTH:
+                break  # might still become a tag
+            if end != -1 and (newline == -1 or end < newline):
+                candidate = self._pending[:end + 1]
+                if not _TAG_PATTERN.fullmatch(candidate):
+                    out.append(candidate)
+                self._pending = self._pending[end + 1:]
+            else:
+                # Not a tag: emit the "[" and keep scanning after it.
+                out.append("[")
+                self._pending = self._pending[1:]
+        return "".join(out)
+
+    def flush(self):
+        text, self._pending = self._pending, ""
+        return text
+
+
+async def stream_chat_completion(messages, deadline=None):
+    """Stream a Groq reply to a conversation, yielding text as it arrives.
+
+    Booking/action tags are removed on the fly, so the output matches what
+    the lead would be sent.
+    """
+    full_messages = [
+        {"role": "system", "content": settings.SYSTEM_PROMPT},
+        *messages,
+    ]
+    async for text in _stream_groq(full_messages, max_tokens=500, deadline=deadline, strip_tags=True):
+        yield text
+
+
+async def stream_rewrite_message(draft_message, subject, cta, tone_instruction, deadline=None):
+    """Stream the raw SUBJECT/BODY/CTA rewrite output; parse it with ``parse_rewrite_response``."""
+    messages = _rewrite_messages(draft_message, subject, cta, tone_instruction)
+    async for text in _stream_groq(messages, max_tokens=800, deadline=deadline, strip_tags=False):
+        yield text
+
+
+async def _stream_groq(full_messages, max_tokens, deadline=None, strip_tags=True):
+    """Streaming counterpart of ``_call_groq``, behind the same admission gate.
+
+    No retries or fallback model: once text has been streamed it cannot be
+    taken back.
+    """
+    global _latency_ewma
+    if deadline is None:
+        deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT
+    stripper = TagStripper() if strip_tags else None
+    await _admit(deadline)
+    _stats["in_flight"] += 1
+    started = time.perf_counter()
+    first_token = True
+    stream = None
+    try:
+        stream = await _get_client().chat.completions.create(
+            model=MODEL_PRIMARY,
+            messages=full_messages,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if first_token:
+                first_token = False
+                _first_token_ms.observe((time.perf_counter() - started) * 1000)
+            if stripper is not None:
+                text = stripper.feed(text)
+            if text:
+                yield text
+        if stripper is not None:
+            tail = stripper.flush()
+            if tail:
+                yield tail
+        _stats["completed"] += 1
+    except RateLimitError:
+        raise OpenAIServiceError("Groq rate limit exceeded. Please try again in a minute.")
+    except APIConnectionError as e:
+        logger.error(f"Groq streaming connection error: {e}")
+        raise OpenAIServiceError("Failed to connect to Groq API")
+    except APIError as e:
+        logger.error(f"Groq streaming API error: {e}")
+        raise OpenAIServiceError(f"Groq API error: {str(e)}")
+    finally:
+        if stream is not None:
+            await stream.close()
+        elapsed = time.perf_counter() - started
+        _stats["in_flight"] -= 1
+        _get_gate().release()
+        _model_ms.observe(elapsed * 1000)
+        if _latency_ewma is None:
+            _latency_ewma = elapsed
+        else:
+            _latency_ewma += LATENCY_EWMA_ALPHA * (elapsed - _latency_ewma)
+
+
+def parse_rewrite_response(content, fallback_subject, fallback_body, fallback_cta):
     """Parse the structured rewrite output."""
     subject = fallback_subject
     body = fallback_body
@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from src.config.settings import settings
+from src.core import metrics
+from src.core.exceptions import RateLimitError
+from src.core.logging import logger
+
+# Outbound send pacing. Each (provider, sender) pair, e.g. one Twilio number,
+# has a token bucket refilled at its configured rate. Sends that find the
+# bucket empty wait in per-lane queues that are served round-robin, so one
+# large campaign cannot starve the others: the lane is the campaign being
+# sent (set with send_lane), or "" for replies and one-off sends.
+#
+# The rate adapts to what the provider accepts: a 429 halves it (down to
+# RATE_LIMIT_MIN_FACTOR of the configured rate) and pauses the sender for
+# Retry-After, and each success adds RATE_LIMIT_RECOVERY of the configured
+# rate back. Throttled requests are re-queued here instead of failing, so
+# they don't use up a trigger's retries. Limits are per process.
+_PROVIDERS = {
+    "twilio": ("RATE_LIMIT_TWILIO_RPS", "RATE_LIMIT_TWILIO_BURST"),
+    "whapi": ("RATE_LIMIT_WHAPI_RPS", "RATE_LIMIT_WHAPI_BURST"),
+    "sendgrid": ("RATE_LIMIT_SENDGRID_RPS", "RATE_LIMIT_SENDGRID_BURST"),
+}
+
+send_lane = contextvars.ContextVar("send_lane", default="")
+
+_limiters = {}
+_wait_ms = metrics.histogram("send.wait_ms")
+
+
+class SendLimiter:
+    """Token bucket with fair (round-robin by lane) queueing and adaptive rate."""
+
+    def __init__(self, key, rate, burst):
+        self.key = key
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.loop = asyncio.get_running_loop()
+        self._lanes = OrderedDict()
+        self._dispatcher = None
+        self._stats = {"granted": 0, "queued": 0, "throttled": 0, "timeouts": 0}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, lane=""):
+        """Wait for this sender's next send slot; raises RateLimitError after RATE_LIMIT_MAX_WAIT."""
+        now = time.monotonic()
+        if not self._lanes and now >= self.paused_until:
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self._stats["granted"] += 1
+                _wait_ms.observe(0.0)
+                return
+        future = self.loop.create_future()
+        self._lanes.setdefault(lane, deque()).append(future)
+        self._stats["queued"] += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = self.loop.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(future, settings.RATE_LIMIT_MAX_WAIT)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise RateLimitError(f"No {self.key[0]} send slot for {self.key[1]} within {settings.RATE_LIMIT_MAX_WAIT}s")
+        _wait_ms.observe((time.monotonic() - now) * 1000)
+
+    async def _dispatch(self):
+        while self._lanes:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            # Serve the lane at the front, then move it to the back.
+            lane, waiters = self._lanes.popitem(last=False)
+            future = waiters.popleft()
+            if waiters:
+                self._lanes[lane] = waiters
+            if future.done():
+                continue  # the waiter gave up; keep the token
+            self.tokens -= 1
+            self._stats["granted"] += 1
+            future.set_result(None)
+
+    def throttled(self, retry_after=None):
+        """The provider answered 429: slow down and pause for ``retry_after`` seconds."""
+        now = time.monotonic()
+        self._stats["throttled"] += 1
+        self.rate = max(self.base_rate * settings.RATE_LIMIT_MIN_FACTOR, self.rate / 2)
+        self.tokens = 0.0
+        self.updated = now
+        pause = min(retry_after if retry_after is not None else 1 / self.rate, settings.RATE_LIMIT_MAX_WAIT)
+        self.paused_until = max(self.paused_until, now + pause)
+        logger.warning(
+            f"{self.key[0]} throttled sender {self.key[1]}: rate now {self.rate:.2f}/s, paused {pause:.1f}s"
+        )
+
+    def succeeded(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * settings.RATE_LIMIT_RECOVERY)
+
+    def stats(self):
+        return {
+            **self._stats,
+            "rate": round(self.rate, 3),
+            "base_rate": self.base_rate,
+            "waiting": sum(len(waiters) for waiters in self._lanes.values()),
+            "lanes": len(self._lanes),
+        }
+
+
+def get_limiter(provider, sender):
+    key = (provider, sender or "")
+    limiter = _limiters.get(key)
+    if limiter is None or limiter.loop is not asyncio.get_running_loop():
+        rate_setting, burst_setting = _PROVIDERS[provider]
+        limiter = _limiters[key] = SendLimiter(key, getattr(settings, rate_setting), getattr(settings, burst_setting))
+    return limiter
+
+
+def _retry_after(response):
+    """Seconds to wait from Retry-After or X-RateLimit-Reset (epoch), if given."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        pass
+    try:
+        return max(0.0, float(response.headers["X-RateLimit-Reset"]) - time.time())
+    except (KeyError, ValueError):
+        return None
+
+
+async def send(provider, sender, request):
+    """Run ``request()``, one provider HTTP call, when the sender's rate allows.
+
+    429 responses are re-queued (up to RATE_LIMIT_MAX_THROTTLED times); the
+    last response is returned for the caller to handle as before.
+    """
+    limiter = get_limiter(provider, sender)
+    lane = send_lane.get()
+    for _ in range(settings.RATE_LIMIT_MAX_THROTTLED + 1):
+        await limiter.acquire(lane)
+        response = await request()
+        if response.status_code != 429:
+            limiter.succeeded()
+            return response
+        limiter.throttled(_retry_after(response))
+    return response
+
+
+metrics.register_collector(
+    "send_limits", lambda: {f"{provider}:{sender}": limiter.stats() for (provider, sender), limiter in _limiters.items()}
+)
@@ -0,0 +1,335 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from src.db.session import get_db, get_write_db, is_postgres
+from src.config.settings import settings
+from src.core.exceptions import ValidationError
+from src.core.logging import logger
+
+# Dashboard counters kept in stat_counters as (name, bucket) -> value.
+# They are updated in the same transaction as the row they count, so they
+# never drift from the raw tables; rebuild_counters() recomputes them anyway.
+#   messages         ""       conversation messages
+#   contacts         ""       distinct contacts (contact_key) with a conversation
+#   sent             ""       sent_messages rows
+#   sent_day         date     sent_messages per UTC day
+#   sent_channel     channel  sent_messages per channel
+#   trigger_status   status   triggers per status
+#   booking_status   status   bookings per status
+_RECOMPUTE = (
+    "SELECT 'messages', '', COUNT(*) FROM conversations",
+    "SELECT 'contacts', '', COUNT(DISTINCT contact_key) FROM conversations",
+    "SELECT 'sent', '', COUNT(*) FROM sent_messages",
+    "SELECT 'sent_day', substr(created_at, 1, 10), COUNT(*) FROM sent_messages GROUP BY substr(created_at, 1, 10)",
+    "SELECT 'sent_channel', channel, COUNT(*) FROM sent_messages GROUP BY channel",
+    "SELECT 'trigger_status', status, COUNT(*) FROM triggers GROUP BY status",
+    "SELECT 'booking_status', status, COUNT(*) FROM bookings GROUP BY status",
+)
+
+
+async def bump(db, changes):
+    """Apply ``(name, bucket, delta)`` changes inside the caller's write transaction."""
+    changes = [(name, bucket or "", delta) for name, bucket, delta in changes if delta]
+    if not changes:
+        return
+    await db.executemany(
+        """INSERT INTO stat_counters (name, bucket, value) VALUES (?, ?, ?)
+        ON CONFLICT (name, bucket) DO UPDATE SET value = stat_counters.value + excluded.value""",
+        changes,
+    )
+
+
+def status_moves(counter, moves):
+    """Counter changes for rows moving between statuses: ``moves`` is ``[(old, new), ...]``."""
+    deltas = Counter()
+    for old, new in moves:
+        if old is not None and old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    return [(counter, status, delta) for status, delta in deltas.items()]
+
+
+def today():
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+async def recompute_counters(db):
+    """Recompute every counter from the raw tables inside the caller's transaction."""
+    await db.execute("DELETE FROM stat_counters")
+    for query in _RECOMPUTE:
+        await db.execute(f"INSERT INTO stat_counters (name, bucket, value) {query}")
+
+
+async def rebuild_counters():
+    """Recompute the counters from scratch, e.g. after rows were changed outside the services."""
+    async with get_write_db() as db:
+        await recompute_counters(db)
+        await db.commit()
+    logger.info("Analytics counters rebuilt")
+
+
+async def read_analytics():
+    """Dashboard stats from the precomputed counters (a single small read)."""
+    since = (datetime.utcnow() - timedelta(days=7)).strftime("%Y-%m-%d")
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT name, bucket, value FROM stat_counters WHERE name != 'sent_day' OR bucket >= ?",
+            (since,),
+        )
+        rows = await cursor.fetchall()
+    counters = {}
+    for name, bucket, value in rows:
+        counters.setdefault(name, {})[bucket] = value
+    triggers = counters.get("trigger_status", {})
+    bookings = counters.get("booking_status", {})
+    sent_days = counters.get("sent_day", {})
+    return {
+        "total_sent": counters.get("sent", {}).get("", 0),
+        "sent_today": sent_days.get(today(), 0),
+        "active_triggers": triggers.get("active", 0),
+        "total_triggers": sum(triggers.values()),
+        "pending_bookings": bookings.get("pending", 0),
+        "confirmed_bookings": bookings.get("confirmed", 0),
+        "total_bookings": sum(bookings.values()),
+        "total_contacts": counters.get("contacts", {}).get("", 0),
+        "total_messages": counters.get("messages", {}).get("", 0),
+        "by_channel": {channel: count for channel, count in counters.get("sent_channel", {}).items() if count},
+        "sent_last_7_days": [
+            {"date": day, "count": count} for day, count in sorted(sent_days.items())
+        ],
+    }
+
+
+# ─── Rollups ────────────────────────────────────────────────────────────────────
+# Row counts per time bucket in stat_rollups, keyed by (source, granularity,
+# bucket, channel, kind). Each source is rolled up from rollup_marks.last_id,
+# the highest id already counted, so a refresh only reads rows added since.
+# Rows are counted when created; "kind" is a column that never changes after
+# insert (trigger/booking status does, so those use their type instead).
+ROLLUP_SOURCES = {
+    "sent_messages": ("channel", "status"),
+    "conversations": ("channel", "role"),
+    "triggers": ("channel", "trigger_type"),
+    "bookings": ("''", "booking_type"),
+}
+GRANULARITIES = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+# The same labels computed in SQL from the stored "YYYY-MM-DD HH:MM:SS" text
+_BUCKET_SQL = {
+    "hour": "substr(created_at, 1, 10) || 'T' || substr(created_at, 12, 2)",
+    "day": "substr(created_at, 1, 10)",
+    "month": "substr(created_at, 1, 7)",
+}
+# Default span of a range query with no start
+_DEFAULT_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=30), "month": timedelta(days=365)}
+
+_rollup_task = None
+
+
+async def _roll_up_source(db, source, limit=None):
+    channel, kind = ROLLUP_SOURCES[source]
+    settled, params = "", ()
+    if is_postgres():
+        # Writers aren't serialized on PostgreSQL: refreshes of a source take
+        # turns, and ids only count once older than ROLLUP_LAG, since a lower
+        # id may still be uncommitted while a higher one is already visible.
+        await db.execute("SELECT pg_advisory_xact_lock(hashtext(?))", (f"rollup:{source}",))
+        settled = " AND created_at <= ?"
+        params = ((datetime.utcnow() - timedelta(seconds=settings.ROLLUP_LAG)).strftime("%Y-%m-%d %H:%M:%S"),)
+    cursor = await db.execute("SELECT last_id FROM rollup_marks WHERE source = ?", (source,))
+    row = await cursor.fetchone()
+    last_id = row[0] if row else 0
+    if limit:
+        cursor = await db.execute(
+            f"""SELECT MAX(id), COUNT(*) FROM (
+                SELECT id FROM {source} WHERE id > ?{settled} ORDER BY id LIMIT ?
+            ) AS batch""",
+            (last_id, *params, limit),
+        )
+    else:
+        cursor = await db.execute(
+            f"SELECT MAX(id), COUNT(*) FROM {source} WHERE id > ?{settled}", (last_id, *params)
+        )
+    upper, count = await cursor.fetchone()
+    if upper is None:
+        return 0
+    for granularity, bucket in _BUCKET_SQL.items():
+        await db.execute(
+            f"""INSERT INTO stat_rollups (source, granularity, bucket, channel, kind, count)
+            SELECT ?, ?, {bucket}, COALESCE({channel}, ''), COALESCE({kind}, ''), COUNT(*)
+            FROM {source} WHERE id > ? AND id <= ?
+            GROUP BY 3, 4, 5
+            ON CONFLICT (source, granularity, bucket, channel, kind)
+            DO UPDATE SET count = stat_rollups.count + excluded.count""",
+            (source, granularity, last_id, upper),
+        )
+    await db.execute(
+        """INSERT INTO rollup_marks (source, last_id) VALUES (?, ?)
+        ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id""",
+        (source, upper),
+    )
+    return count
+
+
+async def roll_up(db, limit=None):
+    """Fold rows added since the last run into stat_rollups, inside the caller's transaction.
+
+    At most ``limit`` rows per source are read; returns the rows rolled up per source.
+    """
+    return {source: await _roll_up_source(db, source, limit) for source in ROLLUP_SOURCES}
+
+
+async def refresh_rollups(limit=None):
+    """Bring the rollups up to date (or by ``limit`` rows per source)."""
+    async with get_write_db() as db:
+        rolled = await roll_up(db, limit or settings.ROLLUP_BATCH)
+        await db.commit()
+    return rolled
+
+
+def _parse_time(value, name):
+    """Parse an ISO date/datetime into naive UTC, the form rows are stored in."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValidationError(f"Invalid {name} '{value}': expected an ISO date or datetime")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _buckets(start, end, granularity):
+    """Every bucket label from start to end inclusive."""
+    fmt = GRANULARITIES[granularity]
+    if granularity == "month":
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            yield f"{year:04d}-{month:02d}"
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    current = start.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        current = current.replace(hour=0)
+    while current <= end:
+        yield current.strftime(fmt)
+        current += step
+
+
+async def read_series(source, granularity="day", start=None, end=None, channel=None, kind=None, split=None):
+    """Counts per bucket between ``start`` and ``end`` (UTC, inclusive), zero-filled.
+
+    ``channel`` / ``kind`` filter the rows; ``split`` ("channel" or "kind") adds
+    a per-value breakdown to each point. Rows not rolled up yet are counted from
+    the source table, so results are current without a refresh (which writes).
+    """
+    if source not in ROLLUP_SOURCES:
+        raise ValidationError(f"Unknown source '{source}'. Choose from: {', '.join(ROLLUP_SOURCES)}")
+    if granularity not in GRANULARITIES:
+        raise ValidationError(f"Unknown granularity '{granularity}'. Choose from: {', '.join(GRANULARITIES)}")
+    if split not in (None, "channel", "kind"):
+        raise ValidationError("split must be 'channel' or 'kind'")
+    end = _parse_time(end, "end") or datetime.utcnow()
+    start = _parse_time(start, "start") or end - _DEFAULT_SPAN[granularity]
+    if start > end:
+        raise ValidationError("start must not be after end")
+    labels = []
+    for label in _buckets(start, end, granularity):
+        labels.append(label)
+        if len(labels) > settings.ROLLUP_MAX_POINTS:
+            raise ValidationError(
+                f"Range too large: more than {settings.ROLLUP_MAX_POINTS} {granularity} buckets"
+            )
+
+    channel_sql, kind_sql = (f"COALESCE({column}, '')" for column in ROLLUP_SOURCES[source])
+    bucket_sql = _BUCKET_SQL[granularity]
+    rolled_filters, tail_filters, params = "", "", []
+    if channel is not None:
+        rolled_filters += " AND channel = ?"
+        tail_filters += f" AND {channel_sql} = ?"
+        params.append(channel)
+    if kind is not None:
+        rolled_filters += " AND kind = ?"
+        tail_filters += f" AND {kind_sql} = ?"
+        params.append(kind)
+    async with get_db() as db:
+        cursor = await db.execute(
+            f"""SELECT bucket, channel, kind, count FROM stat_rollups
+            WHERE source = ? AND granularity = ? AND bucket BETWEEN ? AND ?{rolled_filters}""",
+            (source, granularity, labels[0], labels[-1], *params),
+        )
+        rows = await cursor.fetchall()
+        # The mark is read after the rollups: a refresh landing in between can
+        # only leave rows out of this answer, never count them twice.
+        cursor = await db.execute("SELECT last_id FROM rollup_marks WHERE source = ?", (source,))
+        mark = await cursor.fetchone()
+        cursor = await db.execute(
+            f"""SELECT {bucket_sql}, {channel_sql}, {kind_sql}, COUNT(*) FROM {source}
+            WHERE id > ? AND {bucket_sql} BETWEEN ? AND ?{tail_filters}
+            GROUP BY 1, 2, 3""",
+            (mark[0] if mark else 0, labels[0], labels[-1], *params),
+        )
+        rows += await cursor.fetchall()
+
+    points = {label: {"bucket": label, "count": 0, **({"breakdown": {}} if split else {})} for label in labels}
+    for bucket, row_channel, row_kind, count in rows:
+        point = points[bucket]
+        point["count"] += count
+        if split:
+            value = row_channel if split == "channel" else row_kind
+            point["breakdown"][value] = point["breakdown"].get(value, 0) + count
+    return {
+        "source": source,
+        "granularity": granularity,
+        "start": labels[0],
+        "end": labels[-1],
+        "total": sum(point["count"] for point in points.values()),
+        "series": list(points.values()),
+    }
+
+
+async def _rollup_loop(interval):
+    while True:
+        try:
+            # Keep going while a batch was full, so a backlog drains quickly.
+            while max((await refresh_rollups()).values()) >= settings.ROLLUP_BATCH:
+                await asyncio.sleep(0)
+        except Exception as e:
+            logger.error(f"Rollup refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_rollups():
+    """Start the periodic rollup refresh task (no-op if ROLLUP_INTERVAL is 0)."""
+    global _rollup_task
+    interval = settings.ROLLUP_INTERVAL
+    if interval <= 0:
+        return
+    if _rollup_task is None or _rollup_task.done():
+        _rollup_task = asyncio.create_task(_rollup_loop(interval))
+        logger.info(f"Rollup task started (interval: {interval}s)")
+
+
+def stop_rollups():
+    global _rollup_task
+    if _rollup_task and not _rollup_task.done():
+        _rollup_task.cancel()
+    _rollup_task = None
+
+
+if __name__ == "__main__":
+    # python -m src.services.stats_service  -> rebuild the counters
+    from src.db.session import close_db, init_db
+
+    async def _main():
+        await init_db()
+        await rebuild_counters()
+        await close_db()
+
+    asyncio.run(_main())
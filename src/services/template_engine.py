@@ -88,6 +88,16 @@ TONE_MODIFIERS = {
 
 def render_template(name, role, company, industry, pain_point, stage, tone):
     logger.info(f"Rendering template for stage={stage} tone={tone} lead={name}")
+    return _render(name, role, company, industry, pain_point, stage, tone)
+
+
+def render_templates(leads):
+    """Render drafts for many leads (dicts of render_template arguments) in one pass."""
+    logger.info(f"Rendering templates for {len(leads)} leads")
+    return [_render(**lead) for lead in leads]
+
+
+def _render(name, role, company, industry, pain_point, stage, tone):
     template = TEMPLATES.get(stage, TEMPLATES[SalesStage.FOLLOW_UP])
     context = {
         "name": name,
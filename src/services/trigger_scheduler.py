@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+
+from src.core import metrics
+from src.core.logging import logger
+
+LATENESS_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+# Seconds before re-trying ids whose claim failed with a database error
+CLAIM_RETRY_DELAY = 5.0
+
+
+def to_epoch(value):
+    """Convert a naive-UTC datetime or ISO string (as stored in SQLite) to epoch seconds."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TriggerScheduler:
+    """Deadline-driven dispatcher for due triggers.
+
+    Keeps a min-heap of ``(due_ts, trigger_id)`` and sleeps exactly until the
+    earliest deadline, or until ``schedule()`` pushes an earlier one. Due ids
+    are claimed in one batch through ``claim`` (which returns only the rows
+    this process now holds a lease on) and handed to at most ``max_workers``
+    concurrent executions, so a slow provider call never delays other triggers.
+
+    Cancelled or rescheduled entries are dropped lazily: ``_due`` holds the
+    authoritative deadline per trigger, and heap entries that no longer match
+    it are skipped when popped. The heap is re-seeded from the database every
+    ``resync_interval`` seconds to pick up triggers written by other processes.
+    """
+
+    def __init__(self, load_due, claim, execute, max_workers=8, resync_interval=60.0, horizon=3600.0):
+        self._load_due = load_due
+        self._claim = claim
+        self._execute = execute
+        self.max_workers = max_workers
+        self.resync_interval = resync_interval
+        self.horizon = horizon
+        self._heap = []
+        self._due = {}
+        self._touched = set()
+        self._running = set()
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._next_resync = 0.0
+        self._dispatched = 0
+        self._failed = 0
+        self._lost_claims = 0
+        self._lateness_ms = metrics.histogram("scheduler.lateness_ms", LATENESS_BUCKETS_MS)
+        self._execution_ms = metrics.histogram("scheduler.execution_ms")
+
+    def schedule(self, trigger_id, due_at):
+        """Add or move a trigger's deadline."""
+        due_ts = to_epoch(due_at)
+        self._due[trigger_id] = due_ts
+        self._touched.add(trigger_id)
+        heapq.heappush(self._heap, (due_ts, trigger_id))
+        if self._heap[0] == (due_ts, trigger_id):
+            self._wakeup.set()
+
+    def discard(self, trigger_id):
+        """Forget a trigger that was cancelled or completed outside the scheduler."""
+        self._due.pop(trigger_id, None)
+        self._touched.add(trigger_id)
+
+    async def resync(self):
+        """Rebuild the heap from the database for triggers due within the horizon."""
+        horizon_ts = time.time() + self.horizon
+        loaded = {
+            trigger_id: to_epoch(due_at)
+            for trigger_id, due_at in await self._load_due(horizon_ts)
+            if trigger_id not in self._running
+        }
+        # Local schedule()/discard() calls since the last resync (including any
+        # made while the load was in flight) are at least as fresh as the snapshot.
+        for trigger_id in self._touched:
+            if trigger_id in self._due:
+                loaded[trigger_id] = self._due[trigger_id]
+            else:
+                loaded.pop(trigger_id, None)
+        # Keep far-future deadlines pushed via schedule(); they are beyond what we loaded.
+        for trigger_id, due_ts in self._due.items():
+            if due_ts > horizon_ts and trigger_id not in loaded:
+                loaded[trigger_id] = due_ts
+        self._due = loaded
+        self._touched = set()
+        self._heap = [(due_ts, trigger_id) for trigger_id, due_ts in loaded.items()]
+        heapq.heapify(self._heap)
+        self._next_resync = time.monotonic() + self.resync_interval
+
+    async def run(self):
+        logger.info(
+            f"Trigger scheduler started (workers: {self.max_workers}, resync: {self.resync_interval}s)"
+        )
+        while True:
+            if time.monotonic() >= self._next_resync:
+                try:
+                    await self.resync()
+                except Exception as e:
+                    logger.error(f"Trigger scheduler resync failed: {e}")
+                    self._next_resync = time.monotonic() + self.resync_interval
+
+            self._wakeup.clear()
+            await self._dispatch_due()
+
+            timeout = max(0.0, self._next_resync - time.monotonic())
+            if self._heap and len(self._running) < self.max_workers:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch_due(self):
+        free = self.max_workers - len(self._running)
+        now = time.time()
+        batch = {}
+        while free > len(batch) and self._heap and self._heap[0][0] <= now:
+            due_ts, trigger_id = heapq.heappop(self._heap)
+            if self._due.get(trigger_id) != due_ts or trigger_id in self._running:
+                continue
+            del self._due[trigger_id]
+            batch[trigger_id] = due_ts
+        if not batch:
+            return
+
+        try:
+            claimed = await self._claim(list(batch))
+        except Exception as e:
+            logger.error(f"Failed to claim triggers {list(batch)}: {e}")
+            for trigger_id, due_ts in batch.items():
+                self.schedule(trigger_id, datetime.utcfromtimestamp(time.time() + CLAIM_RETRY_DELAY))
+            return
+
+        # Unclaimed ids are leased by another worker, rescheduled, or no longer active.
+        self._lost_claims += len(batch) - len(claimed)
+        for trigger in claimed:
+            trigger_id = trigger["id"]
+            self._running.add(trigger_id)
+            task = asyncio.create_task(self._run_claimed(trigger, batch.get(trigger_id, now)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_claimed(self, trigger, due_ts):
+        trigger_id = trigger["id"]
+        started = time.time()
+        self._lateness_ms.observe(max(0.0, started - due_ts) * 1000)
+        self._dispatched += 1
+        try:
+            await self._execute(trigger)
+        except Exception as e:
+            self._failed += 1
+            logger.error(f"Scheduled trigger {trigger_id} raised: {e}")
+        finally:
+            self._execution_ms.observe((time.time() - started) * 1000)
+            self._running.discard(trigger_id)
+            self._wakeup.set()
+
+    async def drain(self, timeout):
+        """Wait up to ``timeout`` seconds for in-flight executions to finish."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def stats(self):
+        return {
+            "scheduled": len(self._due),
+            "heap_entries": len(self._heap),
+            "running": len(self._running),
+            "max_workers": self.max_workers,
+            "dispatched": self._dispatched,
+            "failed": self._failed,
+            "lost_claims": self._lost_claims,
+            "next_due_in_s": round(self._heap[0][0] - time.time(), 3) if self._heap else None,
+        }
@@ -1,18 +1,28 @@
 import asyncio
+import csv
+import io
+import json
+import os
 import re
+import socket
+import uuid
 from datetime import datetime, timedelta
-from src.db.session import get_db
+from src.db.session import copy_rows, get_db, get_write_db, skip_locked, unit_of_work
 from src.config.settings import settings
 from src.services.twilio_service import send_sms
-from src.services.email_service import send_email
+from src.services.email_service import MAX_PERSONALIZATIONS, send_email, send_email_batch
 from src.services.openai_service import chat_completion
 from src.services.conversation_service import store_message, store_sent_message, get_recent_messages
 from src.services.booking_service import (
     create_booking, get_pending_bookings, confirm_all_pending,
     cancel_all_pending, get_booking_by_code, confirm_booking, cancel_booking,
 )
+from src.core import metrics
+from src.core.contacts import normalize_contact
 from src.core.logging import logger
-from src.core.exceptions import DatabaseError
+from src.core.exceptions import DatabaseError, ValidationError
+from src.services import context_cache, event_hub, rate_limiter, stats_service
+from src.services.trigger_scheduler import TriggerScheduler
 
 
 def _get_whatsapp_sender():
@@ -27,31 +37,54 @@ def _get_whatsapp_sender():
 # Background task reference
 _trigger_task = None
 _reply_listener_task = None
+_scheduler = None
 
-# Check triggers every 10 seconds instead of 30
-SCHEDULER_INTERVAL = 10
 # Check for new replies every 5 seconds
 REPLY_CHECK_INTERVAL = 5
 
+# Identifies this process in triggers.claimed_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _notify_scheduled(trigger_id, scheduled_at):
+    """Tell the running scheduler about a new or moved deadline."""
+    if _scheduler is not None:
+        _scheduler.schedule(trigger_id, scheduled_at)
+
+
+def _notify_removed(trigger_ids):
+    """Drop triggers that are no longer active from the running scheduler."""
+    if _scheduler is not None:
+        for trigger_id in trigger_ids:
+            _scheduler.discard(trigger_id)
+
 
 async def create_trigger(name, trigger_type, channel, recipient, message,
                          recipient_name=None, subject=None, delay_minutes=1,
                          max_retries=3, stop_on_reply=True, campaign_name=None, step_number=0):
     """Create a new trigger in the database."""
     scheduled_at = datetime.utcnow() + timedelta(minutes=delay_minutes)
-    db = await get_db()
     try:
-        cursor = await db.execute(
-            """INSERT INTO triggers 
-            (name, trigger_type, channel, recipient, recipient_name, message, subject,
-             delay_minutes, max_retries, stop_on_reply, status, campaign_name, step_number, scheduled_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?)""",
-            (name, trigger_type, channel, recipient, recipient_name, message, subject,
-             delay_minutes, max_retries, int(stop_on_reply), campaign_name, step_number,
-             scheduled_at.isoformat()),
+        async with get_write_db() as db:
+            cursor = await db.execute(
+                """INSERT INTO triggers 
+                (name, trigger_type, channel, recipient, contact_key, recipient_name, message, subject,
+                 delay_minutes, max_retries, stop_on_reply, status, campaign_name, step_number, scheduled_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?)
+                RETURNING id""",
+                (name, trigger_type, channel, recipient, normalize_contact(recipient), recipient_name,
+                 message, subject, delay_minutes, max_retries, int(stop_on_reply), campaign_name,
+                 step_number, scheduled_at.isoformat()),
+            )
+            trigger_id = (await cursor.fetchone())[0]
+            await stats_service.bump(db, [("trigger_status", "active", 1)])
+            await db.commit()
+        context_cache.invalidate([normalize_contact(recipient)], "trigger")
+        _notify_scheduled(trigger_id, scheduled_at)
+        event_hub.publish(
+            "trigger", normalize_contact(recipient), id=trigger_id, status="active",
+            name=name, campaign_name=campaign_name,
         )
-        await db.commit()
-        trigger_id = cursor.lastrowid
         logger.info(f"Trigger created: id={trigger_id} name={name} scheduled_at={scheduled_at}")
 
         # --- Generate Groq AI reply and send as initial message ---
@@ -60,7 +93,7 @@ async def create_trigger(name, trigger_type, channel, recipient, message,
             {"role": "user", "content": message}
         ]
         try:
-            ai_reply = await chat_completion(messages=context_messages)
+            ai_reply = await chat_completion(messages=context_messages, cache_site="trigger_opener")
             logger.info(f"Groq initial reply: {ai_reply[:100]}")
         except Exception as e:
             logger.error(f"Groq failed, using fallback: {e}")
@@ -94,21 +127,19 @@ async def create_trigger(name, trigger_type, channel, recipient, message,
     except Exception as e:
         logger.error(f"Failed to create trigger: {e}")
         raise DatabaseError(f"Failed to create trigger: {str(e)}")
-    finally:
-        await db.close()
 
 
 async def get_all_triggers(status=None):
     """Get all triggers, optionally filtered by status."""
-    db = await get_db()
     try:
-        if status:
-            cursor = await db.execute(
-                "SELECT * FROM triggers WHERE status = ? ORDER BY created_at DESC", (status,)
-            )
-        else:
-            cursor = await db.execute("SELECT * FROM triggers ORDER BY created_at DESC")
-        rows = await cursor.fetchall()
+        async with get_db() as db:
+            if status:
+                cursor = await db.execute(
+                    "SELECT * FROM triggers WHERE status = ? ORDER BY created_at DESC", (status,)
+                )
+            else:
+                cursor = await db.execute("SELECT * FROM triggers ORDER BY created_at DESC")
+            rows = await cursor.fetchall()
         triggers = []
         for row in rows:
             triggers.append({
@@ -135,24 +166,36 @@ async def get_all_triggers(status=None):
     except Exception as e:
         logger.error(f"Failed to fetch triggers: {e}")
         raise DatabaseError(f"Failed to fetch triggers: {str(e)}")
-    finally:
-        await db.close()
+
+
+async def _current_status(db, trigger_id):
+    """Status of a trigger read inside the caller's write transaction, for the counters."""
+    cursor = await db.execute("SELECT status FROM triggers WHERE id = ?", (trigger_id,))
+    row = await cursor.fetchone()
+    return row[0] if row else None
 
 
 async def update_trigger_status(trigger_id, status):
     """Update a trigger's status."""
-    db = await get_db()
     try:
-        await db.execute(
-            "UPDATE triggers SET status = ?, updated_at = ? WHERE id = ?",
-            (status, datetime.utcnow().isoformat(), trigger_id),
-        )
-        await db.commit()
+        async with get_write_db() as db:
+            previous = await _current_status(db, trigger_id)
+            cursor = await db.execute(
+                """UPDATE triggers SET status = ?, updated_at = ?, claimed_by = NULL, lease_until = NULL
+                WHERE id = ? RETURNING contact_key""",
+                (status, datetime.utcnow().isoformat(), trigger_id),
+            )
+            changed = await cursor.fetchall()
+            await stats_service.bump(db, stats_service.status_moves("trigger_status", [(previous, status)] * len(changed)))
+            await db.commit()
+        context_cache.invalidate([row[0] for row in changed], "trigger")
+        if status != "active":
+            _notify_removed([trigger_id])
+        for row in changed:
+            event_hub.publish("trigger", row[0], id=trigger_id, status=status)
         logger.info(f"Trigger {trigger_id} status updated to {status}")
     except Exception as e:
         logger.error(f"Failed to update trigger: {e}")
-    finally:
-        await db.close()
 
 
 async def cancel_trigger(trigger_id):
@@ -163,105 +206,332 @@ async def cancel_trigger(trigger_id):
 
 async def cancel_campaign(campaign_name):
     """Cancel all triggers in a campaign."""
-    db = await get_db()
     try:
-        await db.execute(
-            "UPDATE triggers SET status = 'cancelled', updated_at = ? WHERE campaign_name = ? AND status = 'active'",
-            (datetime.utcnow().isoformat(), campaign_name),
-        )
-        await db.commit()
+        async with get_write_db() as db:
+            cursor = await db.execute(
+                """UPDATE triggers SET status = 'cancelled', updated_at = ?
+                WHERE campaign_name = ? AND status = 'active' RETURNING id, contact_key""",
+                (datetime.utcnow().isoformat(), campaign_name),
+            )
+            cancelled = await cursor.fetchall()
+            await stats_service.bump(
+                db, stats_service.status_moves("trigger_status", [("active", "cancelled")] * len(cancelled))
+            )
+            await db.commit()
+        context_cache.invalidate({row[1] for row in cancelled}, "trigger")
+        _notify_removed([row[0] for row in cancelled])
+        for trigger_id, contact_key in cancelled:
+            event_hub.publish("trigger", contact_key, id=trigger_id, status="cancelled")
         logger.info(f"Campaign '{campaign_name}' cancelled")
         return {"success": True, "detail": f"Campaign '{campaign_name}' cancelled"}
     except Exception as e:
         logger.error(f"Failed to cancel campaign: {e}")
         raise DatabaseError(f"Failed to cancel campaign: {str(e)}")
-    finally:
-        await db.close()
 
 
-async def check_recipient_replied(recipient):
-    """Check if recipient has replied recently."""
-    db = await get_db()
+_CAMPAIGN_TRIGGER_COLUMNS = (
+    "name", "trigger_type", "channel", "recipient", "contact_key", "recipient_name", "message",
+    "subject", "delay_minutes", "max_retries", "stop_on_reply", "status", "campaign_name",
+    "step_number", "scheduled_at", "campaign_id", "variables",
+)
+_CAMPAIGN_STATUSES = ("active", "completed", "failed", "cancelled")
+_RECIPIENT_COLUMNS = ("recipient", "phone", "phone_number", "email")
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def personalize(text, variables):
+    """Fill {field} placeholders from ``variables``; unknown ones are left as written."""
+    if not text or not variables:
+        return text
+    return _PLACEHOLDER.sub(lambda match: str(variables.get(match.group(1), match.group(0))), text)
+
+
+def parse_recipients_csv(text):
+    """Read campaign recipients from CSV text with a header row.
+
+    The recipient comes from a recipient, phone, phone_number or email column
+    and {name} from a name column; every other column becomes a placeholder
+    named after its header (lower-cased, non-word characters as "_").
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    headers = {
+        header: re.sub(r"\W+", "_", header.strip().lower()) for header in reader.fieldnames or [] if header
+    }
+    recipient_header = next(
+        (header for column in _RECIPIENT_COLUMNS for header, key in headers.items() if key == column), None
+    )
+    if recipient_header is None:
+        raise ValidationError("CSV needs a recipient, phone, phone_number or email column")
+    recipients = []
+    for row in reader:
+        variables = {
+            headers[header]: (value or "").strip()
+            for header, value in row.items()
+            if header in headers and header != recipient_header
+        }
+        recipients.append({
+            "recipient": (row[recipient_header] or "").strip(),
+            "name": variables.pop("name", "") or None,
+            "variables": variables,
+        })
+    return recipients
+
+
+async def create_campaign(name, channel, recipients, messages, subject_prefix=None,
+                          start_delay_minutes=0, delay_between_minutes=1440,
+                          max_retries=3, stop_on_reply=True):
+    """Create a campaign with one trigger per recipient per step, in one batched insert.
+
+    ``recipients`` are dicts with ``recipient`` and optional ``name`` and
+    ``variables``. Nothing is generated or sent here: messages and subjects
+    keep their {name}/{variable} placeholders, which execute_trigger fills in
+    when each step is sent. Repeated recipients (by contact key) are dropped.
+    Returns the campaign with its progress counters (see get_campaign).
+    """
+    unique = {}
+    for entry in recipients:
+        recipient = (entry.get("recipient") or "").strip()
+        contact_key = normalize_contact(recipient)
+        if recipient and contact_key not in unique:
+            variables = {"name": entry.get("name"), **(entry.get("variables") or {})}
+            variables = {key: value for key, value in variables.items() if value is not None}
+            unique[contact_key] = (recipient, entry.get("name"), json.dumps(variables) if variables else None)
+    if not unique:
+        raise ValidationError("Campaign has no recipients")
+    if len(unique) > settings.CAMPAIGN_MAX_RECIPIENTS:
+        raise ValidationError(f"Campaign has more than {settings.CAMPAIGN_MAX_RECIPIENTS} recipients")
+
+    now = datetime.utcnow()
+    steps = []
+    for i, message in enumerate(messages):
+        delay = start_delay_minutes + delay_between_minutes * i
+        steps.append((
+            i + 1, f"{name} - Step {i + 1}", message,
+            f"{subject_prefix} - Step {i + 1}" if subject_prefix else None,
+            delay, (now + timedelta(minutes=delay)).isoformat(),
+        ))
     try:
+        async with get_write_db() as db:
+            cursor = await db.execute(
+                """INSERT INTO campaigns (name, channel, total_recipients, total_steps)
+                VALUES (?, ?, ?, ?) RETURNING id""",
+                (name, channel, len(unique), len(steps)),
+            )
+            campaign_id = (await cursor.fetchone())[0]
+            rows = [
+                (step_name, "drip", channel, recipient, contact_key, recipient_name, message, subject,
+                 delay, max_retries, int(stop_on_reply), "active", name, step_number, scheduled_at,
+                 campaign_id, variables)
+                for contact_key, (recipient, recipient_name, variables) in unique.items()
+                for step_number, step_name, message, subject, delay, scheduled_at in steps
+            ]
+            await copy_rows(db, "triggers", _CAMPAIGN_TRIGGER_COLUMNS, rows)
+            await stats_service.bump(db, [("trigger_status", "active", len(rows))])
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to create campaign: {e}")
+        raise DatabaseError(f"Failed to create campaign: {str(e)}")
+
+    context_cache.invalidate(unique.keys(), "trigger")
+    await _schedule_campaign(campaign_id)
+    event_hub.publish("campaign", id=campaign_id, status="active", name=name, triggers=len(rows))
+    logger.info(f"Campaign created: id={campaign_id} name={name} recipients={len(unique)} triggers={len(rows)}")
+    return await get_campaign(campaign_id)
+
+
+async def _schedule_campaign(campaign_id):
+    """Hand the running scheduler the campaign's triggers due within its horizon."""
+    if _scheduler is None:
+        return
+    horizon = (datetime.utcnow() + timedelta(seconds=_scheduler.horizon)).isoformat()
+    async with get_db() as db:
         cursor = await db.execute(
-            """SELECT COUNT(*) FROM conversations 
-            WHERE phone_number LIKE ? AND role = 'user' 
-            AND created_at > datetime('now', '-24 hours')""",
-            (f"%{recipient.replace('+', '')}%",),
+            """SELECT id, scheduled_at FROM triggers
+            WHERE campaign_id = ? AND status = 'active' AND scheduled_at <= ?""",
+            (campaign_id, horizon),
         )
-        row = await cursor.fetchone()
+        rows = await cursor.fetchall()
+    for trigger_id, scheduled_at in rows:
+        _notify_scheduled(trigger_id, scheduled_at)
+
+
+async def get_campaign(campaign_id):
+    """A campaign with per-status trigger counts, or None if there is no such campaign."""
+    try:
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT id, name, channel, total_recipients, total_steps, created_at
+                FROM campaigns WHERE id = ?""",
+                (campaign_id,),
+            )
+            campaign = await cursor.fetchone()
+            if campaign is None:
+                return None
+            cursor = await db.execute(
+                "SELECT status, COUNT(*) FROM triggers WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+            )
+            counts = {row[0]: row[1] for row in await cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Failed to fetch campaign {campaign_id}: {e}")
+        raise DatabaseError(f"Failed to fetch campaign: {str(e)}")
+    progress = {status: counts.get(status, 0) for status in _CAMPAIGN_STATUSES}
+    return {
+        "campaign_id": campaign[0],
+        "campaign_name": campaign[1],
+        "channel": campaign[2],
+        "status": "running" if progress["active"] else "finished",
+        "total_recipients": campaign[3],
+        "total_steps": campaign[4],
+        "total_triggers": sum(counts.values()),
+        "progress": progress,
+        "created_at": str(campaign[5]) if campaign[5] is not None else None,
+    }
+
+
+async def check_recipient_replied(recipient):
+    """Check if recipient has replied recently."""
+    try:
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT COUNT(*) FROM conversations 
+                WHERE contact_key = ? AND role = 'user' 
+                AND created_at > ?""",
+                (normalize_contact(recipient), (datetime.utcnow() - timedelta(hours=24)).strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            row = await cursor.fetchone()
         return row[0] > 0
     except Exception:
         return False
-    finally:
-        await db.close()
 
 
 async def get_active_triggers_for_recipient(recipient):
     """Get active triggers for a specific recipient."""
-    db = await get_db()
     try:
-        cursor = await db.execute(
-            """SELECT * FROM triggers 
-            WHERE recipient LIKE ? AND status = 'active' 
-            ORDER BY scheduled_at ASC""",
-            (f"%{recipient.replace('+', '')}%",),
-        )
-        rows = await cursor.fetchall()
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT * FROM triggers 
+                WHERE contact_key = ? AND status = 'active' 
+                ORDER BY scheduled_at ASC""",
+                (normalize_contact(recipient),),
+            )
+            rows = await cursor.fetchall()
         return rows
     except Exception:
         return []
-    finally:
-        await db.close()
 
 
-async def handle_lead_reply(phone_number, message_text, channel="whatsapp"):
+async def handle_lead_reply(phone_number, message_text, channel="whatsapp", on_record=None):
     """
     When a lead replies to a triggered message:
-    1. Store their message
-    2. Cancel remaining triggers (stop_on_reply)
-    3. Use Groq to generate a smart reply
-    4. Store the AI reply
-    5. Return reply (TwiML will send it — NOT us)
+    1. Take their stop_on_reply triggers out of the scheduler
+    2. Use Groq to generate a smart reply
+    3. In one transaction: store their message, complete those triggers,
+       run booking actions, store the AI reply and the sent_messages record
+    4. Return reply (TwiML will send it — NOT us)
+
+    The writes commit together or not at all: on failure DatabaseError is
+    raised with nothing stored, so the message can be retried from scratch.
+    ``on_record(uow, reply)``, if given, runs inside that transaction so the
+    caller can record its own progress along with it.
     """
     logger.info(f"Lead reply from {phone_number} on {channel}: {message_text[:80]}")
+    contact_key = normalize_contact(phone_number)
 
-    # 1. Store the lead's reply
-    await store_message(
-        phone_number=phone_number,
-        role="user",
-        message=message_text,
-        channel=channel,
-    )
+    # 1. Stop pending follow-ups from firing while the reply is generated;
+    #    if the transaction fails the scheduler's resync brings them back.
+    async with get_db() as db:
+        cursor = await db.execute(
+            """SELECT id FROM triggers 
+            WHERE contact_key = ? AND status = 'active' AND stop_on_reply = 1""",
+            (contact_key,),
+        )
+        _notify_removed([row[0] for row in await cursor.fetchall()])
 
-    # 2. Cancel active triggers with stop_on_reply
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+    # 2. Context (booking info, trigger context, history) plus this message,
+    #    which is not stored yet; generate the AI reply with no lock held.
+    context_messages = await build_reply_context(phone_number)
+    context_messages.append({"role": "user", "content": message_text})
     try:
-        cursor = await db.execute(
-            """SELECT id, name FROM triggers 
-            WHERE recipient LIKE ? AND status = 'active' AND stop_on_reply = 1""",
-            (f"%{clean_number}%",),
+        ai_reply = await chat_completion(messages=context_messages)
+        logger.info(f"Groq generated reply: {ai_reply[:100]}")
+    except Exception as e:
+        logger.error(f"Groq failed, using fallback: {e}")
+        ai_reply = (
+            "Thanks for your reply! I'd love to continue our conversation. "
+            "A member of our team will be in touch shortly."
         )
-        cancelled_triggers = await cursor.fetchall()
-        if cancelled_triggers:
-            await db.execute(
-                """UPDATE triggers SET status = 'completed', updated_at = ?
-                WHERE recipient LIKE ? AND status = 'active' AND stop_on_reply = 1""",
-                (datetime.utcnow().isoformat(), f"%{clean_number}%"),
+
+    # 3. Record everything in a single transaction
+    try:
+        async with unit_of_work() as uow:
+            await store_message(
+                phone_number=phone_number,
+                role="user",
+                message=message_text,
+                channel=channel,
+                uow=uow,
             )
-            await db.commit()
-            for t in cancelled_triggers:
-                logger.info(f"Auto-completed trigger {t[0]} ({t[1]}) — lead replied")
+            await _complete_replied_triggers(contact_key, uow)
+            ai_reply = await _process_booking_actions(ai_reply, phone_number, uow)
+            await store_message(
+                phone_number=phone_number,
+                role="assistant",
+                message=ai_reply,
+                channel=channel,
+                uow=uow,
+            )
+            await store_sent_message(
+                recipient=phone_number.replace("whatsapp:", ""),
+                channel=channel,
+                body=ai_reply,
+                subject=None,
+                external_id="twiml_reply",
+                status="auto_reply",
+                uow=uow,
+            )
+            if on_record is not None:
+                await on_record(uow, ai_reply)
     except Exception as e:
-        logger.error(f"Error cancelling triggers: {e}")
-    finally:
-        await db.close()
+        logger.error(f"Failed to record reply for {phone_number}: {e}")
+        raise DatabaseError(f"Failed to record reply: {str(e)}")
+
+    # 4. Return the reply — TwiML in webhook will send it
+    #    DO NOT call send_whatsapp/send_sms here to avoid double message
+    logger.info(f"Returning AI reply for TwiML delivery to {phone_number}")
+    return ai_reply
+
+
+async def _complete_replied_triggers(contact_key, uow):
+    """Mark the contact's active stop_on_reply triggers completed, inside ``uow``."""
+    cursor = await uow.db.execute(
+        """UPDATE triggers SET status = 'completed', updated_at = ?
+        WHERE contact_key = ? AND status = 'active' AND stop_on_reply = 1
+        RETURNING id, name""",
+        (datetime.utcnow().isoformat(), contact_key),
+    )
+    completed = await cursor.fetchall()
+    if not completed:
+        return
+    await stats_service.bump(
+        uow.db, stats_service.status_moves("trigger_status", [("active", "completed")] * len(completed))
+    )
+
+    def done():
+        context_cache.invalidate([contact_key], "trigger")
+        _notify_removed([t[0] for t in completed])
+        for t in completed:
+            event_hub.publish("trigger", contact_key, id=t[0], status="completed")
+            logger.info(f"Auto-completed trigger {t[0]} ({t[1]}) — lead replied")
+
+    uow.on_commit(done)
 
-    # 3. Get conversation history for context
+
+async def build_reply_context(phone_number):
+    """Prompt messages for replying to a lead: booking and trigger context plus recent history."""
+    # Conversation history
     history = await get_recent_messages(phone_number=phone_number, limit=10)
 
-    # 4. Build context-aware prompt with booking info
+    # Booking and trigger context
     trigger_context = await _get_trigger_context(phone_number)
     pending_bookings = await get_pending_bookings(phone_number)
 
@@ -302,76 +572,44 @@ async def handle_lead_reply(phone_number, message_text, channel="whatsapp"):
         })
 
     context_messages.extend(history)
-
-    # 5. Generate AI reply using Groq
-    try:
-        ai_reply = await chat_completion(messages=context_messages)
-        logger.info(f"Groq generated reply: {ai_reply[:100]}")
-    except Exception as e:
-        logger.error(f"Groq failed, using fallback: {e}")
-        ai_reply = (
-            "Thanks for your reply! I'd love to continue our conversation. "
-            "A member of our team will be in touch shortly."
-        )
-
-    # 5b. Parse booking actions from AI reply
-    ai_reply = await _process_booking_actions(ai_reply, phone_number)
-
-    # 6. Store AI reply in conversation
-    await store_message(
-        phone_number=phone_number,
-        role="assistant",
-        message=ai_reply,
-        channel=channel,
-    )
-
-    # 7. Store in sent_messages for tracking
-    await store_sent_message(
-        recipient=phone_number.replace("whatsapp:", ""),
-        channel=channel,
-        body=ai_reply,
-        subject=None,
-        external_id="twiml_reply",
-        status="auto_reply",
-    )
-
-    # 8. Return the reply — TwiML in webhook will send it
-    #    DO NOT call send_whatsapp/send_sms here to avoid double message
-    logger.info(f"Returning AI reply for TwiML delivery to {phone_number}")
-    return ai_reply
+    return context_messages
 
 
 async def _get_trigger_context(phone_number):
     """Get the most recent trigger context for this recipient."""
-    clean_number = phone_number.replace("whatsapp:", "").replace("+", "")
-    db = await get_db()
+    contact_key = normalize_contact(phone_number)
+    cached = context_cache.lookup(contact_key, "trigger")
+    if not context_cache.is_missing(cached):
+        return dict(cached) if cached else None
     try:
-        cursor = await db.execute(
-            """SELECT name, message, recipient_name, trigger_type, channel 
-            FROM triggers 
-            WHERE recipient LIKE ? AND status IN ('completed', 'active')
-            ORDER BY executed_at DESC, created_at DESC 
-            LIMIT 1""",
-            (f"%{clean_number}%",),
-        )
-        row = await cursor.fetchone()
+        generation = context_cache.begin_load(contact_key, "trigger")
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT name, message, recipient_name, trigger_type, channel 
+                FROM triggers 
+                WHERE contact_key = ? AND status IN ('completed', 'active')
+                ORDER BY executed_at IS NULL, executed_at DESC, created_at DESC 
+                LIMIT 1""",
+                (contact_key,),
+            )
+            row = await cursor.fetchone()
+        context = None
         if row:
-            return {
+            context = {
                 "name": row[0],
                 "message": row[1],
                 "recipient_name": row[2],
                 "trigger_type": row[3],
                 "channel": row[4],
             }
-        return None
+        context_cache.store(contact_key, "trigger", dict(context) if context else None, generation)
+        return context
     except Exception:
         return None
-    finally:
-        await db.close()
 
 
-async def _process_booking_actions(ai_reply, phone_number):
-    """Parse AI response for booking action tags and execute them.
+async def _process_booking_actions(ai_reply, phone_number, uow=None):
+    """Parse AI response for booking action tags and execute them (inside ``uow`` if given).
     
     Tags parsed:
     - [CREATE_BOOKING] with [TITLE:], [TYPE:], [DATE:], [TIME:], [AMOUNT:]
@@ -405,6 +643,7 @@ async def _process_booking_actions(ai_reply, phone_number):
                 date=date,
                 time=time_val,
                 amount=amount,
+                uow=uow,
             )
             code = booking["confirmation_code"]
             logger.info(f"Auto-created booking {code} for {phone_number}")
@@ -427,6 +666,8 @@ async def _process_booking_actions(ai_reply, phone_number):
             clean_reply += booking_info
 
         except Exception as e:
+            if uow is not None:
+                raise
             logger.error(f"Failed to auto-create booking: {e}")
 
     # --- Handle ACTION: CONFIRM ---
@@ -439,11 +680,10 @@ async def _process_booking_actions(ai_reply, phone_number):
 
         if code_match and await get_booking_by_code(code_match.group(1)):
             code = code_match.group(1)
-            await confirm_booking(confirmation_code=code)
-            booking = await get_booking_by_code(code)
+            await confirm_booking(confirmation_code=code, uow=uow)
             clean_reply += f"\n\n✅ Booking *{code}* confirmed!"
         elif pending:
-            count = await confirm_all_pending(phone_number)
+            count = await confirm_all_pending(phone_number, uow=uow)
             clean_reply += f"\n\n✅ {count} booking(s) confirmed successfully!"
         else:
             clean_reply += "\n\nℹ️ No pending bookings found to confirm."
@@ -457,10 +697,10 @@ async def _process_booking_actions(ai_reply, phone_number):
 
         if code_match and await get_booking_by_code(code_match.group(1)):
             code = code_match.group(1)
-            await cancel_booking(confirmation_code=code)
+            await cancel_booking(confirmation_code=code, uow=uow)
             clean_reply += f"\n\n❌ Booking *{code}* has been cancelled."
         elif pending:
-            count = await cancel_all_pending(phone_number)
+            count = await cancel_all_pending(phone_number, uow=uow)
             clean_reply += f"\n\n❌ {count} booking(s) cancelled."
         else:
             clean_reply += "\n\nℹ️ No pending bookings found to cancel."
@@ -514,11 +754,19 @@ async def execute_trigger(trigger):
     trigger_id = trigger["id"]
     channel = trigger["channel"]
     recipient = trigger["recipient"]
-    message = trigger["message"]
-    subject = trigger["subject"]
+    # Campaign triggers carry per-recipient placeholder values
+    variables = json.loads(trigger["variables"]) if trigger.get("variables") else None
+    message = personalize(trigger["message"], variables)
+    subject = personalize(trigger["subject"], variables)
     name = trigger["name"]
 
     logger.info(f"Executing trigger {trigger_id}: {name} -> {channel}:{recipient}")
+    # Queue behind other sends of the same campaign, not behind other campaigns.
+    rate_limiter.send_lane.set(trigger.get("campaign_name") or f"trigger:{trigger_id}")
+
+    if channel == "email" and trigger.get("campaign_name"):
+        await _execute_email_step(trigger)
+        return
 
     try:
         # Check if recipient replied (stop_on_reply)
@@ -545,107 +793,323 @@ async def execute_trigger(trigger):
             await update_trigger_status(trigger_id, "failed")
             return
 
+        await _record_sent([(trigger, message, subject, external_id)])
+        logger.info(f"Trigger {trigger_id} executed successfully")
+
+    except Exception as e:
+        await _record_failure(trigger, e)
+
+
+async def _record_sent(sent):
+    """Store the sent messages and mark their triggers completed.
+
+    ``sent`` holds (trigger, message, subject, external_id) tuples.
+    """
+    for trigger, message, subject, external_id in sent:
         # Store the triggered message as assistant message for conversation context
         await store_message(
-            phone_number=recipient,
+            phone_number=trigger["recipient"],
             role="assistant",
             message=message,
-            channel=channel,
+            channel=trigger["channel"],
         )
-
         # Store sent message
         await store_sent_message(
-            recipient=recipient,
-            channel=channel,
+            recipient=trigger["recipient"],
+            channel=trigger["channel"],
             body=message,
             subject=subject,
             external_id=external_id,
             status="triggered",
         )
 
-        # Mark as completed
-        db = await get_db()
-        try:
-            await db.execute(
-                "UPDATE triggers SET status = 'completed', executed_at = ?, updated_at = ? WHERE id = ?",
-                (datetime.utcnow().isoformat(), datetime.utcnow().isoformat(), trigger_id),
-            )
-            await db.commit()
-        finally:
-            await db.close()
+    # Mark as completed
+    now = datetime.utcnow().isoformat()
+    trigger_ids = [trigger["id"] for trigger, *_ in sent]
+    async with get_write_db() as db:
+        cursor = await db.execute(
+            f"""SELECT status FROM triggers WHERE id IN ({", ".join("?" for _ in trigger_ids)})""",
+            trigger_ids,
+        )
+        previous = [row[0] for row in await cursor.fetchall()]
+        await db.execute(
+            f"""UPDATE triggers SET status = 'completed', executed_at = ?, updated_at = ?,
+            claimed_by = NULL, lease_until = NULL WHERE id IN ({", ".join("?" for _ in trigger_ids)})""",
+            (now, now, *trigger_ids),
+        )
+        await stats_service.bump(
+            db, stats_service.status_moves("trigger_status", [(status, "completed") for status in previous])
+        )
+        await db.commit()
+    context_cache.invalidate({normalize_contact(trigger["recipient"]) for trigger, *_ in sent}, "trigger")
+    for trigger, *_ in sent:
+        event_hub.publish("trigger", normalize_contact(trigger["recipient"]), id=trigger["id"], status="completed")
+
+
+async def _record_failure(trigger, error):
+    """Count a failed attempt: reschedule the trigger, or fail it once out of retries."""
+    trigger_id = trigger["id"]
+    logger.error(f"Trigger {trigger_id} failed: {error}")
+    retries = trigger.get("retries_done", 0) + 1
+    max_retries = trigger.get("max_retries", 3)
+    new_status = "failed" if retries >= max_retries else "active"
+    new_scheduled = (datetime.utcnow() + timedelta(minutes=1)).isoformat() if new_status == "active" else None
+    async with get_write_db() as db:
+        previous = await _current_status(db, trigger_id)
+        await db.execute(
+            """UPDATE triggers SET retries_done = ?, status = ?, scheduled_at = ?, updated_at = ?,
+            claimed_by = NULL, lease_until = NULL WHERE id = ?""",
+            (retries, new_status, new_scheduled, datetime.utcnow().isoformat(), trigger_id),
+        )
+        await stats_service.bump(db, stats_service.status_moves("trigger_status", [(previous, new_status)]))
+        await db.commit()
+    context_cache.invalidate([normalize_contact(trigger["recipient"])], "trigger")
+    event_hub.publish(
+        "trigger", normalize_contact(trigger["recipient"]), id=trigger_id,
+        status=new_status, retries_done=retries,
+    )
+    if new_status == "active":
+        _notify_scheduled(trigger_id, new_scheduled)
+    logger.info(f"Trigger {trigger_id}: retry {retries}/{max_retries}, status={new_status}")
 
-        logger.info(f"Trigger {trigger_id} executed successfully")
 
+async def _execute_email_step(trigger):
+    """Send a campaign/drip email step to every recipient due for it at once.
+
+    The step's other due triggers (same campaign, step, subject and message)
+    are leased along with this one and go out through send_email_batch,
+    1000 recipients per SendGrid request, with each recipient's placeholders
+    passed as substitutions. Each trigger is then completed or retried
+    according to the request that carried it. The siblings' leases are
+    renewed until then, as the scheduler does for ``trigger``'s.
+    """
+    try:
+        siblings = await _claim_step_siblings(trigger)
     except Exception as e:
-        logger.error(f"Trigger {trigger_id} failed: {e}")
-        db = await get_db()
-        try:
-            retries = trigger.get("retries_done", 0) + 1
-            max_retries = trigger.get("max_retries", 3)
-            new_status = "failed" if retries >= max_retries else "active"
-            new_scheduled = (datetime.utcnow() + timedelta(minutes=1)).isoformat() if new_status == "active" else None
-            await db.execute(
-                "UPDATE triggers SET retries_done = ?, status = ?, scheduled_at = ?, updated_at = ? WHERE id = ?",
-                (retries, new_status, new_scheduled, datetime.utcnow().isoformat(), trigger_id),
-            )
-            await db.commit()
-            logger.info(f"Trigger {trigger_id}: retry {retries}/{max_retries}, status={new_status}")
-        finally:
-            await db.close()
+        await _record_failure(trigger, e)
+        return
+    renewer = asyncio.create_task(_keep_lease([sibling["id"] for sibling in siblings])) if siblings else None
+    try:
+        await _send_email_step([trigger] + siblings)
+    finally:
+        if renewer is not None:
+            renewer.cancel()
 
 
-async def process_pending_triggers():
-    """Check and execute all triggers that are due."""
-    db = await get_db()
+async def _send_email_step(group):
+    """Send one leased email step group (leader first) and record each outcome."""
+    trigger = group[0]
     try:
-        now = datetime.utcnow().isoformat()
+        _notify_removed([sibling["id"] for sibling in group[1:]])
+        replied = await _recently_replied([t["recipient"] for t in group if t.get("stop_on_reply")])
+    except Exception as e:
+        await _record_failure(trigger, e)
+        return
+    pending = {}
+    for member in group:
+        if member.get("stop_on_reply") and normalize_contact(member["recipient"]) in replied:
+            logger.info(f"Trigger {member['id']}: recipient replied, marking completed")
+            await update_trigger_status(member["id"], "completed")
+        else:
+            pending.setdefault(member["recipient"], []).append(member)
+    if not pending:
+        return
+
+    recipients = []
+    for email, members in pending.items():
+        variables = json.loads(members[0]["variables"]) if members[0].get("variables") else {}
+        recipients.append({
+            "email": email,
+            "name": members[0].get("recipient_name"),
+            "substitutions": {f"{{{key}}}": value for key, value in variables.items()},
+        })
+    logger.info(f"Sending email step '{trigger['name']}' to {len(recipients)} recipients")
+    results = await send_email_batch(recipients, trigger["subject"] or trigger["name"], trigger["message"])
+
+    sent = []
+    for result in results:
+        for email in result["emails"]:
+            for member in pending[email]:
+                if result["error"]:
+                    await _record_failure(member, result["error"])
+                    continue
+                variables = json.loads(member["variables"]) if member.get("variables") else None
+                sent.append((
+                    member, personalize(member["message"], variables),
+                    personalize(member["subject"], variables), result["message_id"],
+                ))
+    if sent:
+        await _record_sent(sent)
+    logger.info(f"Email step '{trigger['name']}': {len(sent)} sent, {len(group) - len(sent)} not sent")
+
+
+async def _claim_step_siblings(trigger, worker_id=WORKER_ID):
+    """Lease the other due triggers of ``trigger``'s email step (up to one SendGrid request's worth)."""
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=settings.TRIGGER_LEASE_SECONDS)
+    async with get_write_db() as db:
         cursor = await db.execute(
-            "SELECT * FROM triggers WHERE status = 'active' AND scheduled_at <= ?",
-            (now,),
+            f"""UPDATE triggers SET claimed_by = ?, lease_until = ?, updated_at = ?
+            WHERE id IN (
+                SELECT id FROM triggers
+                WHERE status = 'active' AND scheduled_at <= ?
+                  AND channel = 'email' AND campaign_name = ? AND step_number = ? AND id != ?
+                  AND name = ? AND message = ? AND COALESCE(subject, '') = ?
+                  AND (lease_until IS NULL OR lease_until < ?)
+                ORDER BY id LIMIT ?{skip_locked()}
+            )
+            RETURNING *""",
+            (worker_id, lease_until.isoformat(), now.isoformat(), now.isoformat(),
+             trigger["campaign_name"], trigger["step_number"], trigger["id"], trigger["name"],
+             trigger["message"], trigger["subject"] or "", now.isoformat(), MAX_PERSONALIZATIONS - 1),
         )
         rows = await cursor.fetchall()
+        await db.commit()
+    return [_row_to_trigger(row) for row in rows]
 
-        if rows:
-            logger.info(f"Found {len(rows)} pending triggers to execute")
 
-        for row in rows:
-            trigger = {
-                "id": row[0], "name": row[1], "trigger_type": row[2],
-                "channel": row[3], "recipient": row[4], "recipient_name": row[5],
-                "message": row[6], "subject": row[7], "delay_minutes": row[8],
-                "max_retries": row[9], "retries_done": row[10],
-                "stop_on_reply": bool(row[11]), "status": row[12],
-            }
-            await execute_trigger(trigger)
+async def _recently_replied(recipients):
+    """Contact keys among ``recipients`` with a reply in the last 24 hours."""
+    contact_keys = list({normalize_contact(recipient) for recipient in recipients})
+    if not contact_keys:
+        return set()
+    async with get_db() as db:
+        cursor = await db.execute(
+            f"""SELECT DISTINCT contact_key FROM conversations
+            WHERE contact_key IN ({", ".join("?" for _ in contact_keys)}) AND role = 'user'
+            AND created_at > ?""",
+            (*contact_keys, (datetime.utcnow() - timedelta(hours=24)).strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        return {row[0] for row in await cursor.fetchall()}
 
-    except Exception as e:
-        logger.error(f"Error processing triggers: {e}")
-    finally:
-        await db.close()
+
+def _row_to_trigger(row):
+    return {
+        "id": row[0], "name": row[1], "trigger_type": row[2],
+        "channel": row[3], "recipient": row[4], "recipient_name": row[5],
+        "message": row[6], "subject": row[7], "delay_minutes": row[8],
+        "max_retries": row[9], "retries_done": row[10],
+        "stop_on_reply": bool(row[11]), "status": row[12],
+        "campaign_name": row[13], "step_number": row[14], "scheduled_at": row[15],
+        "campaign_id": row[22], "variables": row[23],
+    }
+
+
+async def _load_due_triggers(horizon_ts):
+    """Return (id, scheduled_at) for active triggers due before the horizon."""
+    horizon = datetime.utcfromtimestamp(horizon_ts).isoformat()
+    async with get_db() as db:
+        cursor = await db.execute(
+            """SELECT id, scheduled_at FROM triggers
+            WHERE status = 'active' AND scheduled_at <= ?
+            ORDER BY scheduled_at""",
+            (horizon,),
+        )
+        rows = await cursor.fetchall()
+    return [(row[0], row[1]) for row in rows]
 
 
-async def trigger_scheduler():
-    """Background loop — checks for pending triggers every 10 seconds."""
-    logger.info(f"Trigger scheduler started (interval: {SCHEDULER_INTERVAL}s)")
+async def claim_triggers(trigger_ids, worker_id=WORKER_ID):
+    """Atomically lease the given triggers if they are still due and unleased.
+
+    Returns only the rows this worker now owns; ids that are not yet due, no
+    longer active, or leased by another live worker are left untouched. Expired
+    leases (a worker died mid-send) are taken over.
+    """
+    if not trigger_ids:
+        return []
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=settings.TRIGGER_LEASE_SECONDS)
+    placeholders = ", ".join("?" for _ in trigger_ids)
+    async with get_write_db() as db:
+        # On PostgreSQL rows another worker is claiming right now are skipped, not waited on.
+        cursor = await db.execute(
+            f"""UPDATE triggers SET claimed_by = ?, lease_until = ?, updated_at = ?
+            WHERE id IN (
+                SELECT id FROM triggers
+                WHERE id IN ({placeholders})
+                  AND status = 'active' AND scheduled_at <= ?
+                  AND (lease_until IS NULL OR lease_until < ?){skip_locked()}
+            )
+            RETURNING *""",
+            (worker_id, lease_until.isoformat(), now.isoformat(), *trigger_ids,
+             now.isoformat(), now.isoformat()),
+        )
+        rows = await cursor.fetchall()
+        await db.commit()
+    return [_row_to_trigger(row) for row in rows]
+
+
+async def renew_trigger_leases(trigger_ids, worker_id=WORKER_ID):
+    """Extend this worker's leases on ``trigger_ids`` in one statement; returns how many it still held."""
+    lease_until = datetime.utcnow() + timedelta(seconds=settings.TRIGGER_LEASE_SECONDS)
+    async with get_write_db() as db:
+        cursor = await db.execute(
+            f"""UPDATE triggers SET lease_until = ?
+            WHERE id IN ({", ".join("?" for _ in trigger_ids)}) AND claimed_by = ? AND status = 'active'""",
+            (lease_until.isoformat(), *trigger_ids, worker_id),
+        )
+        await db.commit()
+    return cursor.rowcount
+
+
+async def renew_trigger_lease(trigger_id, worker_id=WORKER_ID):
+    """Extend this worker's lease; returns False if the lease was lost."""
+    return await renew_trigger_leases([trigger_id], worker_id) == 1
+
+
+async def _keep_lease(trigger_ids):
+    """Renew the leases on ``trigger_ids`` until cancelled or none is held any more."""
+    interval = settings.TRIGGER_LEASE_SECONDS / 3
     while True:
+        await asyncio.sleep(interval)
         try:
-            await process_pending_triggers()
+            if not await renew_trigger_leases(trigger_ids):
+                logger.warning(f"Triggers {trigger_ids}: lease lost while executing")
+                return
         except Exception as e:
-            logger.error(f"Trigger scheduler error: {e}")
-        await asyncio.sleep(SCHEDULER_INTERVAL)
+            logger.error(f"Triggers {trigger_ids}: lease renewal failed: {e}")
+
+
+async def _execute_claimed(trigger):
+    """Scheduler callback: run a leased trigger, renewing the lease until it finishes."""
+    renewer = asyncio.create_task(_keep_lease([trigger["id"]]))
+    try:
+        await execute_trigger(trigger)
+    finally:
+        renewer.cancel()
+
+
+def _scheduler_stats():
+    return _scheduler.stats() if _scheduler is not None else {}
+
+
+metrics.register_collector("trigger_scheduler", _scheduler_stats)
 
 
 def start_trigger_scheduler():
     """Start the background trigger scheduler."""
-    global _trigger_task
+    global _trigger_task, _scheduler
     if _trigger_task is None or _trigger_task.done():
-        _trigger_task = asyncio.create_task(trigger_scheduler())
+        _scheduler = TriggerScheduler(
+            load_due=_load_due_triggers,
+            claim=claim_triggers,
+            execute=_execute_claimed,
+            max_workers=settings.SCHEDULER_MAX_WORKERS,
+            resync_interval=settings.SCHEDULER_RESYNC_INTERVAL,
+            horizon=settings.SCHEDULER_HORIZON,
+        )
+        _trigger_task = asyncio.create_task(_scheduler.run())
         logger.info("Trigger scheduler task created")
 
 
-def stop_trigger_scheduler():
-    """Stop the background trigger scheduler."""
-    global _trigger_task
+async def stop_trigger_scheduler():
+    """Stop the background trigger scheduler, letting in-flight sends finish."""
+    global _trigger_task, _scheduler
     if _trigger_task and not _trigger_task.done():
         _trigger_task.cancel()
-        logger.info("Trigger scheduler task cancelled")
\ No newline at end of file
+        logger.info("Trigger scheduler task cancelled")
+    if _scheduler is not None:
+        await _scheduler.drain(settings.SCHEDULER_SHUTDOWN_GRACE)
+    _trigger_task = None
+    _scheduler = None
@@ -1,16 +1,26 @@
-﻿import os
-from twilio.rest import Client
+﻿import asyncio
+import os
+import time
+import httpx
 from twilio.twiml.messaging_response import MessagingResponse
 from src.config.settings import settings
+from src.core import metrics
 from src.core.logging import logger
 from src.core.exceptions import TwilioServiceError
+from src.services import rate_limiter
 
-_client = None
+TWILIO_API_BASE = "https://api.twilio.com/2010-04-01"
 
+_http_client = None
+_send_slots = None
+_request_ms = metrics.histogram("twilio.request_ms")
+_wait_ms = metrics.histogram("twilio.wait_ms")
+_stats = {"sent": 0, "errors": 0, "in_flight": 0}
 
-def _get_client():
-    global _client
-    if _client is None:
+
+def _get_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
         account_sid = settings.TWILIO_ACCOUNT_SID or os.getenv("TWILIO_ACCOUNT_SID")
         auth_token = settings.TWILIO_AUTH_TOKEN or os.getenv("TWILIO_AUTH_TOKEN")
 
@@ -18,26 +28,75 @@ def _get_client():
             raise TwilioServiceError("Twilio credentials not configured")
 
         logger.info(f"Initializing Twilio client with SID: {account_sid[:6]}...")
-        _client = Client(account_sid, auth_token)
-    return _client
+        _http_client = httpx.AsyncClient(
+            base_url=f"{TWILIO_API_BASE}/Accounts/{account_sid}",
+            auth=(account_sid, auth_token),
+            timeout=settings.TWILIO_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.TWILIO_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.TWILIO_MAX_CONCURRENCY,
+            ),
+        )
+    return _http_client
+
+
+def _get_send_slots():
+    global _send_slots
+    if _send_slots is None:
+        _send_slots = asyncio.Semaphore(settings.TWILIO_MAX_CONCURRENCY)
+    return _send_slots
+
+
+async def _create_message(from_, to, body):
+    """POST to the Messages resource, paced per sending number by rate_limiter;
+    at most TWILIO_MAX_CONCURRENCY calls run at once."""
+    client = _get_client()
+
+    async def post():
+        queued = time.perf_counter()
+        async with _get_send_slots():
+            started = time.perf_counter()
+            _wait_ms.observe((started - queued) * 1000)
+            _stats["in_flight"] += 1
+            try:
+                return await client.post(
+                    "/Messages.json", data={"From": from_, "To": to, "Body": body}
+                )
+            finally:
+                _stats["in_flight"] -= 1
+                _request_ms.observe((time.perf_counter() - started) * 1000)
+
+    response = await rate_limiter.send("twilio", from_, post)
+
+    if response.status_code not in (200, 201):
+        _stats["errors"] += 1
+        error_msg = response.text
+        try:
+            error_msg = response.json().get("message", error_msg)
+        except Exception:
+            pass
+        raise TwilioServiceError(f"Twilio error {response.status_code}: {error_msg}")
+    _stats["sent"] += 1
+    return response.json()
 
 
 async def send_whatsapp(to, message):
     logger.info(f"Sending WhatsApp to {to}")
     try:
-        client = _get_client()
         whatsapp_from = settings.TWILIO_WHATSAPP_NUMBER or os.getenv("TWILIO_WHATSAPP_NUMBER")
         whatsapp_to = f"whatsapp:{to}" if not to.startswith("whatsapp:") else to
-        msg = client.messages.create(
-            from_=whatsapp_from,
-            body=message,
-            to=whatsapp_to,
-        )
-        logger.info(f"WhatsApp sent: sid={msg.sid} status={msg.status}")
-        return {"message_id": msg.sid, "status": msg.status}
-    except TwilioServiceError:
+        msg = await _create_message(whatsapp_from, whatsapp_to, message)
+        logger.info(f"WhatsApp sent: sid={msg['sid']} status={msg['status']}")
+        return {"message_id": msg["sid"], "status": msg["status"]}
+    except TwilioServiceError as e:
+        logger.error(f"Twilio WhatsApp error: {e.message}")
         raise
+    except httpx.TimeoutException:
+        _stats["errors"] += 1
+        logger.error("Twilio WhatsApp request timed out")
+        raise TwilioServiceError("Twilio request timed out")
     except Exception as e:
+        _stats["errors"] += 1
         logger.error(f"Twilio WhatsApp error: {e}")
         raise TwilioServiceError(f"Failed to send WhatsApp: {str(e)}")
 
@@ -45,23 +104,41 @@ async def send_whatsapp(to, message):
 async def send_sms(to, message):
     logger.info(f"Sending SMS to {to}")
     try:
-        client = _get_client()
         sms_from = settings.TWILIO_SMS_NUMBER or os.getenv("TWILIO_SMS_NUMBER")
-        msg = client.messages.create(
-            from_=sms_from,
-            body=message,
-            to=to,
-        )
-        logger.info(f"SMS sent: sid={msg.sid} status={msg.status}")
-        return {"message_id": msg.sid, "status": msg.status}
-    except TwilioServiceError:
+        msg = await _create_message(sms_from, to, message)
+        logger.info(f"SMS sent: sid={msg['sid']} status={msg['status']}")
+        return {"message_id": msg["sid"], "status": msg["status"]}
+    except TwilioServiceError as e:
+        logger.error(f"Twilio SMS error: {e.message}")
         raise
+    except httpx.TimeoutException:
+        _stats["errors"] += 1
+        logger.error("Twilio SMS request timed out")
+        raise TwilioServiceError("Twilio request timed out")
     except Exception as e:
+        _stats["errors"] += 1
         logger.error(f"Twilio SMS error: {e}")
         raise TwilioServiceError(f"Failed to send SMS: {str(e)}")
 
 
+def _client_stats():
+    return {**_stats, "max_concurrency": settings.TWILIO_MAX_CONCURRENCY}
+
+
+metrics.register_collector("twilio", _client_stats)
+
+
+async def close_client():
+    """Close the HTTP client (call on app shutdown)."""
+    global _http_client
+    if _http_client:
+        await _http_client.aclose()
+        _http_client = None
+
+
 def build_twiml_response(reply_text):
+    """TwiML replying with ``reply_text``; an empty <Response/> when it is None."""
     response = MessagingResponse()
-    response.message(reply_text)
+    if reply_text is not None:
+        response.message(reply_text)
     return str(response)
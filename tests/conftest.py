@@ -14,6 +14,9 @@ os.environ.setdefault("SENDGRID_API_KEY", "SG.test")
 os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./test_salespulse.db")
 
 from src.main import app
+from src.config.settings import settings
+from src.db import session as db_session
+from src.services import context_cache
 
 
 @pytest.fixture
@@ -21,3 +24,37 @@ async def client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+
+async def _empty_postgres(url):
+    import asyncpg
+
+    conn = await asyncpg.connect(url)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+    finally:
+        await conn.close()
+
+
+@pytest.fixture
+async def temp_db(tmp_path, monkeypatch):
+    """Point the connection pool at an empty, initialized database.
+
+    A new SQLite file by default. With TEST_DATABASE_URL set to a PostgreSQL
+    URL (a local container or an embedded server) the tests run against that
+    database instead, emptied first.
+    """
+    await db_session.close_db()
+    context_cache.clear()
+    url = os.environ.get("TEST_DATABASE_URL")
+    if url and db_session.is_postgres(url):
+        monkeypatch.setattr(settings, "DATABASE_URL", url)
+        await _empty_postgres(url)
+        location = url
+    else:
+        monkeypatch.setattr(db_session, "DB_PATH", str(tmp_path / "test_salespulse.db"))
+        location = db_session.DB_PATH
+    await db_session.init_db()
+    yield location
+    await db_session.close_db()
+    context_cache.clear()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+from src.db import session as db_session
+from src.services import generation_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _lead(name, use_ai_rewrite=False, **overrides):
+    return {
+        "name": name,
+        "role": "VP of Sales",
+        "company": "Acme Corp",
+        "industry": "SaaS",
+        "pain_point": "low reply rates",
+        "stage": "prospecting",
+        "tone": "friendly",
+        "use_ai_rewrite": use_ai_rewrite,
+        **overrides,
+    }
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def _stored_count():
+    async with db_session.get_db() as db:
+        return (await (await db.execute("SELECT COUNT(*) FROM generated_messages")).fetchone())[0]
+
+
+@pytest.mark.anyio
+async def test_batch_streams_ndjson_and_stores_all_rows(temp_db, client, monkeypatch):
+    active = peak = 0
+
+    async def fake_rewrite(draft_message, subject, cta, tone_instruction):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"subject": "AI subject", "message": "AI body, would you like a call?", "cta": "Book a call"}
+
+    monkeypatch.setattr(generation_service, "rewrite_message", fake_rewrite)
+    items = [_lead(f"Lead {i}", use_ai_rewrite=i % 2 == 0) for i in range(10)]
+
+    response = await client.post("/generate-message/batch", json={"items": items, "concurrency": 2})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert lines[-1] == {"done": True, "generated": 10, "failed": 0}
+    assert sorted(line["index"] for line in lines[:-1]) == list(range(10))
+    assert {line["subject"] for line in lines[:-1] if line["index"] % 2 == 0} == {"AI subject"}
+    assert peak == 2
+    assert await _stored_count() == 10
+
+
+@pytest.mark.anyio
+async def test_csv_upload_reports_invalid_rows(temp_db, client):
+    csv_text = (
+        "name,role,company,industry,pain_point,stage,use_ai_rewrite\n"
+        "Alice,CTO,Acme,SaaS,slow onboarding,prospecting,false\n"
+        "Bob,CEO,Beta,Retail,churn,not-a-stage,false\n"
+    )
+
+    response = await client.post(
+        "/generate-message/batch/csv", files={"file": ("leads.csv", csv_text, "text/csv")}
+    )
+
+    lines = _lines(response)
+    assert lines[0]["index"] == 1 and lines[0]["success"] is False and "stage" in lines[0]["error"]
+    assert lines[1]["index"] == 0 and lines[1]["success"] is True
+    assert lines[-1] == {"done": True, "generated": 1, "failed": 1}
+    assert await _stored_count() == 1
+
+
+@pytest.mark.anyio
+async def test_csv_upload_is_capped_like_json_batches(temp_db, client, monkeypatch):
+    row = "Alice,CTO,Acme,SaaS,slow onboarding,prospecting,false\n"
+    header = "name,role,company,industry,pain_point,stage,use_ai_rewrite\n"
+    monkeypatch.setattr(generation_service, "MAX_BATCH_ITEMS", 3)
+
+    too_many = await client.post(
+        "/generate-message/batch/csv", files={"file": ("leads.csv", header + row * 4, "text/csv")}
+    )
+    monkeypatch.setattr(generation_service.settings, "GENERATION_CSV_MAX_BYTES", len(header) + len(row))
+    too_big = await client.post(
+        "/generate-message/batch/csv", files={"file": ("leads.csv", header + row * 2, "text/csv")}
+    )
+
+    assert too_many.status_code == 422 and "more than 3 rows" in too_many.json()["error"]
+    assert too_big.status_code == 422
+    assert await _stored_count() == 0
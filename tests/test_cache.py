@@ -0,0 +1,26 @@
+import time
+from src.core.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache = LRUCache(maxsize=10, ttl=5)
+    cache.set("a", None)
+    assert cache.get("a", "missing") is None
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
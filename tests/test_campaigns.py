@@ -0,0 +1,183 @@
+import asyncio
+import pytest
+from src.config.settings import settings
+from src.db.session import get_db
+from src.services import stats_service, trigger_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _campaign_triggers(campaign_id):
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT id, recipient, step_number, message FROM triggers WHERE campaign_id = ? ORDER BY id",
+            (campaign_id,),
+        )
+        return await cursor.fetchall()
+
+
+@pytest.mark.anyio
+async def test_campaign_inserts_every_step_without_sending(temp_db, client, monkeypatch):
+    async def no_calls(**kwargs):
+        raise AssertionError("campaign creation must not generate or send")
+
+    monkeypatch.setattr(trigger_service, "chat_completion", no_calls)
+    monkeypatch.setattr(trigger_service, "send_sms", no_calls)
+    recipients = [{"recipient": f"+1555000{n:04d}", "name": f"Lead {n}"} for n in range(50)]
+    recipients.append({"recipient": "+1 555 000 0001"})  # same contact as Lead 1
+
+    response = await client.post("/triggers/campaigns", json={
+        "name": "Spring launch",
+        "channel": "sms",
+        "recipients": recipients,
+        "messages": ["Hi {name}!", "Still there, {name}?"],
+        "delay_between_minutes": 60,
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total_recipients"], body["total_steps"], body["total_triggers"]) == (50, 2, 100)
+    assert body["progress"] == {"active": 100, "completed": 0, "failed": 0, "cancelled": 0}
+    assert body["status"] == "running"
+    rows = await _campaign_triggers(body["campaign_id"])
+    assert rows[0]["message"] == "Hi {name}!"
+    assert (await stats_service.read_analytics())["active_triggers"] == 100
+
+
+@pytest.mark.anyio
+async def test_csv_campaign_is_personalized_when_sent(temp_db, client, monkeypatch):
+    sent = []
+
+    async def fake_send_sms(to, message):
+        sent.append((to, message))
+        return {"message_id": "SM1", "status": "queued"}
+
+    monkeypatch.setattr(trigger_service, "send_sms", fake_send_sms)
+    csv_text = "Phone,Name,Company\n+15550001111,Asha,Acme\n+15550002222,,Globex\n"
+
+    response = await client.post(
+        "/triggers/campaigns/upload",
+        data={"name": "CSV push", "channel": "sms", "messages": ["Hi {name} at {company} {unknown}"]},
+        files={"file": ("leads.csv", csv_text, "text/csv")},
+    )
+
+    assert response.status_code == 200
+    campaign_id = response.json()["campaign_id"]
+    ids = [row["id"] for row in await _campaign_triggers(campaign_id)]
+    for trigger in await trigger_service.claim_triggers(ids):
+        await trigger_service.execute_trigger(trigger)
+
+    assert sorted(sent) == [
+        ("+15550001111", "Hi Asha at Acme {unknown}"),
+        ("+15550002222", "Hi {name} at Globex {unknown}"),
+    ]
+    progress = (await client.get(f"/triggers/campaigns/{campaign_id}")).json()
+    assert progress["progress"]["completed"] == 2
+    assert progress["status"] == "finished"
+
+
+@pytest.mark.anyio
+async def test_campaign_input_errors(temp_db, client):
+    missing = await client.get("/triggers/campaigns/999")
+    bad_csv = await client.post(
+        "/triggers/campaigns/upload",
+        data={"name": "No phones", "channel": "sms", "messages": ["Hi"]},
+        files={"file": ("leads.csv", "name\nAsha\n", "text/csv")},
+    )
+
+    assert missing.status_code == 404
+    assert bad_csv.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_campaign_csv_upload_is_capped(temp_db, client, monkeypatch):
+    monkeypatch.setattr(settings, "CAMPAIGN_CSV_MAX_BYTES", 64)
+    rows = "".join(f"+1555000{n:04d}\n" for n in range(10))
+
+    response = await client.post(
+        "/triggers/campaigns/upload",
+        data={"name": "Too big", "channel": "sms", "messages": ["Hi"]},
+        files={"file": ("leads.csv", "phone\n" + rows, "text/csv")},
+    )
+
+    assert response.status_code == 422
+    assert "larger than 64 bytes" in response.json()["error"]
+    async with get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM triggers")
+        assert (await cursor.fetchone())[0] == 0
+
+
+@pytest.mark.anyio
+async def test_email_step_goes_out_as_one_batch(temp_db, client, monkeypatch):
+    batches = []
+
+    async def fake_send_email_batch(recipients, subject, body, html=False):
+        batches.append((recipients, subject, body))
+        failed = {"c@example.com"}
+        return [
+            {"message_id": None if r["email"] in failed else "msg-1",
+             "status_code": 202, "error": "rejected" if r["email"] in failed else None,
+             "recipients": 1, "emails": [r["email"]]}
+            for r in recipients
+        ]
+
+    monkeypatch.setattr(trigger_service, "send_email_batch", fake_send_email_batch)
+    response = await client.post("/triggers/campaigns", json={
+        "name": "Newsletter",
+        "channel": "email",
+        "recipients": [
+            {"recipient": f"{letter}@example.com", "name": letter.upper()} for letter in "abc"
+        ],
+        "messages": ["Hello {name}"],
+        "subject_prefix": "News for {name}",
+    })
+    campaign_id = response.json()["campaign_id"]
+    first = (await _campaign_triggers(campaign_id))[0]["id"]
+
+    for trigger in await trigger_service.claim_triggers([first]):
+        await trigger_service.execute_trigger(trigger)
+
+    assert len(batches) == 1
+    recipients, subject, body = batches[0]
+    assert (subject, body) == ("News for {name} - Step 1", "Hello {name}")
+    assert sorted(r["email"] for r in recipients) == ["a@example.com", "b@example.com", "c@example.com"]
+    assert recipients[0]["substitutions"] == {"{name}": "A"}
+    progress = (await client.get(f"/triggers/campaigns/{campaign_id}")).json()["progress"]
+    assert (progress["completed"], progress["active"]) == (2, 1)
+    async with get_db() as db:
+        cursor = await db.execute("SELECT body FROM sent_messages ORDER BY body")
+        assert [row[0] for row in await cursor.fetchall()] == ["Hello A", "Hello B"]
+
+
+@pytest.mark.anyio
+async def test_email_step_keeps_sibling_leases_during_a_slow_send(temp_db, client, monkeypatch):
+    second_claims = []
+
+    async def slow_send_email_batch(recipients, subject, body, html=False):
+        # Wait well past the original leases, as a throttled send can.
+        await asyncio.sleep(0.5)
+        second_claims.extend(await trigger_service.claim_triggers(ids, worker_id="other-worker"))
+        return [
+            {"message_id": "msg-1", "status_code": 202, "error": None, "recipients": 1, "emails": [r["email"]]}
+            for r in recipients
+        ]
+
+    monkeypatch.setattr(trigger_service, "send_email_batch", slow_send_email_batch)
+    monkeypatch.setattr(settings, "TRIGGER_LEASE_SECONDS", 0.15)
+    response = await client.post("/triggers/campaigns", json={
+        "name": "Slow newsletter",
+        "channel": "email",
+        "recipients": [{"recipient": f"{letter}@example.com"} for letter in "abc"],
+        "messages": ["Hello"],
+    })
+    ids = [row["id"] for row in await _campaign_triggers(response.json()["campaign_id"])]
+
+    for trigger in await trigger_service.claim_triggers(ids[:1]):
+        await trigger_service._execute_claimed(trigger)
+
+    assert second_claims == []
+    progress = (await client.get(f"/triggers/campaigns/{response.json()['campaign_id']}")).json()["progress"]
+    assert progress["completed"] == 3
@@ -0,0 +1,26 @@
+import pytest
+from src.core.contacts import normalize_contact
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "+14155551234",
+        "whatsapp:+14155551234",
+        "14155551234",
+        "14155551234@s.whatsapp.net",
+        "+1 (415) 555-1234",
+        "001 415 555 1234",
+    ],
+)
+def test_phone_formats_normalize_to_e164(raw):
+    assert normalize_contact(raw) == "+14155551234"
+
+
+def test_email_is_lowercased():
+    assert normalize_contact("  Lead@Example.COM ") == "lead@example.com"
+
+
+def test_empty_values():
+    assert normalize_contact(None) is None
+    assert normalize_contact("   ") is None
@@ -0,0 +1,99 @@
+import pytest
+from src.services import conversation_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_contacts_summary_tracks_each_message(temp_db):
+    await conversation_service.store_message("+15550000001", "user", "hi")
+    await conversation_service.store_message("+15550000001", "assistant", "hello!")
+    await conversation_service.store_message("+15550000002", "user", "hey")
+
+    contacts, next_cursor = await conversation_service.get_all_contacts()
+
+    assert next_cursor is None
+    assert [c["phone_number"] for c in contacts] == ["+15550000002", "+15550000001"]
+    assert contacts[1]["last_message"] == "hello!"
+    assert contacts[1]["last_role"] == "assistant"
+    assert contacts[1]["contact_key"] == "+15550000001"
+    assert (contacts[1]["user_msg_count"], contacts[1]["total_msg_count"]) == (1, 2)
+
+
+@pytest.mark.anyio
+async def test_contacts_are_served_in_keyset_pages(client, temp_db):
+    for n in range(7):
+        await conversation_service.store_message(f"+1555000{n:04d}", "user", f"msg {n}")
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = (await client.get("/contacts", params=params)).json()
+        seen += [c["phone_number"] for c in body["contacts"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"+1555000{n:04d}" for n in reversed(range(7))]
+    assert (await client.get("/contacts", params={"cursor": "not-a-cursor"})).status_code == 422
+
+
+@pytest.mark.anyio
+async def test_history_polls_by_cursor_and_short_circuits_with_etag(client, temp_db):
+    phone = "+15550009999"
+    for n in range(5):
+        await conversation_service.store_message(phone, "user", f"m{n}")
+
+    latest = await client.get(f"/conversations/{phone}", params={"limit": 3})
+    body = latest.json()
+    assert [m["message"] for m in body["messages"]] == ["m2", "m3", "m4"]
+    assert body["has_more"] is True
+    etag = latest.headers["etag"]
+    last_id = body["messages"][-1]["id"]
+
+    older = (await client.get(f"/conversations/{phone}", params={"before_id": body["messages"][0]["id"]})).json()
+    assert [m["message"] for m in older["messages"]] == ["m0", "m1"]
+    assert older["has_more"] is False
+
+    unchanged = await client.get(
+        f"/conversations/{phone}", params={"after_id": last_id}, headers={"If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    await conversation_service.store_message(phone, "assistant", "m5")
+    fresh = await client.get(
+        f"/conversations/{phone}", params={"after_id": last_id}, headers={"If-None-Match": etag}
+    )
+    assert fresh.status_code == 200
+    assert [m["message"] for m in fresh.json()["messages"]] == ["m5"]
+    assert fresh.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_etag_never_cuts_short_paging_through_new_messages(client, temp_db):
+    phone = "+15550008888"
+    await conversation_service.store_message(phone, "user", "start")
+    first = await client.get(f"/conversations/{phone}")
+    etag, last_id = first.headers["etag"], first.json()["messages"][-1]["id"]
+    for n in range(7):
+        await conversation_service.store_message(phone, "user", f"new {n}")
+
+    seen = []
+    while True:
+        page = await client.get(
+            f"/conversations/{phone}", params={"after_id": last_id, "limit": 3}, headers={"If-None-Match": etag}
+        )
+        assert page.status_code == 200
+        body = page.json()
+        seen += [m["message"] for m in body["messages"]]
+        last_id, etag = body["messages"][-1]["id"], page.headers["etag"]
+        if not body["has_more"]:
+            break
+
+    assert seen == [f"new {n}" for n in range(7)]
+    caught_up = await client.get(f"/conversations/{phone}", params={"after_id": last_id}, headers={"If-None-Match": etag})
+    assert caught_up.status_code == 304
@@ -0,0 +1,88 @@
+import pytest
+from src.config.settings import settings
+from src.db import session as db_session
+from src.services import booking_service, context_cache, conversation_service, trigger_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def count_reads(monkeypatch):
+    reads = []
+    original = db_session.get_db
+
+    def counting_get_db():
+        reads.append(1)
+        return original()
+
+    for module in (conversation_service, booking_service, trigger_service):
+        monkeypatch.setattr(module, "get_db", counting_get_db)
+    return reads
+
+
+async def _load_context(phone):
+    return (
+        await conversation_service.get_recent_messages(phone, limit=10),
+        await trigger_service._get_trigger_context(phone),
+        await booking_service.get_pending_bookings(phone),
+    )
+
+
+@pytest.mark.anyio
+async def test_warm_contact_builds_context_without_db_reads(temp_db, count_reads):
+    phone = "+14155550001"
+    await conversation_service.store_message(phone, "user", "hello")
+    await booking_service.create_booking(phone, "Demo call")
+
+    await _load_context(phone)
+    cold_reads = len(count_reads)
+    await conversation_service.store_message("whatsapp:" + phone, "assistant", "hi there")
+    await conversation_service.store_message(phone, "user", "book it")
+    history, trigger, bookings = await _load_context(phone)
+
+    assert cold_reads == 3
+    assert len(count_reads) == cold_reads
+    assert [m["content"] for m in history] == ["hello", "hi there", "book it"]
+    assert trigger is None
+    assert [b["title"] for b in bookings] == ["Demo call"]
+
+
+@pytest.mark.anyio
+async def test_booking_changes_are_written_through(temp_db, count_reads):
+    phone = "+14155550001"
+    booking = await booking_service.create_booking(phone, "Demo call")
+    assert len(await booking_service.get_pending_bookings(phone)) == 1
+
+    await booking_service.confirm_booking(confirmation_code=booking["confirmation_code"])
+    assert await booking_service.get_pending_bookings(phone) == []
+
+    await booking_service.create_booking(phone, "Second call")
+    await booking_service.cancel_all_pending(phone)
+    reads_before = len(count_reads)
+    assert await booking_service.get_pending_bookings(phone) == []
+    assert len(count_reads) == reads_before
+
+
+@pytest.mark.anyio
+async def test_cache_respects_entry_budget(temp_db, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_CACHE_ENTRIES", 2)
+    for n in range(3):
+        await conversation_service.get_recent_messages(f"+1415555000{n}")
+
+    stats = context_cache.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert context_cache.is_missing(context_cache.cached_turns("+14155550000", 10))
+
+
+@pytest.mark.anyio
+async def test_write_during_load_is_not_cached_stale(temp_db):
+    phone = "+14155550001"
+    generation = context_cache.begin_load(phone, "turns")
+    context_cache.append_turn(phone, "user", "arrived mid-load")
+    context_cache.store(phone, "turns", {"messages": [], "exhaustive": True}, generation)
+
+    assert context_cache.is_missing(context_cache.cached_turns(phone, 10))
@@ -0,0 +1,76 @@
+import aiosqlite
+import pytest
+from src.db import session as db_session
+from src.services.booking_service import create_booking, get_pending_bookings
+from src.services.conversation_service import get_recent_messages, store_message
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_contact_key_migration_backfills_existing_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    async with aiosqlite.connect(path) as db:
+        await db.execute(
+            """CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone_number TEXT NOT NULL,
+                role TEXT NOT NULL,
+                message TEXT NOT NULL,
+                channel TEXT NOT NULL DEFAULT 'whatsapp',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        await db.execute(
+            "INSERT INTO conversations (phone_number, role, message) VALUES ('whatsapp:+14155551234', 'user', 'hi')"
+        )
+        await db.commit()
+
+    await db_session.close_db()
+    monkeypatch.setattr(db_session, "DB_PATH", path)
+    try:
+        await db_session.init_db()
+        async with db_session.get_db() as db:
+            row = await (await db.execute("SELECT contact_key FROM conversations")).fetchone()
+            version = await (await db.execute("PRAGMA user_version")).fetchone()
+            counters = await (await db.execute(
+                "SELECT name, value FROM stat_counters WHERE value > 0 ORDER BY name"
+            )).fetchall()
+            rollups = await (await db.execute(
+                "SELECT granularity, kind, count FROM stat_rollups WHERE source = 'conversations' ORDER BY granularity"
+            )).fetchall()
+            marks = await (await db.execute("SELECT source, last_id FROM rollup_marks ORDER BY source")).fetchall()
+        assert row[0] == "+14155551234"
+        assert version[0] == len(db_session.MIGRATIONS)
+        assert [tuple(counter) for counter in counters] == [("contacts", 1), ("messages", 1)]
+        assert [tuple(rollup) for rollup in rollups] == [("day", "user", 1), ("hour", "user", 1), ("month", "user", 1)]
+        assert ("conversations", 1) in [tuple(mark) for mark in marks]
+    finally:
+        await db_session.close_db()
+
+
+@pytest.mark.anyio
+async def test_lookups_match_across_phone_formats(temp_db):
+    await store_message("whatsapp:+14155551234", "user", "first")
+    await store_message("+14155551234", "assistant", "second")
+    await create_booking("14155551234@s.whatsapp.net", title="Demo")
+
+    history = await get_recent_messages("+1 415 555 1234")
+    assert [m["content"] for m in history] == ["first", "second"]
+    assert len(await get_pending_bookings("whatsapp:+14155551234")) == 1
+
+
+@pytest.mark.anyio
+async def test_contact_lookups_use_index(temp_db):
+    if db_session.is_postgres():
+        pytest.skip("SQLite query plan")
+    async with db_session.get_db() as db:
+        cursor = await db.execute(
+            "EXPLAIN QUERY PLAN SELECT role, message FROM conversations WHERE contact_key = ? ORDER BY id DESC LIMIT 10",
+            ("+14155551234",),
+        )
+        plan = " ".join(row[3] for row in await cursor.fetchall())
+    assert "idx_conversations_contact" in plan
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from src.core.exceptions import DatabaseError
+from src.db.session import ConnectionPool, _pragma_statements
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_readers_are_reused(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    try:
+        async with pool.reader() as first:
+            pass
+        async with pool.reader() as second:
+            pass
+        assert first is second
+        assert pool.stats()["open_readers"] == 1
+        assert pool.stats()["checkouts"] == 2
+    finally:
+        await pool.close()
+
+
+@pytest.mark.anyio
+async def test_reader_checkout_waits_and_times_out(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.05)
+    try:
+        async with pool.reader():
+            with pytest.raises(DatabaseError):
+                async with pool.reader():
+                    pass
+        stats = pool.stats()
+        assert stats["waits"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["in_use"] == 0
+    finally:
+        await pool.close()
+
+
+@pytest.mark.anyio
+async def test_writer_is_exclusive_and_rolls_back_uncommitted(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    try:
+        async with pool.writer() as db:
+            await db.execute("CREATE TABLE t (v INTEGER)")
+            await db.commit()
+
+        order = []
+
+        async def write(value):
+            async with pool.writer() as db:
+                order.append(("start", value))
+                await asyncio.sleep(0.01)
+                await db.execute("INSERT INTO t (v) VALUES (?)", (value,))
+                if value != 2:
+                    await db.commit()
+                order.append(("end", value))
+
+        await asyncio.gather(write(1), write(2), write(3))
+        assert order == [("start", 1), ("end", 1), ("start", 2), ("end", 2), ("start", 3), ("end", 3)]
+
+        async with pool.reader() as db:
+            rows = await (await db.execute("SELECT v FROM t ORDER BY v")).fetchall()
+        assert [r[0] for r in rows] == [1, 3]
+    finally:
+        await pool.close()
+
+
+@pytest.mark.anyio
+async def test_broken_connection_is_dropped_on_release(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    try:
+        async with pool.reader() as db:
+            await db.close()
+        assert pool.stats()["open_readers"] == 0
+        async with pool.reader() as db:
+            row = await (await db.execute("SELECT 1")).fetchone()
+        assert row[0] == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.anyio
+async def test_idle_connection_failing_health_check_is_replaced(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, health_check_interval=0)
+    try:
+        async with pool.reader() as stale:
+            pass
+
+        async def broken_execute(*args, **kwargs):
+            raise RuntimeError("connection lost")
+
+        stale.execute = broken_execute
+        async with pool.reader() as fresh:
+            row = await (await fresh.execute("SELECT 1")).fetchone()
+        assert fresh is not stale
+        assert row[0] == 1
+        assert pool.stats()["reconnects"] == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.anyio
+async def test_storage_profile_is_applied_to_new_connections(tmp_path):
+    profile = {"journal_mode": "wal", "synchronous": "normal", "busy_timeout": 1234, "temp_store": "memory"}
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, profile=profile)
+    try:
+        async with pool.reader() as db:
+            journal = await (await db.execute("PRAGMA journal_mode")).fetchone()
+            synchronous = await (await db.execute("PRAGMA synchronous")).fetchone()
+            busy = await (await db.execute("PRAGMA busy_timeout")).fetchone()
+        assert journal[0] == "wal"
+        assert synchronous[0] == 1
+        assert busy[0] == 1234
+        busy_flag, _, _ = await pool.checkpoint()
+        assert busy_flag == 0
+        assert pool.stats()["checkpoints"] == 1
+    finally:
+        await pool.close()
+
+
+def test_storage_profile_rejects_unknown_pragma_values():
+    with pytest.raises(ValueError):
+        _pragma_statements({"journal_mode": "WAL; DROP TABLE conversations"})
@@ -0,0 +1,91 @@
+import json
+import httpx
+import pytest
+from src.core.exceptions import SendGridServiceError
+from src.services import email_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _use_transport(monkeypatch, handler):
+    client = httpx.AsyncClient(
+        base_url="https://api.sendgrid.test/v3", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr(email_service, "_http_client", client)
+    monkeypatch.setattr(email_service, "_send_slots", None)
+
+
+@pytest.mark.anyio
+async def test_send_email_posts_single_personalization(monkeypatch):
+    payloads = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(202, headers={"X-Message-Id": "abc"})
+
+    _use_transport(monkeypatch, handler)
+
+    result = await email_service.send_email("lead@example.com", "Hi", "Body", to_name="Lead")
+
+    assert result == {"message_id": "abc", "status_code": 202}
+    assert payloads[0]["personalizations"] == [{"to": [{"email": "lead@example.com", "name": "Lead"}]}]
+    assert payloads[0]["content"] == [{"type": "text/plain", "value": "Body"}]
+
+
+@pytest.mark.anyio
+async def test_batch_packs_1000_recipients_per_request(monkeypatch):
+    payloads = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(202, headers={"X-Message-Id": str(len(payloads))})
+
+    _use_transport(monkeypatch, handler)
+    recipients = [
+        {"email": f"lead{i}@example.com", "substitutions": {"-name-": f"Lead {i}"}}
+        for i in range(2500)
+    ]
+
+    results = await email_service.send_email_batch(recipients, "Hi -name-", "Hello -name-")
+
+    assert [r["recipients"] for r in results] == [1000, 1000, 500]
+    assert [len(p["personalizations"]) for p in payloads] == [1000, 1000, 500]
+    assert payloads[2]["personalizations"][0] == {
+        "to": [{"email": "lead2000@example.com"}],
+        "substitutions": {"-name-": "Lead 2000"},
+    }
+
+
+@pytest.mark.anyio
+async def test_failed_batch_request_does_not_stop_the_rest(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 2:
+            return httpx.Response(400, json={"errors": [{"message": "Bad personalization"}]})
+        return httpx.Response(202, headers={"X-Message-Id": str(len(calls))})
+
+    _use_transport(monkeypatch, handler)
+    recipients = [{"email": f"lead{i}@example.com"} for i in range(2500)]
+
+    results = await email_service.send_email_batch(recipients, "Hi", "Hello")
+
+    assert [(r["message_id"], r["error"]) for r in results] == [
+        ("1", None), (None, "SendGrid error 400: Bad personalization"), ("3", None),
+    ]
+    assert results[1]["emails"] == [f"lead{i}@example.com" for i in range(1000, 2000)]
+
+
+@pytest.mark.anyio
+async def test_send_email_surfaces_api_errors(monkeypatch):
+    def handler(request):
+        return httpx.Response(400, json={"errors": [{"message": "Invalid from address"}]})
+
+    _use_transport(monkeypatch, handler)
+
+    with pytest.raises(SendGridServiceError, match="Invalid from address"):
+        await email_service.send_email("lead@example.com", "Hi", "Body")
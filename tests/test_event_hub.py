@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from src.services import conversation_service, event_hub
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def _reset_hub():
+    event_hub.close_all()
+    yield
+    event_hub.close_all()
+
+
+@pytest.mark.anyio
+async def test_events_reach_global_and_matching_contact_topics():
+    everything = event_hub.subscribe([event_hub.GLOBAL_TOPIC])
+    mine = event_hub.subscribe([event_hub.contact_topic("+15550000001")])
+    other = event_hub.subscribe([event_hub.contact_topic("+15550000002")])
+
+    event_hub.publish("booking", "+15550000001", id=7, status="confirmed")
+
+    assert (await everything.get(timeout=1))["data"] == {"id": 7, "status": "confirmed"}
+    assert (await mine.get(timeout=1))["type"] == "booking"
+    assert await other.get(timeout=0.01) is None
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_is_evicted_without_blocking(monkeypatch):
+    monkeypatch.setattr(event_hub.settings, "EVENTS_QUEUE_SIZE", 2)
+    slow = event_hub.subscribe([event_hub.GLOBAL_TOPIC])
+
+    for n in range(5):
+        event_hub.publish("message", "+15550000003", id=n)
+
+    assert slow.evicted
+    assert event_hub.subscriber_count() == 0
+    with pytest.raises(StopAsyncIteration):
+        await slow.get(timeout=1)
+
+
+@pytest.mark.anyio
+async def test_stored_messages_are_published(temp_db):
+    subscription = event_hub.subscribe([event_hub.contact_topic("+15550000004")])
+
+    await conversation_service.store_message("+1 (555) 000-0004", "user", "hello")
+
+    event = await subscription.get(timeout=1)
+    assert event["type"] == "message"
+    assert event["data"]["message"] == "hello"
+    assert event["data"]["id"] > 0
+
+
+@pytest.mark.anyio
+async def test_events_endpoint_streams_until_closed(client):
+    async def publish_then_close():
+        while event_hub.subscriber_count() == 0:
+            await asyncio.sleep(0.01)
+        event_hub.publish("trigger", "+15550000005", id=3, status="cancelled")
+        event_hub.close_all()
+
+    task = asyncio.create_task(publish_then_close())
+    response = await client.get("/events", params={"contact": "+15550000005"})
+    await task
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    assert blocks[0].startswith("event: ready")
+    lines = dict(line.split(": ", 1) for line in blocks[1].split("\n"))
+    assert lines["event"] == "trigger"
+    assert json.loads(lines["data"])["data"] == {"id": 3, "status": "cancelled"}
@@ -0,0 +1,68 @@
+import pytest
+from src.config.settings import settings
+from src.services import idempotency_service, inbox_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    idempotency_service._recent.clear()
+    yield
+    idempotency_service._recent.clear()
+
+
+def _whapi_payload(*message_ids):
+    return {"messages": [
+        {"id": message_id, "from": "14155550001", "type": "text", "text": {"body": "Hi"}}
+        for message_id in message_ids
+    ]}
+
+
+@pytest.mark.anyio
+async def test_whapi_redelivery_is_enqueued_once(temp_db, client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_PROVIDER", "meta")
+
+    first = await client.post("/webhook/whatsapp", json=_whapi_payload("wamid.1", "wamid.1"))
+    retry = await client.post("/webhook/whatsapp", json=_whapi_payload("wamid.1"))
+    # After a restart only the durable receipt remains.
+    idempotency_service._recent.clear()
+    after_restart = await client.post("/webhook/whatsapp", json=_whapi_payload("wamid.1", "wamid.2"))
+
+    assert [r.json()["queued"] for r in (first, retry, after_restart)] == [1, 0, 1]
+    assert idempotency_service._stats["duplicates_memory"] >= 1
+    assert len(await inbox_service.claim_events(limit=10)) == 2
+
+
+@pytest.mark.anyio
+async def test_twilio_retry_gets_the_first_reply_without_a_second_llm_call(temp_db, client, monkeypatch):
+    calls = []
+
+    async def fake_reply(phone_number, message_text, channel):
+        calls.append(message_text)
+        return f"reply {len(calls)}"
+
+    from src.api.v1.endpoints import webhooks
+    monkeypatch.setattr(webhooks, "handle_lead_reply", fake_reply)
+    form = {"Body": "Hi", "From": "+14155550001", "MessageSid": "SM123"}
+
+    first = await client.post("/webhook/sms", data=form)
+    idempotency_service._recent.clear()
+    retry = await client.post("/webhook/sms", data=form)
+
+    assert calls == ["Hi"]
+    assert "<Message>reply 1</Message>" in first.text
+    assert "<Message>reply 1</Message>" in retry.text
+
+
+@pytest.mark.anyio
+async def test_failed_processing_releases_the_claim(temp_db):
+    assert await idempotency_service.claim_message("twilio", "SM1") == (True, None)
+    assert await idempotency_service.claim_message("twilio", "SM1") == (False, None)
+
+    await idempotency_service.release_message("twilio", "SM1")
+
+    assert await idempotency_service.claim_message("twilio", "SM1") == (True, None)
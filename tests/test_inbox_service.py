@@ -0,0 +1,211 @@
+import asyncio
+import pytest
+from src.config.settings import settings
+from src.db import session as db_session
+from src.services import inbox_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _statuses():
+    async with db_session.get_db() as db:
+        cursor = await db.execute("SELECT id, status, attempts FROM inbound_events ORDER BY id")
+        return await cursor.fetchall()
+
+
+@pytest.mark.anyio
+async def test_events_are_claimed_once_in_order(temp_db):
+    await inbox_service.enqueue_events([
+        {"source": "whapi", "channel": "whatsapp", "sender": "+14155550001", "body": "first"},
+        {"source": "whapi", "channel": "whatsapp", "sender": "+14155550002", "body": "second"},
+    ])
+
+    first = await inbox_service.claim_events(worker_id="a")
+    second = await inbox_service.claim_events(worker_id="b")
+
+    assert ([e["body"] for e in first], [e["body"] for e in second]) == (["first"], ["second"])
+    assert await inbox_service.claim_events(worker_id="c") == []
+
+
+@pytest.mark.anyio
+async def test_contact_lane_is_serial_and_coalesced(temp_db):
+    alice, bob = "+14155550001", "whatsapp:+14155550002"
+    for sender, body in ((alice, "a1"), (bob, "b1"), (alice, "a2")):
+        await inbox_service.enqueue_event("whapi", "whatsapp", sender, body)
+
+    alice_batch = await inbox_service.claim_events(worker_id="a")
+    bob_batch = await inbox_service.claim_events(worker_id="b")
+    await inbox_service.enqueue_event("whapi", "whatsapp", "+1 415 555 0001", "a3")
+
+    assert [e["body"] for e in alice_batch] == ["a1", "a2"]
+    assert [e["body"] for e in bob_batch] == ["b1"]
+    # a3 waits behind Alice's in-flight batch even though a consumer is free.
+    assert await inbox_service.claim_events(worker_id="c") == []
+
+    await inbox_service._finish_events([e["id"] for e in alice_batch], worker_id="a")
+    assert [e["body"] for e in await inbox_service.claim_events(worker_id="c")] == ["a3"]
+
+
+@pytest.mark.anyio
+async def test_retry_blocks_later_events_for_the_contact(temp_db, monkeypatch):
+    async def failing(events):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setitem(inbox_service._HANDLERS, "test", failing)
+    monkeypatch.setattr(settings, "INBOX_RETRY_DELAY", 60)
+    await inbox_service.enqueue_event("test", "whatsapp", "+14155550001", "first")
+    await inbox_service.process_events(await inbox_service.claim_events())
+    await inbox_service.enqueue_event("test", "whatsapp", "+14155550001", "second")
+
+    assert await inbox_service.claim_events() == []
+
+
+@pytest.mark.anyio
+async def test_whapi_burst_gets_one_reply(temp_db, monkeypatch):
+    prompts, sent = [], []
+
+    async def fake_reply(phone_number, message_text, channel, on_record):
+        prompts.append(message_text)
+        async with db_session.unit_of_work() as uow:
+            await on_record(uow, "one answer")
+        return "one answer"
+
+    async def fake_send(to, message):
+        sent.append((to, message))
+
+    async def fake_read(message_id):
+        return True
+
+    from src.services import meta_whatsapp_service
+    monkeypatch.setattr(inbox_service, "handle_lead_reply", fake_reply)
+    monkeypatch.setattr(meta_whatsapp_service, "send_whatsapp", fake_send)
+    monkeypatch.setattr(meta_whatsapp_service, "mark_message_read", fake_read)
+    for body in ("hi", "is this still available?", "and the price?"):
+        await inbox_service.enqueue_event("whapi", "whatsapp", "+14155550001", body)
+
+    await inbox_service.process_events(await inbox_service.claim_events())
+
+    assert prompts == ["hi\nis this still available?\nand the price?"]
+    assert sent == [("+14155550001", "one answer")]
+
+
+@pytest.mark.anyio
+async def test_whapi_reply_is_saved_with_the_conversation(temp_db, monkeypatch):
+    from src.services import meta_whatsapp_service, trigger_service
+    sent = []
+
+    async def fake_completion(messages):
+        return "hello there"
+
+    async def fake_send(to, message):
+        sent.append((to, message))
+
+    async def fake_read(message_id):
+        return True
+
+    async def broken_save(event_ids, reply, uow=None):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(trigger_service, "chat_completion", fake_completion)
+    monkeypatch.setattr(meta_whatsapp_service, "send_whatsapp", fake_send)
+    monkeypatch.setattr(meta_whatsapp_service, "mark_message_read", fake_read)
+    monkeypatch.setattr(settings, "INBOX_RETRY_DELAY", 0)
+    await inbox_service.enqueue_event("whapi", "whatsapp", "+14155550002", "hi")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(inbox_service, "_save_reply", broken_save)
+        await inbox_service.process_events(await inbox_service.claim_events())
+    await inbox_service.process_events(await inbox_service.claim_events())
+
+    async with db_session.get_db() as db:
+        cursor = await db.execute("SELECT role FROM conversations ORDER BY id")
+        assert [row[0] for row in await cursor.fetchall()] == ["user", "assistant"]
+    assert sent == [("+14155550002", "hello there")]
+    assert [tuple(row) for row in await _statuses()] == [(1, "done", 2)]
+
+
+@pytest.mark.anyio
+async def test_slow_event_keeps_its_lease(temp_db, monkeypatch):
+    second_claims = []
+
+    async def slow(events):
+        # Take well past the original lease, as a throttled reply can.
+        await asyncio.sleep(0.5)
+        second_claims.extend(await inbox_service.claim_events(worker_id="other"))
+
+    monkeypatch.setitem(inbox_service._HANDLERS, "test", slow)
+    monkeypatch.setattr(settings, "INBOX_LEASE_SECONDS", 0.15)
+    await inbox_service.enqueue_event("test", "whatsapp", "+14155550003", "hi")
+
+    await inbox_service.process_events(await inbox_service.claim_events(worker_id="a"), worker_id="a")
+
+    assert second_claims == []
+    assert [tuple(row) for row in await _statuses()] == [(1, "done", 1)]
+
+
+@pytest.mark.anyio
+async def test_failed_events_retry_then_dead_letter(temp_db, monkeypatch):
+    calls = []
+
+    async def flaky(events):
+        calls.append(events[0]["attempts"])
+        raise RuntimeError("provider down")
+
+    monkeypatch.setitem(inbox_service._HANDLERS, "test", flaky)
+    monkeypatch.setattr(settings, "INBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "INBOX_RETRY_DELAY", 0)
+    await inbox_service.enqueue_event("test", "whatsapp", "+14155550001", "hi")
+
+    await inbox_service.process_events(await inbox_service.claim_events())
+    assert [row[1:] for row in await _statuses()] == [("pending", 1)]
+
+    await inbox_service.process_events(await inbox_service.claim_events())
+    assert [row[1:] for row in await _statuses()] == [("dead", 2)]
+    assert calls == [1, 2]
+    assert (await inbox_service.inbox_depth())["dead"] == 1
+
+
+@pytest.mark.anyio
+async def test_consumers_drain_the_queue(temp_db, monkeypatch):
+    handled = []
+
+    async def record(events):
+        handled.extend(event["body"] for event in events)
+
+    monkeypatch.setitem(inbox_service._HANDLERS, "test", record)
+    monkeypatch.setattr(settings, "INBOX_CONSUMERS", 2)
+    inbox_service.start_inbox_consumers()
+    try:
+        for i in range(5):
+            await inbox_service.enqueue_event("test", "whatsapp", f"+1415555000{i}", f"m{i}")
+        for _ in range(100):
+            if len(handled) == 5:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await inbox_service.stop_inbox_consumers()
+
+    assert sorted(handled) == [f"m{i}" for i in range(5)]
+    depth = await inbox_service.inbox_depth()
+    assert (depth["pending"], depth["processing"]) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_whapi_webhook_enqueues_and_acknowledges(temp_db, client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_PROVIDER", "meta")
+
+    response = await client.post(
+        "/webhook/whatsapp",
+        json={"messages": [
+            {"id": "wamid.1", "from": "14155550001", "type": "text", "text": {"body": "Hi"}},
+            {"id": "wamid.2", "from_me": True, "type": "text", "text": {"body": "ours"}},
+        ]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "queued": 1}
+    [event] = await inbox_service.claim_events()
+    assert (event["sender"], event["body"], event["external_id"]) == ("+14155550001", "Hi", "wamid.1")
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from src.core.exceptions import OpenAIServiceError
+from src.services import openai_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _FakeCompletions:
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        message = SimpleNamespace(content=" reply ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    def install(delay=0.01, max_concurrency=2):
+        completions = _FakeCompletions(delay)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        monkeypatch.setattr(openai_service, "_get_client", lambda: client)
+        monkeypatch.setattr(openai_service.settings, "LLM_MAX_CONCURRENCY", max_concurrency)
+        monkeypatch.setattr(openai_service, "_gate", None)
+        monkeypatch.setattr(openai_service, "_latency_ewma", None)
+        return completions
+
+    return install
+
+
+@pytest.mark.anyio
+async def test_in_flight_completions_are_bounded(fake_groq):
+    completions = fake_groq(delay=0.01, max_concurrency=2)
+
+    replies = await asyncio.gather(
+        *(openai_service.chat_completion([{"role": "user", "content": "hi"}]) for _ in range(6))
+    )
+
+    assert replies == ["reply"] * 6
+    assert completions.peak == 2
+
+
+@pytest.mark.anyio
+async def test_requests_past_their_deadline_are_rejected(fake_groq):
+    fake_groq(delay=0.2, max_concurrency=1)
+    shed_before = openai_service._stats["shed"] + openai_service._stats["queue_timeouts"]
+
+    first = asyncio.create_task(openai_service.chat_completion([{"role": "user", "content": "a"}]))
+    await asyncio.sleep(0.01)
+    with pytest.raises(OpenAIServiceError, match="busy"):
+        await openai_service.chat_completion(
+            [{"role": "user", "content": "b"}], deadline=time.monotonic() + 0.05
+        )
+
+    assert await first == "reply"
+    assert openai_service._stats["shed"] + openai_service._stats["queue_timeouts"] == shed_before + 1
+
+
+@pytest.fixture
+def empty_completion_cache(monkeypatch):
+    monkeypatch.setattr(openai_service, "_completion_cache", openai_service.LRUCache(100, 60))
+    monkeypatch.setattr(openai_service, "_cache_stats", {})
+
+
+@pytest.mark.anyio
+async def test_identical_prompts_are_served_from_cache(fake_groq, empty_completion_cache):
+    completions = fake_groq(delay=0.01, max_concurrency=4)
+    calls = []
+    original = completions.create
+
+    async def counting_create(**kwargs):
+        calls.append(kwargs)
+        return await original(**kwargs)
+
+    completions.create = counting_create
+    prompt = [{"role": "user", "content": "Open the conversation"}]
+
+    replies = await asyncio.gather(
+        *(openai_service.chat_completion(prompt, cache_site="opener") for _ in range(3))
+    )
+    again = await openai_service.chat_completion(prompt, cache_site="opener")
+    await openai_service.chat_completion([{"role": "user", "content": "other"}], cache_site="opener")
+
+    assert replies == ["reply"] * 3 and again == "reply"
+    assert len(calls) == 2
+    assert openai_service._cache_stats["opener"] == {
+        "memory_hits": 1, "persistent_hits": 0, "coalesced": 2, "misses": 2,
+    }
+
+
+@pytest.mark.anyio
+async def test_persistent_tier_survives_memory_eviction(temp_db, fake_groq, empty_completion_cache, monkeypatch):
+    fake_groq(delay=0)
+    monkeypatch.setattr(openai_service.settings, "LLM_CACHE_PERSIST", True)
+
+    first = await openai_service.rewrite_message("Body", "Subject", "Call?", "friendly")
+    openai_service._completion_cache.clear()
+    second = await openai_service.rewrite_message("Body", "Subject", "Call?", "friendly")
+
+    assert first == second
+    assert openai_service._cache_stats["rewrite_message"]["misses"] == 1
+    assert openai_service._cache_stats["rewrite_message"]["persistent_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_followers_take_over_when_the_leader_is_cancelled(fake_groq, empty_completion_cache):
+    fake_groq(delay=0.05, max_concurrency=4)
+    prompt = [{"role": "user", "content": "Open the conversation"}]
+
+    leader = asyncio.create_task(openai_service.chat_completion(prompt, cache_site="opener"))
+    await asyncio.sleep(0.01)
+    followers = [
+        asyncio.create_task(openai_service.chat_completion(prompt, cache_site="opener")) for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == ["reply", "reply"]
+    assert leader.cancelled()
+    assert openai_service._cache_stats["opener"]["misses"] == 2
@@ -0,0 +1,114 @@
+import json
+from types import SimpleNamespace
+import pytest
+from src.services import openai_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _FakeStream:
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            piece = next(self._pieces)
+        except StopIteration:
+            raise StopAsyncIteration
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    def install(pieces):
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            stream = _FakeStream(pieces)
+            calls[-1]["stream_obj"] = stream
+            return stream
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(openai_service, "_get_client", lambda: client)
+        monkeypatch.setattr(openai_service, "_gate", None)
+        monkeypatch.setattr(openai_service, "_latency_ewma", None)
+        return calls
+
+    return install
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_tag_stripper_handles_tags_split_across_chunks():
+    stripper = openai_service.TagStripper()
+    chunks = ["Booked! [CREATE", "_BOOKING][TITLE: De", "mo][DATE: 2024-05-01] See you", " [soon]", " [x"]
+
+    out = "".join(stripper.feed(chunk) for chunk in chunks) + stripper.flush()
+
+    assert out == "Booked!  See you [soon] [x"
+
+
+def test_tag_stripper_emits_plain_text_immediately():
+    stripper = openai_service.TagStripper()
+
+    assert stripper.feed("Hello ") == "Hello "
+    assert stripper.feed("[ACTION") == ""
+    assert stripper.feed(": confirm] there") == " there"
+
+
+@pytest.mark.anyio
+async def test_reply_preview_streams_tokens_without_storing(client, temp_db, fake_stream):
+    calls = fake_stream(["Sure", ", Tuesday works", " [CREATE_BOOKING]", "!"])
+
+    response = await client.get("/preview/reply/+15550001111", params={"message": "Can we meet?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["token", "token", "token", "token", "done"]
+    assert events[-1][1] == {"reply": "Sure, Tuesday works !"}
+    assert calls[0]["stream"] is True
+    assert calls[0]["messages"][-1] == {"role": "user", "content": "Can we meet?"}
+    assert calls[0]["stream_obj"].closed
+
+    history = await client.get("/conversations/+15550001111")
+    assert history.json()["messages"] == []
+
+
+@pytest.mark.anyio
+async def test_generate_message_preview_ends_with_parsed_result(client, temp_db, fake_stream):
+    fake_stream(["SUBJECT: Quick idea\nBO", "DY: Hi Ana,\nlet's talk.\n", "CTA: Free Friday?"])
+
+    response = await client.post("/preview/generate-message", json={
+        "name": "Ana",
+        "role": "CTO",
+        "company": "Acme",
+        "industry": "SaaS",
+        "pain_point": "slow onboarding",
+        "stage": "prospecting",
+    })
+
+    events = _parse_sse(response.text)
+    name, result = events[-1]
+    assert name == "done"
+    assert result["subject"] == "Quick idea"
+    assert result["message"] == "Hi Ana,\nlet's talk."
+    assert result["cta"] == "Free Friday?"
+    assert 0 <= result["score"] <= 100
@@ -0,0 +1,92 @@
+import asyncio
+import time
+import httpx
+import pytest
+from src.services import meta_whatsapp_service, rate_limiter, twilio_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    return rate_limiter.settings
+
+
+@pytest.mark.anyio
+async def test_sends_are_paced_to_the_configured_rate(limits, monkeypatch):
+    monkeypatch.setattr(limits, "RATE_LIMIT_TWILIO_RPS", 50.0)
+    monkeypatch.setattr(limits, "RATE_LIMIT_TWILIO_BURST", 2)
+    limiter = rate_limiter.get_limiter("twilio", "+15550000000")
+
+    started = time.monotonic()
+    await asyncio.gather(*[limiter.acquire() for _ in range(7)])
+
+    # Two go out of the burst, the other five wait 1/50 s each.
+    assert time.monotonic() - started >= 0.09
+    assert limiter.stats()["granted"] == 7
+    assert rate_limiter.get_limiter("twilio", "+15550000001") is not limiter
+
+
+@pytest.mark.anyio
+async def test_waiting_campaigns_take_turns(limits, monkeypatch):
+    monkeypatch.setattr(limits, "RATE_LIMIT_WHAPI_RPS", 200.0)
+    monkeypatch.setattr(limits, "RATE_LIMIT_WHAPI_BURST", 1)
+    limiter = rate_limiter.get_limiter("whapi", "channel")
+    order = []
+
+    async def send(lane):
+        await limiter.acquire(lane)
+        order.append(lane)
+
+    await limiter.acquire()  # empty the bucket so everything below queues
+    big = [asyncio.create_task(send("big")) for _ in range(5)]
+    await asyncio.sleep(0)
+    small = [asyncio.create_task(send("small")) for _ in range(2)]
+    await asyncio.gather(*big, *small)
+
+    assert order == ["big", "small", "big", "small", "big", "big", "big"]
+
+
+@pytest.mark.anyio
+async def test_throttled_send_is_requeued_and_slows_the_sender(limits, monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) <= 2:
+            return httpx.Response(429, headers={"Retry-After": "0.05"}, json={"message": "Too Many Requests"})
+        return httpx.Response(201, json={"sid": "SM1", "status": "queued"})
+
+    client = httpx.AsyncClient(base_url="https://api.twilio.test/Accounts/AC123", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(twilio_service, "_http_client", client)
+    monkeypatch.setattr(twilio_service, "_send_slots", asyncio.Semaphore(10))
+    monkeypatch.setattr(limits, "TWILIO_SMS_NUMBER", "+15550000000")
+
+    result = await twilio_service.send_sms("+14155551234", "hello")
+
+    assert result["message_id"] == "SM1"
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.05
+    stats = rate_limiter.get_limiter("twilio", "+15550000000").stats()
+    assert stats["throttled"] == 2
+    assert stats["rate"] < stats["base_rate"]
+
+
+@pytest.mark.anyio
+async def test_whapi_sends_are_paced_per_channel(limits, monkeypatch):
+    def handler(request):
+        return httpx.Response(201, json={"message": {"id": "wamid-1"}})
+
+    client = httpx.AsyncClient(base_url="https://gate.whapi.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(meta_whatsapp_service, "_http_client", client)
+    monkeypatch.setattr(limits, "META_WHATSAPP_ACCESS_TOKEN", "token-a")
+    await meta_whatsapp_service.send_whatsapp("+14155551234", "hello")
+    monkeypatch.setattr(limits, "META_WHATSAPP_ACCESS_TOKEN", "token-b")
+    await meta_whatsapp_service.send_image("+14155551234", "https://example.com/a.png")
+
+    senders = [sender for provider, sender in rate_limiter._limiters if provider == "whapi"]
+    assert len(set(senders)) == 2
+    assert not any("token" in sender for sender in senders)
@@ -0,0 +1,138 @@
+import pytest
+from src.db.session import get_write_db
+from src.services import booking_service, conversation_service, stats_service, trigger_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _insert_trigger(recipient, status="active"):
+    async with get_write_db() as db:
+        cursor = await db.execute(
+            """INSERT INTO triggers (name, trigger_type, channel, recipient, contact_key, message, status)
+            VALUES ('t', 'follow_up', 'whatsapp', ?, ?, 'hi', ?) RETURNING id""",
+            (recipient, recipient, status),
+        )
+        trigger_id = (await cursor.fetchone())[0]
+        await db.commit()
+    return trigger_id
+
+
+@pytest.mark.anyio
+async def test_counters_follow_writes_and_match_a_rebuild(temp_db):
+    await conversation_service.store_message("+15550000001", "user", "hi")
+    await conversation_service.store_message("+1 (555) 000-0001", "assistant", "hello")
+    await conversation_service.store_message("+15550000002", "user", "hey")
+    await conversation_service.store_sent_message("+15550000001", "whatsapp", "hello")
+    await conversation_service.store_sent_message("a@example.com", "email", "hello", subject="Hi")
+    first = await booking_service.create_booking("+15550000001", "Demo")
+    await booking_service.create_booking("+15550000001", "Call")
+    await booking_service.confirm_booking(confirmation_code=first["confirmation_code"])
+    await booking_service.cancel_all_pending("+15550000001")
+
+    stats = await stats_service.read_analytics()
+
+    assert stats["total_messages"] == 3
+    assert stats["total_contacts"] == 2
+    assert stats["total_sent"] == 2
+    assert stats["sent_today"] == 2
+    assert stats["by_channel"] == {"whatsapp": 1, "email": 1}
+    assert stats["sent_last_7_days"] == [{"date": stats_service.today(), "count": 2}]
+    assert (stats["total_bookings"], stats["pending_bookings"], stats["confirmed_bookings"]) == (2, 0, 1)
+
+    await stats_service.rebuild_counters()
+    assert await stats_service.read_analytics() == stats
+
+
+@pytest.mark.anyio
+async def test_trigger_status_changes_move_counts(temp_db):
+    trigger_id = await _insert_trigger("+15550000003")
+    await _insert_trigger("+15550000003", status="completed")
+    await stats_service.rebuild_counters()
+
+    await trigger_service.update_trigger_status(trigger_id, "paused")
+    await trigger_service.update_trigger_status(trigger_id, "paused")
+    await trigger_service.update_trigger_status(9999, "cancelled")
+
+    stats = await stats_service.read_analytics()
+    assert stats["active_triggers"] == 0
+    assert stats["total_triggers"] == 2
+    await stats_service.rebuild_counters()
+    assert await stats_service.read_analytics() == stats
+
+
+@pytest.mark.anyio
+async def test_analytics_endpoint_reads_counters(client, temp_db):
+    await conversation_service.store_sent_message("+15550000004", "sms", "hello")
+
+    response = await client.get("/analytics")
+
+    assert response.json()["success"] is True
+    assert response.json()["stats"]["by_channel"] == {"sms": 1}
+
+
+async def _insert_sent(channel, status, created_at):
+    async with get_write_db() as db:
+        await db.execute(
+            "INSERT INTO sent_messages (recipient, channel, body, status, created_at) VALUES ('x', ?, 'b', ?, ?)",
+            (channel, status, created_at),
+        )
+        await db.commit()
+
+
+@pytest.mark.anyio
+async def test_rollups_fold_in_new_rows_incrementally(temp_db):
+    await _insert_sent("sms", "sent", "2026-03-01 09:15:00")
+    await _insert_sent("email", "sent", "2026-03-01 17:40:00")
+    await _insert_sent("sms", "failed", "2026-03-03 08:00:00")
+
+    assert (await stats_service.refresh_rollups(limit=2))["sent_messages"] == 2
+    assert (await stats_service.refresh_rollups())["sent_messages"] == 1
+    assert (await stats_service.refresh_rollups())["sent_messages"] == 0
+
+    daily = await stats_service.read_series("sent_messages", "day", "2026-03-01", "2026-03-03", split="channel")
+    assert [(p["bucket"], p["count"]) for p in daily["series"]] == [
+        ("2026-03-01", 2), ("2026-03-02", 0), ("2026-03-03", 1),
+    ]
+    assert daily["series"][0]["breakdown"] == {"sms": 1, "email": 1}
+
+    hourly = await stats_service.read_series(
+        "sent_messages", "hour", "2026-03-01T09:00", "2026-03-01T17:00", channel="sms"
+    )
+    assert hourly["total"] == 1 and len(hourly["series"]) == 9
+
+    monthly = await stats_service.read_series("sent_messages", "month", "2026-02-01", "2026-03-31", kind="failed")
+    assert [(p["bucket"], p["count"]) for p in monthly["series"]] == [("2026-02", 0), ("2026-03", 1)]
+
+
+@pytest.mark.anyio
+async def test_series_endpoint_validates_and_refreshes(client, temp_db):
+    await conversation_service.store_message("+15550000005", "user", "hi")
+
+    response = await client.get("/analytics/series", params={"source": "conversations", "split": "kind"})
+    body = response.json()
+    assert body["total"] == 1
+    assert body["series"][-1]["breakdown"] == {"user": 1}
+
+    response = await client.get("/analytics/series", params={"granularity": "hour", "start": "2000-01-01"})
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_series_reads_unrolled_rows_and_accepts_offsets(client, temp_db):
+    await _insert_sent("sms", "sent", "2026-03-01 09:15:00")
+    await stats_service.refresh_rollups()
+    await _insert_sent("sms", "sent", "2026-03-01 23:30:00")  # not rolled up yet
+
+    response = await client.get("/analytics/series", params={
+        "granularity": "hour", "start": "2026-03-01T14:30:00+05:30", "end": "2026-03-02T00:00:00Z",
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["start"], body["end"], body["total"]) == ("2026-03-01T09", "2026-03-02T00", 2)
+    async with get_write_db() as db:
+        cursor = await db.execute("SELECT last_id FROM rollup_marks WHERE source = 'sent_messages'")
+        assert (await cursor.fetchone())[0] == 1
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from src.db import session as db_session
+from src.services import inbox_service, stats_service, trigger_service
+
+# These run on whichever backend temp_db provides: SQLite by default, or the
+# PostgreSQL database named by TEST_DATABASE_URL.
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_database_url_selects_backend():
+    assert db_session.is_postgres("postgresql://app@db/salespulse")
+    assert db_session.is_postgres("postgresql+asyncpg://app@db/salespulse")
+    assert db_session.is_postgres("postgres://app@db/salespulse")
+    assert not db_session.is_postgres("sqlite+aiosqlite:///./salespulse.db")
+
+
+def test_placeholders_are_numbered_outside_literals():
+    postgres = pytest.importorskip("src.db.postgres")
+
+    assert postgres.convert_placeholders(
+        "UPDATE t SET a = ?, b = 'what?' WHERE c IN (?, ?)"
+    ) == "UPDATE t SET a = $1, b = 'what?' WHERE c IN ($2, $3)"
+
+
+@pytest.mark.anyio
+async def test_concurrent_claims_take_each_trigger_once(temp_db):
+    past = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+    async with db_session.get_write_db() as db:
+        cursor = await db.execute(
+            f"""INSERT INTO triggers (name, trigger_type, channel, recipient, message, status, scheduled_at)
+            VALUES {", ".join(["('t', 'follow_up', 'sms', '+14155550000', 'hi', 'active', ?)"] * 20)}
+            RETURNING id""",
+            [past] * 20,
+        )
+        ids = [row[0] for row in await cursor.fetchall()]
+        await db.commit()
+
+    claims = await asyncio.gather(*[
+        trigger_service.claim_triggers(ids, worker_id=f"worker-{n}") for n in range(4)
+    ])
+
+    claimed = [trigger["id"] for batch in claims for trigger in batch]
+    assert sorted(claimed) == sorted(ids)
+
+
+@pytest.mark.anyio
+async def test_writer_rolls_back_uncommitted_work(temp_db):
+    async with db_session.get_write_db() as db:
+        await db.execute(
+            "INSERT INTO sent_messages (recipient, channel, body) VALUES (?, ?, ?)", ("+1555", "sms", "hi")
+        )
+    async with db_session.get_write_db() as db:
+        await db_session.copy_rows(db, "sent_messages", ("recipient", "channel", "body"), [("+1556", "sms", "ok")])
+        await db.commit()
+
+    async with db_session.get_db() as db:
+        rows = await (await db.execute("SELECT recipient FROM sent_messages")).fetchall()
+    assert [row[0] for row in rows] == ["+1556"]
+
+
+@pytest.mark.anyio
+async def test_concurrent_rollup_refreshes_count_rows_once(temp_db):
+    async with db_session.get_write_db() as db:
+        await db_session.copy_rows(
+            db, "sent_messages", ("recipient", "channel", "body", "created_at"),
+            [(f"+1555{n:07d}", "sms", "hi", "2026-03-01 09:00:00") for n in range(50)],
+        )
+        await db.commit()
+
+    await asyncio.gather(*[stats_service.refresh_rollups() for _ in range(4)])
+
+    series = await stats_service.read_series("sent_messages", "day", "2026-03-01", "2026-03-01")
+    assert series["total"] == 50
+
+
+@pytest.mark.anyio
+async def test_concurrent_inbox_claims_keep_each_contact_serial(temp_db):
+    await inbox_service.enqueue_events([
+        {"source": "twilio", "channel": "sms", "sender": sender, "body": f"msg {n}"}
+        for n in range(3) for sender in ("+15550000001", "+15550000002")
+    ])
+
+    claims = await asyncio.gather(*[
+        inbox_service.claim_events(worker_id=f"worker-{n}", limit=1) for n in range(6)
+    ])
+
+    claimed = [event for batch in claims for event in batch]
+    assert sorted(event["body"] for event in claimed) == ["msg 0", "msg 0"]
+    assert sorted(event["sender"] for event in claimed) == ["+15550000001", "+15550000002"]
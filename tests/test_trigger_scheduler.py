@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from src.db import session as db_session
+from src.services import trigger_service
+from src.services.trigger_scheduler import TriggerScheduler
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _in(seconds):
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+async def _no_rows(horizon_ts):
+    return []
+
+
+async def _claim_all(trigger_ids):
+    return [{"id": trigger_id} for trigger_id in trigger_ids]
+
+
+@pytest.mark.anyio
+async def test_dispatches_in_deadline_order_and_skips_discarded():
+    fired = []
+
+    async def execute(trigger):
+        fired.append(trigger["id"])
+
+    scheduler = TriggerScheduler(_no_rows, _claim_all, execute, max_workers=1, resync_interval=60)
+    task = asyncio.create_task(scheduler.run())
+    try:
+        scheduler.schedule(3, _in(0.15))
+        scheduler.schedule(1, _in(0.05))
+        scheduler.schedule(2, _in(0.10))
+        scheduler.discard(2)
+        await asyncio.sleep(0.3)
+        assert fired == [1, 3]
+    finally:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_earlier_deadline_wakes_sleeping_scheduler():
+    fired = asyncio.Event()
+
+    async def execute(trigger):
+        fired.set()
+
+    scheduler = TriggerScheduler(_no_rows, _claim_all, execute, resync_interval=60)
+    task = asyncio.create_task(scheduler.run())
+    try:
+        scheduler.schedule(1, _in(30))
+        await asyncio.sleep(0.02)
+        scheduler.schedule(2, _in(0))
+        await asyncio.wait_for(fired.wait(), 1)
+        assert scheduler.stats()["scheduled"] == 1
+    finally:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_worker_pool_bounds_concurrency_and_seeds_from_loader():
+    active = 0
+    peak = 0
+
+    async def load(horizon_ts):
+        past = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+        return [(i, past) for i in range(6)]
+
+    async def execute(trigger):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+
+    scheduler = TriggerScheduler(load, _claim_all, execute, max_workers=2, resync_interval=60)
+    task = asyncio.create_task(scheduler.run())
+    try:
+        await asyncio.sleep(0.3)
+        assert scheduler.stats()["dispatched"] == 6
+        assert peak == 2
+    finally:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_only_claimed_triggers_are_executed():
+    fired = []
+
+    async def claim(trigger_ids):
+        # Another worker holds the lease on even ids.
+        return [{"id": trigger_id} for trigger_id in trigger_ids if trigger_id % 2]
+
+    async def execute(trigger):
+        fired.append(trigger["id"])
+
+    scheduler = TriggerScheduler(_no_rows, claim, execute, resync_interval=60)
+    task = asyncio.create_task(scheduler.run())
+    try:
+        for trigger_id in range(4):
+            scheduler.schedule(trigger_id, _in(0))
+        await asyncio.sleep(0.1)
+        assert sorted(fired) == [1, 3]
+        assert scheduler.stats()["lost_claims"] == 2
+    finally:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_claim_leases_each_trigger_once(temp_db):
+    past = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+    async with db_session.get_write_db() as db:
+        cursor = await db.execute(
+            """INSERT INTO triggers (name, trigger_type, channel, recipient, message, status, scheduled_at)
+            VALUES ('t', 'follow_up', 'sms', '+14155550000', 'hi', 'active', ?) RETURNING id""",
+            (past,),
+        )
+        trigger_id = (await cursor.fetchone())[0]
+        await db.commit()
+
+    first = await trigger_service.claim_triggers([trigger_id], worker_id="a")
+    second = await trigger_service.claim_triggers([trigger_id], worker_id="b")
+    assert [t["id"] for t in first] == [trigger_id]
+    assert second == []
+
+    # An expired lease can be taken over by another worker.
+    async with db_session.get_write_db() as db:
+        await db.execute("UPDATE triggers SET lease_until = ? WHERE id = ?", (past, trigger_id))
+        await db.commit()
+    assert [t["id"] for t in await trigger_service.claim_triggers([trigger_id], worker_id="b")] == [trigger_id]
+    assert await trigger_service.renew_trigger_lease(trigger_id, worker_id="a") is False
@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+import pytest
+from src.core.exceptions import TwilioServiceError
+from src.services import twilio_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _use_transport(monkeypatch, handler, max_concurrency=10):
+    client = httpx.AsyncClient(
+        base_url="https://api.twilio.test/Accounts/AC123", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr(twilio_service, "_http_client", client)
+    monkeypatch.setattr(twilio_service, "_send_slots", asyncio.Semaphore(max_concurrency))
+    return client
+
+
+@pytest.mark.anyio
+async def test_send_sms_posts_form_to_messages_api(monkeypatch):
+    seen = {}
+
+    def handler(request):
+        seen["path"] = request.url.path
+        seen["body"] = dict(httpx.QueryParams(request.content.decode()))
+        return httpx.Response(201, json={"sid": "SM1", "status": "queued"})
+
+    _use_transport(monkeypatch, handler)
+    monkeypatch.setattr(twilio_service.settings, "TWILIO_SMS_NUMBER", "+15550000000")
+
+    result = await twilio_service.send_sms("+14155551234", "hello")
+
+    assert result == {"message_id": "SM1", "status": "queued"}
+    assert seen["path"] == "/Accounts/AC123/Messages.json"
+    assert seen["body"] == {"From": "+15550000000", "To": "+14155551234", "Body": "hello"}
+
+
+@pytest.mark.anyio
+async def test_send_whatsapp_surfaces_api_errors(monkeypatch):
+    def handler(request):
+        return httpx.Response(400, json={"code": 21211, "message": "Invalid 'To' Phone Number"})
+
+    _use_transport(monkeypatch, handler)
+
+    with pytest.raises(TwilioServiceError, match="Invalid 'To' Phone Number"):
+        await twilio_service.send_whatsapp("+1", "hello")
+
+
+@pytest.mark.anyio
+async def test_concurrent_sends_are_bounded(monkeypatch):
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(201, json={"sid": "SM", "status": "queued"})
+
+    _use_transport(monkeypatch, handler, max_concurrency=3)
+
+    await asyncio.gather(*(twilio_service.send_sms("+14155551234", "hi") for _ in range(10)))
+
+    assert peak == 3
@@ -0,0 +1,101 @@
+import pytest
+from src.core.exceptions import DatabaseError
+from src.db.session import get_db, get_write_db, unit_of_work
+from src.services import conversation_service, event_hub, stats_service, trigger_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _count(table):
+    async with get_db() as db:
+        cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+        return (await cursor.fetchone())[0]
+
+
+async def _insert_trigger(recipient):
+    async with get_write_db() as db:
+        cursor = await db.execute(
+            """INSERT INTO triggers (name, trigger_type, channel, recipient, contact_key, message, stop_on_reply)
+            VALUES ('Intro', 'follow_up', 'whatsapp', ?, ?, 'hi', 1) RETURNING id""",
+            (recipient, recipient),
+        )
+        trigger_id = (await cursor.fetchone())[0]
+        await db.commit()
+    await stats_service.rebuild_counters()
+    return trigger_id
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_commits_together_and_runs_hooks_after(temp_db):
+    ran = []
+    async with unit_of_work() as uow:
+        await conversation_service.store_message("+15550000001", "user", "hi", uow=uow)
+        await conversation_service.store_sent_message("+15550000001", "whatsapp", "hello", uow=uow)
+        uow.on_commit(lambda: ran.append("done"))
+        assert ran == []
+
+    assert ran == ["done"]
+    assert (await _count("conversations"), await _count("sent_messages")) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_failed_unit_of_work_rolls_back_and_skips_hooks(temp_db):
+    subscription = event_hub.subscribe([event_hub.GLOBAL_TOPIC])
+    with pytest.raises(RuntimeError):
+        async with unit_of_work() as uow:
+            await conversation_service.store_message("+15550000002", "user", "hi", uow=uow)
+            raise RuntimeError("boom")
+
+    assert await _count("conversations") == 0
+    assert (await stats_service.read_analytics())["total_messages"] == 0
+    assert await subscription.get(timeout=0.01) is None
+    event_hub.unsubscribe(subscription)
+
+
+@pytest.mark.anyio
+async def test_lead_reply_is_recorded_in_one_transaction(temp_db, monkeypatch):
+    trigger_id = await _insert_trigger("+15550000003")
+    seen = []
+
+    async def fake_completion(messages):
+        seen.extend(messages)
+        return "Great! [CREATE_BOOKING] [TITLE: Demo call]"
+
+    monkeypatch.setattr(trigger_service, "chat_completion", fake_completion)
+
+    reply = await trigger_service.handle_lead_reply("+15550000003", "Can we book a demo?")
+
+    assert seen[-1] == {"role": "user", "content": "Can we book a demo?"}
+    assert "Booking Created" in reply
+    assert (await _count("conversations"), await _count("bookings"), await _count("sent_messages")) == (2, 1, 1)
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM triggers WHERE id = ?", (trigger_id,))
+        assert (await cursor.fetchone())[0] == "completed"
+    stats = await stats_service.read_analytics()
+    assert (stats["active_triggers"], stats["pending_bookings"], stats["total_messages"]) == (0, 1, 2)
+
+
+@pytest.mark.anyio
+async def test_failed_lead_reply_stores_nothing(temp_db, monkeypatch):
+    trigger_id = await _insert_trigger("+15550000004")
+
+    async def fake_completion(messages):
+        return "Sure. [CREATE_BOOKING] [TITLE: Demo call]"
+
+    async def broken_store(**kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(trigger_service, "chat_completion", fake_completion)
+    monkeypatch.setattr(trigger_service, "store_sent_message", broken_store)
+
+    with pytest.raises(DatabaseError):
+        await trigger_service.handle_lead_reply("+15550000004", "Book it")
+
+    assert (await _count("conversations"), await _count("bookings"), await _count("sent_messages")) == (0, 0, 0)
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM triggers WHERE id = ?", (trigger_id,))
+        assert (await cursor.fetchone())[0] == "active"
+    assert (await stats_service.read_analytics())["active_triggers"] == 1
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from src.db import batcher
+from src.db.session import get_db
+from src.services import conversation_service, stats_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _rows(table):
+    async with get_db() as db:
+        cursor = await db.execute(f"SELECT * FROM {table} ORDER BY id")
+        return await cursor.fetchall()
+
+
+@pytest.mark.anyio
+async def test_concurrent_stores_share_commits(temp_db, monkeypatch):
+    monkeypatch.setattr(batcher.settings, "WRITE_BATCH_MAX_ROWS", 20)
+    batches_before = conversation_service._message_writes.stats()["batches"]
+
+    await asyncio.gather(*[
+        conversation_service.store_message(f"+1555000{n % 7:04d}", "user", f"msg {n}") for n in range(60)
+    ])
+    await asyncio.gather(*[
+        conversation_service.store_sent_message(f"+1555000{n:04d}", "sms" if n % 2 else "email", "hi")
+        for n in range(10)
+    ])
+
+    assert len(await _rows("conversations")) == 60
+    assert len(await _rows("sent_messages")) == 10
+    assert conversation_service._message_writes.stats()["batches"] - batches_before <= 4
+    contacts, _ = await conversation_service.get_all_contacts(limit=10)
+    assert sum(contact["total_msg_count"] for contact in contacts) == 60
+    stats = await stats_service.read_analytics()
+    assert (stats["total_messages"], stats["total_contacts"]) == (60, 7)
+    assert stats["by_channel"] == {"sms": 5, "email": 5}
+    await stats_service.rebuild_counters()
+    assert await stats_service.read_analytics() == stats
+
+
+@pytest.mark.anyio
+async def test_bad_row_does_not_fail_its_batch(temp_db):
+    await asyncio.gather(
+        conversation_service.store_message("+15550000001", "user", "one"),
+        conversation_service.store_message("+15550000001", "system", "rejected by CHECK"),
+        conversation_service.store_message("+15550000001", "assistant", "two"),
+    )
+
+    assert [row["message"] for row in await _rows("conversations")] == ["one", "two"]
+    assert (await stats_service.read_analytics())["total_messages"] == 2
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("durability", ["immediate", "deferred"])
+async def test_durability_modes(temp_db, monkeypatch, durability):
+    monkeypatch.setattr(batcher.settings, "WRITE_BATCH_DURABILITY", durability)
+
+    await conversation_service.store_message("+15550000002", "user", "hello")
+    await batcher.stop_batchers()
+
+    assert [row["message"] for row in await _rows("conversations")] == ["hello"]